@@ -0,0 +1,5 @@
+"""
+性能計測用ベンチマーク
+
+backend ディレクトリから `python -m benchmarks.<モジュール名>` で実行します（httpx が必要）。
+"""
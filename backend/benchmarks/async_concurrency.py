@@ -0,0 +1,105 @@
+"""
+同期DB経路（SessionLocal + スレッドプール）と非同期DB経路（AsyncSessionLocal）の同時実行性能を比較する
+
+同じキャラクター取得処理を sync def / async def の2つのエンドポイントとして用意し、
+同時リクエスト数を増やしながら requests/sec を計測します。
+スレッドプールの上限（--threadpool）に達すると同期経路のスループットが頭打ちになることを確認できます。
+ローカルの SQLite は往復が速すぎて差が出にくいので、--io-latency で MySQL へのネットワーク往復相当の待ちを足せます。
+計測のばらつきを抑えるため、ウォームアップのあと同期・非同期を交互に --rounds 回計測し、中央値を表示します。
+
+    cd backend
+    python -m benchmarks.async_concurrency --requests 2000 --concurrency 10 50 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import anyio
+import httpx
+from fastapi import FastAPI, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db, get_async_db, dispose_async_engine, Character
+
+
+# 1リクエストあたりに加えるDB往復の待ち時間（秒）
+IO_LATENCY = 0.0
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/characters/{character_id}")
+    def get_character_sync(character_id: int, db: Session = Depends(get_db)):
+        character = db.query(Character).filter(Character.id == character_id).first()
+        if IO_LATENCY:
+            time.sleep(IO_LATENCY)
+        if not character:
+            raise HTTPException(status_code=404, detail="Character not found")
+        return {"id": character.id, "level": character.level}
+
+    @app.get("/async/characters/{character_id}")
+    async def get_character_async(character_id: int, db: AsyncSession = Depends(get_async_db)):
+        character = await db.get(Character, character_id)
+        if IO_LATENCY:
+            await asyncio.sleep(IO_LATENCY)
+        if not character:
+            raise HTTPException(status_code=404, detail="Character not found")
+        return {"id": character.id, "level": character.level}
+
+    return app
+
+
+async def run(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> float:
+    """total 件のリクエストを concurrency 並列で投げ、requests/sec を返す"""
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.get(path)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--threadpool", type=int, default=40, help="Starlette のスレッドプール上限")
+    parser.add_argument("--character-id", type=int, default=1)
+    parser.add_argument("--io-latency", type=float, default=0.0, help="DB往復に加える待ち時間（ミリ秒）")
+    parser.add_argument("--rounds", type=int, default=3, help="同期・非同期を交互に計測する回数（中央値を表示）")
+    args = parser.parse_args()
+
+    global IO_LATENCY
+    IO_LATENCY = args.io_latency / 1000
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threadpool
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sync_path = f"/sync/characters/{args.character_id}"
+        async_path = f"/async/characters/{args.character_id}"
+        # 接続プール・スレッドを温めてから計測する
+        await run(client, sync_path, 200, max(args.concurrency))
+        await run(client, async_path, 200, max(args.concurrency))
+
+        print(f"{'concurrency':>11} {'sync req/s':>12} {'async req/s':>12} {'async/sync':>10}")
+        for concurrency in args.concurrency:
+            sync_runs, async_runs = [], []
+            for _ in range(args.rounds):
+                sync_runs.append(await run(client, sync_path, args.requests, concurrency))
+                async_runs.append(await run(client, async_path, args.requests, concurrency))
+            sync_rps, async_rps = statistics.median(sync_runs), statistics.median(async_runs)
+            print(f"{concurrency:>11} {sync_rps:>12.1f} {async_rps:>12.1f} {async_rps / sync_rps:>10.2f}")
+    await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
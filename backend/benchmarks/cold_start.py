@@ -0,0 +1,98 @@
+"""
+コールドスタートの計測: uvicorn のプロセスを起動してから GET /health/ready が 200 を返すまでの時間
+
+一時ディレクトリの SQLite に装備マスターを登録し、そのデータベースでサーバーを --runs 回起動し直します。
+- 1回目はスキーマの版の記録（create_all）を含むので「初回」として別に表示する
+- 2回目以降の中央値・最大値と、/health/ready が返す段階ごとの時間（import / schema / warmup_* など）の中央値を表示する
+- 最大値が --budget-ms（既定は STARTUP_BUDGET_MS）を超えたら報告する（--fail-over-budget で終了コード1）
+
+    cd backend
+    python -m benchmarks.cold_start --runs 10
+    python -m benchmarks.cold_start --no-warmup     # ウォームアップなしと比較する
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load_test import BACKEND_DIR, free_port
+from startup import STARTUP_BUDGET_MS
+
+
+def prepare_database(workdir: str, env: dict):
+    # database.py はカレントディレクトリに study_game.db があれば SQLite を使う
+    open(os.path.join(workdir, "study_game.db"), "w").close()
+    subprocess.run(
+        [sys.executable, os.path.join(BACKEND_DIR, "init_equipment.py")],
+        cwd=workdir, env=env, input="n\n", text=True, stdout=subprocess.DEVNULL, check=True
+    )
+
+
+def measure_once(workdir: str, env: dict, timeout: float = 30.0) -> dict:
+    """サーバーを起動して準備完了までの時間を計り、/health/ready の内容と合わせて返す"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5.0) as client:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                if server.poll() is not None:
+                    raise SystemExit(f"❌ サーバーが起動に失敗しました（終了コード {server.returncode}）")
+                try:
+                    response = client.get("/health/ready")
+                    if response.status_code == 200:
+                        return {"wall_ms": (time.perf_counter() - started) * 1000, **response.json()}
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise SystemExit("❌ サーバーが準備完了になりませんでした")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="コールドスタートの計測")
+    parser.add_argument("--runs", type=int, default=5, help="2回目以降の計測回数")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--no-warmup", action="store_true", help="STARTUP_WARMUP=false で起動する")
+    parser.add_argument("--fail-over-budget", action="store_true", help="目標を超えたら終了コード1")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, STARTUP_WARMUP="false" if args.no_warmup else "true")
+    workdir = tempfile.mkdtemp(prefix="cold_start_")
+    try:
+        prepare_database(workdir, env)
+        first = measure_once(workdir, env)
+        runs = [measure_once(workdir, env) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    wall = [run["wall_ms"] for run in runs]
+    print(f"初回（スキーマの版を記録）: {first['wall_ms']:.0f}ms")
+    print(f"2回目以降 {len(runs)} 回: 中央値 {statistics.median(wall):.0f}ms / 最大 {max(wall):.0f}ms（目標 {args.budget_ms:.0f}ms）")
+    print("段階ごとの中央値（プロセス内で計測、import は startup.py の import 以降）:")
+    for name in runs[0]["phases"]:
+        print(f"  {name:<20} {statistics.median(run['phases'].get(name, 0) for run in runs):8.1f}ms")
+
+    if max(wall) > args.budget_ms:
+        print(f"⚠️  起動時間が目標を超えました（最大 {max(wall):.0f}ms > {args.budget_ms:.0f}ms）")
+        if args.fail_over_budget:
+            sys.exit(1)
+    else:
+        print("✅ 目標時間内に準備完了になりました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+レスポンス圧縮（compression.py）の転送量とレイテンシを計測する
+
+一時ディレクトリに study_game.db を作り、装備マスターと、学習履歴・コイン取引・資格を持つキャラクターを1人登録します。
+主な参照APIを Accept-Encoding: identity / gzip でそれぞれ --requests 回呼び出し、
+レスポンスサイズ・サーバー処理時間の p50 / p99 と、回線速度 --bandwidth-mbps での転送時間を足した p99 を表示します。
+
+    cd backend
+    python -m benchmarks.compression --sessions 2000 --bandwidth-mbps 10
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=2000, help="キャラクターの学習セッション・コイン取引の件数")
+    parser.add_argument("--certifications", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--bandwidth-mbps", type=float, default=10.0, help="転送時間の見積もりに使う回線速度")
+    args = parser.parse_args()
+
+    # database.py はカレントディレクトリの study_game.db を使うので、空のDBを用意してから読み込む
+    workdir = tempfile.mkdtemp(prefix="compression-")
+    os.chdir(workdir)
+    open("study_game.db", "w").close()
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+
+    from database import SessionLocal, create_tables, Character, StudySession, CoinTransaction, Certification
+    from init_equipment import init_equipment_data
+    import main as app_module
+
+    create_tables()
+    init_equipment_data()
+    db = SessionLocal()
+    character = Character(name="圧縮計測用キャラクター", coins=5000)
+    db.add(character)
+    db.commit()
+    character_id = character.id
+    subjects = ["基本情報技術者試験 午前", "応用情報技術者試験 午後", "データベーススペシャリスト", "英語リスニング", "線形代数"]
+    started = datetime.utcnow() - timedelta(minutes=args.sessions * 30)
+    db.execute(insert(StudySession), [
+        {
+            "character_id": character_id,
+            "duration": 25.0 + i % 40,
+            "subject": subjects[i % len(subjects)],
+            "started_at": started + timedelta(minutes=i * 30),
+            "ended_at": started + timedelta(minutes=i * 30 + 25)
+        }
+        for i in range(args.sessions)
+    ])
+    db.execute(insert(CoinTransaction), [
+        {
+            "character_id": character_id,
+            "amount": 25 + i % 40,
+            "transaction_type": "earned",
+            "source": "study",
+            "created_at": started + timedelta(minutes=i * 30 + 25)
+        }
+        for i in range(args.sessions)
+    ])
+    db.execute(insert(Certification), [
+        {
+            "character_id": character_id,
+            "name": f"情報処理技術者試験 {i}",
+            "category": "国家資格",
+            "itss_level": 1 + i % 7,
+            "description": "午前・午後試験に合格して取得した資格です",
+            "created_at": started + timedelta(days=i)
+        }
+        for i in range(args.certifications)
+    ])
+    db.commit()
+    db.close()
+
+    routes = [
+        "/equipment",
+        f"/equipment/shop/{character_id}",
+        f"/sessions/{character_id}",
+        f"/coins/{character_id}/transactions",
+        f"/certifications/{character_id}",
+        f"/stats/{character_id}",
+    ]
+    bytes_per_second = args.bandwidth_mbps * 1_000_000 / 8
+
+    print(f"回線速度 {args.bandwidth_mbps} Mbps で転送時間を見積もっています")
+    print(f"{'route':<32} {'encoding':<9} {'bytes':>9} {'p50 ms':>8} {'p99 ms':>8} {'p99+転送 ms':>12}")
+    with TestClient(app_module.app) as client:
+        for route in routes:
+            template = route.replace(str(character_id), "{id}")
+            for encoding in ("identity", "gzip"):
+                headers = {"Accept-Encoding": encoding}
+                client.get(route, headers=headers)  # ウォームアップ
+                timings = []
+                for _ in range(args.requests):
+                    begin = time.perf_counter()
+                    response = client.get(route, headers=headers)
+                    timings.append(time.perf_counter() - begin)
+                    response.raise_for_status()
+                # TestClient は gzip を展開してしまうので、転送量は Content-Length で見る
+                size = int(response.headers.get("content-length", len(response.content)))
+                p50 = statistics.median(timings) * 1000
+                p99 = percentile(timings, 0.99) * 1000
+                transfer = size / bytes_per_second * 1000
+                print(f"{template:<32} {encoding:<9} {size:>9,} {p50:>8.2f} {p99:>8.2f} {p99 + transfer:>12.2f}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+ランキング（leaderboard.Leaderboard）を大量のキャラクターで計測する
+
+DBは使わず、乱数で作ったキャラクターを読み込んで作成・スコア更新・順位検索・上位取得の速度を測ります。
+
+    cd backend
+    python -m benchmarks.leaderboard --characters 1000000
+"""
+
+import argparse
+import random
+import time
+from collections import namedtuple
+
+from leaderboard import Leaderboard
+
+Row = namedtuple("Row", "id name level experience total_study_time coins")
+
+
+def timed(label: str, count: int, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    per_op = elapsed / count * 1e6 if count else 0
+    print(f"{label:<24} {elapsed:>8.2f}s  {per_op:>8.1f}µs/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--characters", type=int, default=1_000_000)
+    parser.add_argument("--operations", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = [
+        Row(i, f"character{i}", 1, rng.randint(0, 500_000), rng.random() * 50_000, rng.randint(0, 20_000))
+        for i in range(1, args.characters + 1)
+    ]
+    board = Leaderboard()
+    ids = [rng.randint(1, args.characters) for _ in range(args.operations)]
+
+    timed("load", args.characters, lambda: board.load(rows))
+
+    def updates():
+        for character_id in ids:
+            row = rows[character_id - 1]
+            row = row._replace(experience=row.experience + rng.randint(1, 600), coins=row.coins + rng.randint(1, 60))
+            rows[character_id - 1] = row
+            board.update(row)
+
+    timed("update", args.operations, updates)
+    timed("rank", args.operations, lambda: [board.rank("experience", i) for i in ids])
+    timed("top (limit=20)", args.operations // 10, lambda: [
+        board.top("coins", rng.randint(0, args.characters - 20), 20) for _ in range(args.operations // 10)
+    ])
+
+
+if __name__ == "__main__":
+    main()
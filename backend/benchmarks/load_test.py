@@ -0,0 +1,310 @@
+"""
+HTTP負荷試験: 実際の利用に近いリクエストの組み合わせで、ルートごとのレイテンシと requests/sec を計測する
+
+一時ディレクトリの SQLite（--mysql なら DB_HOST などの環境変数の MySQL）に対して uvicorn でアプリを起動し、
+キャラクターと学習履歴を API 経由で登録してから、--concurrency 本のクライアントで --duration 秒間リクエストを送ります。
+- タイマー開始 → 停止 / 見た目（appearance）/ 統計 / ショップ / 購入 を TRAFFIC_MIX の比率で混ぜる
+- ルートごとに p50 / p95 / p99（ミリ秒）・requests/sec・ステータス別件数を表示し、JSON で保存する
+- 保存済みのベースライン（benchmarks/baselines/load_test.json）と比べ、
+  p99 が --tolerance 以上悪化・requests/sec が --tolerance 以上低下したルートを報告する（--fail-on-regression で終了コード1）
+
+購入は所持済み・コイン不足で 400 になるのも想定どおりなので、5xx・409・接続エラー以外は失敗として数えません。
+MySQL で実行するとキャラクターなどがそのデータベースに登録されるので、使い捨てのデータベースで実行してください。
+
+    cd backend
+    python -m benchmarks.load_test --concurrency 20 --duration 30
+    python -m benchmarks.load_test --save-baseline      # 現在の結果をベースラインとして保存
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "load_test.json")
+
+# シナリオ -> 重み
+TRAFFIC_MIX = {
+    "timer": 20,  # /timer/start → /timer/stop
+    "appearance": 35,
+    "stats": 20,
+    "shop": 15,
+    "purchase": 10,
+}
+
+# 5xx・接続エラー（0）のほかに失敗として数えるステータス（409 は楽観的排他制御の再試行切れ）
+FAILURE_STATUSES = (409,)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir: str, port: int, use_mysql: bool) -> subprocess.Popen:
+    # database.py はカレントディレクトリに study_game.db があれば SQLite を使う
+    if not use_mysql:
+        open(os.path.join(workdir, "study_game.db"), "w").close()
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    # 装備マスターを登録（登録済みの MySQL では再初期化の確認に n と答えてそのまま使う）
+    subprocess.run(
+        [sys.executable, os.path.join(BACKEND_DIR, "init_equipment.py")],
+        cwd=workdir, env=env, input="n\n", text=True, stdout=subprocess.DEVNULL, check=True
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"❌ サーバーが起動に失敗しました（終了コード {server.returncode}）")
+        try:
+            if (await client.get("/equipment")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("❌ サーバーが起動しませんでした")
+
+
+async def seed(client: httpx.AsyncClient, characters: int, sessions: int) -> list:
+    """キャラクターと過去の学習セッションを API 経由で登録する（日別集計・コイン履歴も通常どおり作られる）"""
+    subjects = ["基本情報技術者試験", "応用情報技術者試験", "英語", "線形代数", "データベース"]
+    now = datetime.utcnow()
+    character_ids = []
+    for index in range(characters):
+        response = await client.post("/characters", json={"name": f"負荷試験 {index}"})
+        response.raise_for_status()
+        character_id = response.json()["id"]
+        character_ids.append(character_id)
+        if sessions:
+            ended = [now - timedelta(hours=6 * i) for i in range(sessions)]
+            response = await client.post("/sessions/bulk", json=[
+                {
+                    "character_id": character_id,
+                    "duration": 25 + (i * 7) % 65,
+                    "subject": subjects[i % len(subjects)],
+                    "ended_at": ended_at.isoformat()
+                }
+                for i, ended_at in enumerate(ended)
+            ])
+            response.raise_for_status()
+    return character_ids
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """リクエストを送って記録する（接続が切られた場合はステータス 0 として記録し None を返す）"""
+        begin = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.TransportError:
+            response = None
+            status = 0
+        self.latencies.setdefault(route, []).append(time.perf_counter() - begin)
+        statuses = self.statuses.setdefault(route, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        return response
+
+
+async def run_scenario(name: str, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, character_id: int, equipment_ids: list):
+    if name == "timer":
+        response = await recorder.request(client, "POST /timer/start", "POST", "/timer/start", json={"character_id": character_id})
+        if response is not None and response.status_code == 200:
+            await recorder.request(client, "POST /timer/stop", "POST", "/timer/stop", json={"session_id": response.json()["session_id"]})
+    elif name == "appearance":
+        await recorder.request(client, "GET /characters/{id}/appearance", "GET", f"/characters/{character_id}/appearance")
+    elif name == "stats":
+        await recorder.request(client, "GET /stats/{id}", "GET", f"/stats/{character_id}")
+    elif name == "shop":
+        await recorder.request(client, "GET /equipment/shop/{id}", "GET", f"/equipment/shop/{character_id}")
+    elif name == "purchase":
+        await recorder.request(client, "POST /equipment/purchase", "POST", "/equipment/purchase", json={
+            "character_id": character_id, "equipment_id": rng.choice(equipment_ids)
+        })
+
+
+async def drive(client: httpx.AsyncClient, character_ids: list, equipment_ids: list, concurrency: int, duration: float, seed_value: int) -> tuple:
+    """concurrency 本のクライアントで duration 秒間シナリオを実行し、(Recorder, 経過秒) を返す"""
+    recorder = Recorder()
+    names = list(TRAFFIC_MIX)
+    weights = [TRAFFIC_MIX[name] for name in names]
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed_value + worker_id)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            await run_scenario(name, client, recorder, rng, rng.choice(character_ids), equipment_ids)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return recorder, time.perf_counter() - started
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for route in sorted(recorder.latencies):
+        latencies = recorder.latencies[route]
+        statuses = recorder.statuses[route]
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        routes[route] = {
+            "requests": len(latencies),
+            "requests_per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(quantiles[49] * 1000, 2),
+            "p95_ms": round(quantiles[94] * 1000, 2),
+            "p99_ms": round(quantiles[98] * 1000, 2),
+            "failures": sum(count for status, count in statuses.items() if status == 0 or status >= 500 or status in FAILURE_STATUSES),
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "routes": routes,
+        "total": {
+            "requests": total,
+            "requests_per_second": round(total / elapsed, 1),
+            "failures": sum(route["failures"] for route in routes.values()),
+        },
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: dict):
+    print(f"{'route':<34} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'fail':>5}  statuses")
+    for route, stats in result["routes"].items():
+        statuses = " ".join(f"{status}:{count}" for status, count in stats["statuses"].items())
+        print(
+            f"{route:<34} {stats['requests']:>7} {stats['requests_per_second']:>8.1f} {stats['p50_ms']:>8.2f} "
+            f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['failures']:>5}  {statuses}"
+        )
+    total = result["total"]
+    print(f"{'合計':<32} {total['requests']:>7} {total['requests_per_second']:>8.1f} {'':>26} {total['failures']:>5}")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """ベースラインより悪化したルートの一覧（p99 の増加・requests/sec の低下）"""
+    regressions = []
+    print(f"\nベースライン（{baseline['meta']['revision']}、{baseline['meta']['created_at']}）との比較")
+    print(f"{'route':<34} {'req/s':>16} {'p99 ms':>18}")
+    for route, stats in result["routes"].items():
+        base = baseline["routes"].get(route)
+        if base is None:
+            continue
+        rps_change = stats["requests_per_second"] / base["requests_per_second"] - 1 if base["requests_per_second"] else 0
+        p99_change = stats["p99_ms"] / base["p99_ms"] - 1 if base["p99_ms"] else 0
+        mark = ""
+        if rps_change < -tolerance or p99_change > tolerance:
+            regressions.append(route)
+            mark = "  ❌"
+        print(f"{route:<34} {stats['requests_per_second']:>8.1f} ({rps_change:+6.1%}) {stats['p99_ms']:>9.2f} ({p99_change:+6.1%}){mark}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="計測する秒数")
+    parser.add_argument("--warmup", type=float, default=3.0, help="計測前に捨てる秒数")
+    parser.add_argument("--characters", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=200, help="キャラクターごとに事前登録する学習セッション数")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mysql", action="store_true", help="SQLite の代わりに DB_HOST などの環境変数の MySQL を使う")
+    parser.add_argument("--output", help="結果のJSONを保存するパス")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="比較するベースラインのJSON")
+    parser.add_argument("--save-baseline", action="store_true", help="結果をベースラインとして保存する")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="悪化とみなす変化率（0.2 = 20%%）")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    port = free_port()
+    server = start_server(workdir, port, args.mysql)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30.0) as client:
+            await wait_until_ready(client, server)
+            print(f"{args.characters} キャラクター × {args.sessions} セッションを登録しています...")
+            character_ids = await seed(client, args.characters, args.sessions)
+            equipment_ids = [item["id"] for item in (await client.get("/equipment")).json()]
+
+            if args.warmup:
+                await drive(client, character_ids, equipment_ids, args.concurrency, args.warmup, args.seed + 10000)
+            print(f"同時 {args.concurrency} クライアントで {args.duration:.0f} 秒間計測しています...")
+            recorder, elapsed = await drive(client, character_ids, equipment_ids, args.concurrency, args.duration, args.seed)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = summarize(recorder, elapsed)
+    result["meta"] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "database": "mysql" if args.mysql else "sqlite",
+        "concurrency": args.concurrency,
+        "duration_seconds": round(elapsed, 2),
+        "characters": args.characters,
+        "sessions_per_character": args.sessions,
+        "traffic_mix": TRAFFIC_MIX,
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+    }
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"結果を {args.output} に保存しました")
+
+    regressions = []
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"ベースラインを {args.baseline} に保存しました")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+
+    if result["total"]["failures"]:
+        print(f"❌ 失敗したリクエストが {result['total']['failures']} 件あります")
+    if regressions:
+        print(f"❌ ベースラインより悪化したルート: {', '.join(regressions)}")
+    if args.fail_on_regression and (regressions or result["total"]["failures"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,212 @@
+"""
+キャラクター更新の同時実行ストレステスト（楽観的排他制御 / 行ロック / 排他制御なし）
+
+少数のキャラクターに対して多数のスレッドから「学習完了（コイン・経験値の加算）」と「購入（残高チェック付きの減算）」を
+同時に実行し、終了後に次の2点を確認します。
+- 所持コインが取引履歴（coin_transactions）の合計と一致する（更新の消失・二重消費がない）
+- 所持コインが負になっていない
+戦略ごとの ops/sec と、再試行上限に達した件数（409）を表示します。
+
+- optimistic  : optimistic.update_character_sync（version 列の条件付き UPDATE ＋ 再試行）
+- pessimistic : SELECT ... FOR UPDATE で行ロックを取ってから更新（SQLite は FOR UPDATE がないため、
+                先に空の UPDATE を発行して書き込みロックを取る）
+- naive       : 読み込んだ値を書き戻すだけ（変更前の実装。更新が消失することを確認する用）
+
+study_game.db（または DB_HOST の MySQL）に計測用キャラクターを作成し、終了後に削除します。
+
+    cd backend
+    python -m benchmarks.optimistic_concurrency --threads 32 --operations 200
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.exc import OperationalError
+
+from database import SessionLocal, create_tables, Character, CoinTransaction
+from game_logic import calculate_level
+from optimistic import update_character_sync
+
+STUDY_COINS = 7
+STUDY_EXPERIENCE = 30
+PRICE = 10
+
+
+def study_values(character: Character) -> dict:
+    return {
+        "coins": character.coins + STUDY_COINS,
+        "experience": character.experience + STUDY_EXPERIENCE,
+        "level": calculate_level(character.experience + STUDY_EXPERIENCE)
+    }
+
+
+class Insufficient(Exception):
+    pass
+
+
+def spend_values(character: Character) -> dict:
+    if character.coins < PRICE:
+        raise Insufficient()
+    return {"coins": character.coins - PRICE}
+
+
+def record(db, character_id: int, amount: int):
+    db.add(CoinTransaction(
+        character_id=character_id,
+        amount=amount,
+        transaction_type="earned" if amount > 0 else "spent",
+        source="benchmark"
+    ))
+
+
+def optimistic_operation(db, character_id: int, spend: bool):
+    if spend:
+        update_character_sync(db, character_id, spend_values, Character.coins >= PRICE)
+    else:
+        update_character_sync(db, character_id, study_values)
+    record(db, character_id, -PRICE if spend else STUDY_COINS)
+
+
+def pessimistic_operation(db, character_id: int, spend: bool):
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(update(Character).where(Character.id == character_id).values(version=Character.version))
+        character = db.get(Character, character_id, populate_existing=True)
+    else:
+        character = db.get(Character, character_id, with_for_update=True)
+    values = spend_values(character) if spend else study_values(character)
+    for name, value in values.items():
+        setattr(character, name, value)
+    record(db, character_id, -PRICE if spend else STUDY_COINS)
+
+
+def naive_operation(db, character_id: int, spend: bool):
+    character = db.get(Character, character_id)
+    values = spend_values(character) if spend else study_values(character)
+    for name, value in values.items():
+        setattr(character, name, value)
+    record(db, character_id, -PRICE if spend else STUDY_COINS)
+
+
+STRATEGIES = {
+    "optimistic": optimistic_operation,
+    "pessimistic": pessimistic_operation,
+    "naive": naive_operation,
+}
+
+
+def run(strategy: str, character_ids: list, threads: int, operations: int, seed: int) -> dict:
+    operation = STRATEGIES[strategy]
+    counts = {"ok": 0, "insufficient": 0, "conflict": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        local = dict.fromkeys(counts, 0)
+        for _ in range(operations):
+            db = SessionLocal()
+            try:
+                operation(db, rng.choice(character_ids), rng.random() < 0.5)
+                db.commit()
+                local["ok"] += 1
+            except Insufficient:
+                db.rollback()
+                local["insufficient"] += 1
+            except HTTPException:
+                db.rollback()
+                local["conflict"] += 1
+            except OperationalError:
+                # SQLite の busy_timeout 切れ
+                db.rollback()
+                local["locked"] += 1
+            finally:
+                db.close()
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    counts["ops_per_second"] = threads * operations / (time.perf_counter() - started)
+    return counts
+
+
+def verify(character_ids: list) -> dict:
+    """所持コインと取引履歴の合計の差（lost）と、負の残高のキャラクター数を返す"""
+    db = SessionLocal()
+    try:
+        ledger = dict(db.execute(
+            select(CoinTransaction.character_id, func.sum(CoinTransaction.amount))
+            .where(CoinTransaction.character_id.in_(character_ids))
+            .group_by(CoinTransaction.character_id)
+        ).all())
+        coins = dict(db.execute(select(Character.id, Character.coins).where(Character.id.in_(character_ids))).all())
+    finally:
+        db.close()
+    return {
+        "lost": sum(abs(coins[cid] - ledger.get(cid, 0)) for cid in character_ids),
+        "negative": sum(1 for cid in character_ids if coins[cid] < 0)
+    }
+
+
+def create_characters(count: int) -> list:
+    db = SessionLocal()
+    try:
+        characters = [Character(name=f"bench-optimistic-{i}", coins=0, experience=0) for i in range(count)]
+        db.add_all(characters)
+        db.commit()
+        return [character.id for character in characters]
+    finally:
+        db.close()
+
+
+def delete_characters(character_ids: list):
+    db = SessionLocal()
+    try:
+        db.execute(delete(CoinTransaction).where(CoinTransaction.character_id.in_(character_ids)))
+        db.execute(delete(Character).where(Character.id.in_(character_ids)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--operations", type=int, default=200, help="スレッドあたりの操作数")
+    parser.add_argument("--characters", type=int, default=2, help="更新が集中するキャラクター数")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    create_tables()
+    print(f"{'strategy':<12} {'ops/s':>9} {'ok':>7} {'no coins':>9} {'409':>5} {'locked':>7} {'lost':>6} {'negative':>9}")
+    failed = False
+    for strategy in args.strategies:
+        character_ids = create_characters(args.characters)
+        try:
+            counts = run(strategy, character_ids, args.threads, args.operations, args.seed)
+            result = verify(character_ids)
+        finally:
+            delete_characters(character_ids)
+        print(
+            f"{strategy:<12} {counts['ops_per_second']:>9.1f} {counts['ok']:>7} {counts['insufficient']:>9} "
+            f"{counts['conflict']:>5} {counts['locked']:>7} {result['lost']:>6} {result['negative']:>9}"
+        )
+        if strategy != "naive" and (result["lost"] or result["negative"]):
+            failed = True
+    if failed:
+        print("❌ 更新の消失または残高不足の消費があります")
+        raise SystemExit(1)
+    print("✅ optimistic / pessimistic で更新の消失はありません")
+
+
+if __name__ == "__main__":
+    main()
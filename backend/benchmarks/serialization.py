@@ -0,0 +1,120 @@
+"""
+一覧APIのレスポンス出力速度を比較する（response_model 経由 / fast_json.py の列タプル＋orjson）
+
+一時ディレクトリに study_game.db を作り、1キャラクターに --rows 件の学習セッションとコイン取引を登録してから、
+次の2つのエンドポイントで全件取得を繰り返し rows/sec を計測します。
+- model : 変更前の実装（ORMオブジェクトを response_model で検証してJSON化）
+- fast  : main.py の現在の実装（列のタプルを検証なしで orjson 出力）
+両者のレスポンスが同じJSONになることも確認します。
+
+    cd backend
+    python -m benchmarks.serialization --rows 50000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # database.py はカレントディレクトリの study_game.db を使うので、空のDBを用意してから読み込む
+    workdir = tempfile.mkdtemp(prefix="serialization-")
+    os.chdir(workdir)
+    open("study_game.db", "w").close()
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi import FastAPI, Depends
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+
+    from database import get_db, create_tables, SessionLocal, Character, StudySession, CoinTransaction
+    from schemas import StudySessionResponse, CoinTransactionResponse
+    import main as app_module
+
+    create_tables()
+    db = SessionLocal()
+    character = Character(name="serialization-bench")
+    db.add(character)
+    db.commit()
+    character_id = character.id
+    started = datetime(2025, 1, 1, 9, 0, 0, 123456)
+    db.execute(insert(StudySession), [
+        {
+            "character_id": character_id,
+            "duration": 25.5 + i % 60,
+            "subject": f"subject {i % 17}",
+            "started_at": started + timedelta(minutes=i),
+            "ended_at": started + timedelta(minutes=i, seconds=1530)
+        }
+        for i in range(args.rows)
+    ])
+    db.execute(insert(CoinTransaction), [
+        {
+            "character_id": character_id,
+            "amount": 10 + i % 50,
+            "transaction_type": "earned",
+            "source": "study",
+            "created_at": started + timedelta(minutes=i)
+        }
+        for i in range(args.rows)
+    ])
+    db.commit()
+    db.close()
+
+    app = FastAPI()
+
+    # 変更前の実装
+    @app.get("/model/sessions/{character_id}", response_model=List[StudySessionResponse])
+    def model_sessions(character_id: int, db: Session = Depends(get_db)):
+        return db.query(StudySession).filter(
+            StudySession.character_id == character_id,
+            StudySession.ended_at.isnot(None)
+        ).order_by(StudySession.started_at.desc()).all()
+
+    @app.get("/model/coins/{character_id}/transactions", response_model=List[CoinTransactionResponse])
+    def model_transactions(character_id: int, db: Session = Depends(get_db)):
+        return db.query(CoinTransaction).filter(
+            CoinTransaction.character_id == character_id
+        ).order_by(CoinTransaction.created_at.desc()).all()
+
+    app.get("/fast/sessions/{character_id}")(app_module.get_character_sessions)
+    app.get("/fast/coins/{character_id}/transactions")(app_module.get_coin_transactions)
+
+    client = TestClient(app)
+    print(f"{'endpoint':<28} {'model rows/s':>14} {'fast rows/s':>14} {'speedup':>8}")
+    for name, path in (("sessions", "/{mode}/sessions/{id}"), ("coins/transactions", "/{mode}/coins/{id}/transactions")):
+        rates = {}
+        bodies = {}
+        for mode in ("model", "fast"):
+            url = path.format(mode=mode, id=character_id)
+            bodies[mode] = client.get(url).content  # ウォームアップ
+            elapsed = []
+            for _ in range(args.repeat):
+                begin = time.perf_counter()
+                response = client.get(url)
+                elapsed.append(time.perf_counter() - begin)
+                response.raise_for_status()
+            rates[mode] = args.rows / min(elapsed)
+        if json.loads(bodies["model"]) != json.loads(bodies["fast"]):
+            raise SystemExit(f"❌ {name}: model と fast のレスポンスが一致しません")
+        print(f"{name:<28} {rates['model']:>14,.0f} {rates['fast']:>14,.0f} {rates['fast'] / rates['model']:>7.1f}x")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+資格・試験予定の一括登録（CSV / JSON）
+
+POST /certifications を1件ずつ呼ぶと、行数分の往復とコミットが発生します。ここでは
+- 全行を CertificationCreate / ExamScheduleCreate で検証し、ITSSレベル・日付もまとめて確認する
+  （日付の解釈は POST /certifications と同じ parse_date。同じ文字列は1回だけ解釈する。オフセット付きの日時はUTCに直す）
+- キャラクターの存在は1回のクエリでまとめて確認する
+- 正しい行だけを executemany の INSERT 1回で登録し、変更カウンタの更新と合わせて1トランザクションでコミットする
+行ごとの結果（created / error）をレポートとして返します。
+
+    cd backend
+    python bulk_import.py certifications cohort_certifications.csv
+    python bulk_import.py exam-schedules cohort_exams.json
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from database import Character, Certification, ExamSchedule
+from schemas import CertificationCreate, ExamScheduleCreate
+from etags import bump_revisions
+from reminders import reminder_scheduler
+
+# 1リクエストで受け付ける最大件数
+BULK_IMPORT_LIMIT = int(os.getenv("BULK_IMPORT_LIMIT", "10000"))
+
+INVALID_DATE_MESSAGE = "Invalid date format. Use YYYY-MM-DD or ISO format"
+INVALID_ITSS_MESSAGE = "ITSS level must be between 1 and 7"
+
+
+def parse_date(value: str) -> datetime:
+    """
+    資格の取得日・試験日の文字列を datetime にする（ISO形式 または YYYY-MM-DD、解釈できなければ ValueError）。
+    POST/PUT /certifications・/exam-schedules と一括登録で共通。DBの日時はタイムゾーンなしのUTCなので、
+    オフセット付きの値はUTCに直す（"2025-10-19T00:00:00+09:00" は 2025-10-18 15:00 になる）。
+    オフセットなしの値と YYYY-MM-DD はそのまま保存する
+    """
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return datetime.strptime(value, '%Y-%m-%d')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _check_certification(item: CertificationCreate) -> Optional[str]:
+    if item.itss_level < 1 or item.itss_level > 7:
+        return INVALID_ITSS_MESSAGE
+    return None
+
+
+# 種類 -> (モデル, 入力スキーマ, 日付の列, 追加の検証)
+IMPORT_KINDS = {
+    "certifications": (Certification, CertificationCreate, "obtained_date", _check_certification),
+    "exam-schedules": (ExamSchedule, ExamScheduleCreate, "exam_date", None),
+}
+
+
+def parse_csv(text: str) -> List[dict]:
+    """ヘッダー付きCSVを行ごとの辞書にする（空欄は未指定として扱い、スキーマの既定値を使う）"""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    return [
+        {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+        for row in reader
+    ]
+
+
+def import_records(db: Session, kind: str, raw_items: list) -> dict:
+    """資格 または 試験予定を検証して一括登録し、1件ごとの結果レポートを返す"""
+    model, schema, date_field, check = IMPORT_KINDS[kind]
+    results = [None] * len(raw_items)
+    valid = []
+    parsed_dates = {}
+
+    # 1. 入力・ITSSレベル・日付を検証
+    for index, raw in enumerate(raw_items):
+        try:
+            item = schema.model_validate(raw)
+        except ValidationError as e:
+            results[index] = {"index": index, "status": "error", "error": e.errors(include_url=False)}
+            continue
+        error = check(item) if check else None
+        row = item.model_dump()
+        value = row[date_field]
+        if error is None and value:
+            if value not in parsed_dates:
+                try:
+                    parsed_dates[value] = parse_date(value)
+                except ValueError:
+                    parsed_dates[value] = None
+            row[date_field] = parsed_dates[value]
+            if row[date_field] is None:
+                error = INVALID_DATE_MESSAGE
+        if error:
+            results[index] = {"index": index, "status": "error", "error": error}
+            continue
+        valid.append((index, row))
+
+    # 2. 対象キャラクターの存在をまとめて確認
+    character_ids = {row["character_id"] for _, row in valid}
+    existing = set()
+    if character_ids:
+        existing = set(db.scalars(select(Character.id).where(Character.id.in_(character_ids))).all())
+
+    accepted = []
+    for index, row in valid:
+        if row["character_id"] not in existing:
+            results[index] = {"index": index, "status": "error", "error": "Character not found"}
+            continue
+        accepted.append((index, row))
+
+    # 3. executemany で一括INSERTし、変更カウンタ（ETag）と合わせて1回でコミット
+    if accepted:
+        try:
+            db.execute(insert(model), [row for _, row in accepted])
+            db.execute(bump_revisions({row["character_id"] for _, row in accepted}))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        for index, _ in accepted:
+            results[index] = {"index": index, "status": "created"}
+        if model is ExamSchedule:
+            # executemany では採番されたIDが返らないので、対象キャラクターの試験予定を読み直す
+            reminder_scheduler.load(db, {row["character_id"] for _, row in accepted})
+
+    return {
+        "received": len(raw_items),
+        "created": len(accepted),
+        "failed": len(raw_items) - len(accepted),
+        "results": results
+    }
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="資格・試験予定の一括登録")
+    parser.add_argument("kind", choices=sorted(IMPORT_KINDS))
+    parser.add_argument("path", help="CSV（ヘッダー付き）または JSON配列のファイル")
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        text = f.read()
+    items = parse_csv(text) if args.path.lower().endswith(".csv") else json.loads(text)
+
+    db = SessionLocal()
+    try:
+        report = import_records(db, args.kind, items)
+    finally:
+        db.close()
+
+    for result in report["results"]:
+        if result["status"] == "error":
+            print(f"❌ {result['index'] + 1} 件目: {result['error']}")
+    print(f"{report['received']} 件中 {report['created']} 件を登録しました（エラー {report['failed']} 件）")
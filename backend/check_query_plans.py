@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+main.py の全エンドポイントが発行するSQLの実行計画を確認するスクリプト
+
+study_game.db を一時ディレクトリにコピーし、そのコピーに宣言済みインデックスを作成してから
+全エンドポイントを順に呼び出します。発行された SELECT / UPDATE / DELETE 文を EXPLAIN QUERY PLAN にかけ、
+インデックスを使わない全件走査（SCAN <table>）があれば一覧を出して終了コード1で終わります（SQLite のみ対応）。
+
+    cd backend
+    python check_query_plans.py
+"""
+
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 全件取得が仕様どおりのもの（エンドポイント, テーブル）
+ALLOWED_FULL_SCANS = {
+    ("GET /characters", "characters"),  # 互換モードの全件一覧
+    ("startup", "equipment"),  # 装備マスターのキャッシュ読み込み（数十行）
+    ("POST /admin/equipment/catalog/reload", "equipment"),
+    ("startup", "characters"),  # ランキングの作り直し
+    ("startup", "study_sessions"),  # リース切れタイマーの掃除（起動時のみ）
+    ("startup", "exam_schedules"),  # リマインダーのスケジューラーへの読み込み（起動時のみ）
+    # 全件エクスポート（主キー順に全行を読む）
+    ("GET /export/{table}", "study_sessions"),
+    ("GET /export/{table}", "coin_transactions"),
+    ("GET /export/{table}", "certifications"),
+    ("GET /export/{table}", "exam_schedules"),
+}
+
+SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+
+
+def main() -> int:
+    workdir = tempfile.mkdtemp(prefix="query-plans-")
+    shutil.copy(os.path.join(BACKEND_DIR, "study_game.db"), workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ["ADMIN_TOKEN"] = "query-plan-check"
+
+    from sqlalchemy import event
+    from fastapi.routing import APIRoute
+    from fastapi.testclient import TestClient
+
+    import database
+    from migrations import upgrade
+
+    upgrade()
+
+    import main as app_module
+
+    captured = []
+    current = {"route": "startup"}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(" ", 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+            params = parameters[0] if executemany else parameters
+            captured.append((current["route"], statement, params))
+
+    for engine in (database.get_engine(), database.get_async_engine().sync_engine):
+        event.listen(engine, "before_cursor_execute", capture)
+
+    with TestClient(app_module.app) as client:
+        def call(method: str, template: str, path_params: dict = None, **kwargs):
+            current["route"] = f"{method} {template}"
+            response = client.request(method, template.format(**(path_params or {})), **kwargs)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{current['route']} -> {response.status_code}: {response.text}")
+            if not response.headers.get("content-type", "").startswith("application/json"):
+                return response.text
+            return response.json()
+
+        character_id = call("POST", "/characters", json={"name": "plan-check"})["id"]
+        cid = {"character_id": character_id}
+        call("GET", "/characters")
+        page = call("GET", "/characters", params={"limit": 1})
+        if page["next_cursor"]:
+            call("GET", "/characters", params={"limit": 1, "cursor": page["next_cursor"]})
+        call("GET", "/characters/{character_id}", cid)
+        call("GET", "/characters/{character_id}/appearance", cid)
+        call("GET", "/characters/{character_id}/with-certifications", cid)
+
+        call("POST", "/sessions/bulk", json=[{"character_id": character_id, "duration": 600}] * 3)
+        session_id = call("POST", "/timer/start", json={"character_id": character_id})["session_id"]
+        call("POST", "/timer/heartbeat", json={"session_id": session_id})
+        call("GET", "/metrics")
+        call("POST", "/timer/stop", json={"session_id": session_id})
+        page = call("GET", "/sessions/{character_id}", cid, params={"limit": 1})
+        call("GET", "/sessions/{character_id}", cid, params={"limit": 1, "cursor": page["next_cursor"]})
+        call("GET", "/sessions/{character_id}", cid)
+        call("GET", "/stats/{character_id}", cid, params={"start": "2025-01-01", "end": "2030-12-31"})
+
+        call("GET", "/leaderboard")
+        call("GET", "/leaderboard/rank/{character_id}", cid)
+        call("POST", "/admin/leaderboard/consistency", headers={"X-Admin-Token": "query-plan-check"})
+
+        certification = call("POST", "/certifications", json={
+            "character_id": character_id, "name": "plan-check", "itss_level": 2, "obtained_date": "2025-01-01"
+        })
+        certification_id = {"certification_id": certification["id"]}
+        call("POST", "/certifications/bulk", json=[
+            {"character_id": character_id, "name": "plan-check bulk", "itss_level": 3, "obtained_date": "2025-02-01"}
+        ])
+        call("GET", "/certifications/{character_id}", cid)
+        call("GET", "/certifications/{character_id}", cid, params={"limit": 1})
+        call("PUT", "/certifications/{certification_id}", certification_id, json={"itss_level": 3})
+        call("GET", "/certifications/{certification_id}/color", certification_id)
+        call("DELETE", "/certifications/{certification_id}", certification_id)
+
+        catalog = call("GET", "/equipment")
+        color = next(item["id"] for item in catalog if item["category"] == "color")
+        call("GET", "/equipment/shop/{character_id}", cid)
+        call("POST", "/equipment/purchase", json={"character_id": character_id, "equipment_id": color})
+        call("POST", "/equipment/equip", json={"character_id": character_id, "equipment_id": color, "equip": True})
+        call("POST", "/equipment/equip", json={"character_id": character_id, "equipment_id": color, "equip": False})
+        call("GET", "/equipment/{character_id}", cid)
+        call("POST", "/equipment/bonuses", json=[character_id, 1])
+        call("POST", "/admin/equipment/catalog/reload", headers={"X-Admin-Token": "query-plan-check"})
+        call("POST", "/admin/coins/reconcile", headers={"X-Admin-Token": "query-plan-check"})
+        call("GET", "/coins/{character_id}/transactions", cid)
+        page = call("GET", "/coins/{character_id}/transactions", cid, params={"limit": 1})
+        call("GET", "/coins/{character_id}/transactions", cid, params={"limit": 1, "cursor": page["next_cursor"]})
+
+        exam = call("POST", "/exam-schedules", json={
+            "character_id": character_id, "exam_name": "plan-check", "exam_date": "2030-04-01"
+        })
+        exam_id = {"exam_id": exam["id"]}
+        call("POST", "/exam-schedules/bulk", content="character_id,exam_name,exam_date\n%d,plan-check bulk,2030-05-01\n" % character_id,
+             headers={"Content-Type": "text/csv"})
+        call("GET", "/exam-schedules/{character_id}", cid)
+        call("GET", "/exam-schedules/{character_id}", cid, params={"limit": 1})
+        call("GET", "/exam-schedules/calendar/{character_id}", cid, params={"year": 2030, "month": 4})
+        call("PUT", "/exam-schedules/{exam_id}", exam_id, json={"status": "scheduled"})
+        call("GET", "/exam-schedules/upcoming/{character_id}", cid, params={"days": 3650})
+        # 明日の試験はすぐにリマインダーが発火する（スケジューラーはバックグラウンドで動くので少し待つ）
+        due_exam = call("POST", "/exam-schedules", json={
+            "character_id": character_id, "exam_name": "plan-check due", "exam_date": (date.today() + timedelta(days=1)).isoformat()
+        })
+        for _ in range(50):
+            reminders = call("GET", "/reminders/due/{character_id}", cid)
+            if reminders:
+                break
+            time.sleep(0.05)
+        else:
+            raise RuntimeError("reminder for plan-check due was not fired")
+        call("POST", "/reminders/{reminder_id}/delivered", {"reminder_id": reminders[0]["id"]})
+        call("GET", "/reminders/stats")
+        call("DELETE", "/exam-schedules/{exam_id}", {"exam_id": due_exam["id"]})
+        call("DELETE", "/exam-schedules/{exam_id}", exam_id)
+
+        for table in ("sessions", "coin-transactions", "certifications", "exam-schedules"):
+            call("GET", "/export/{table}/{character_id}", {"table": table, **cid}, params={"format": "csv"})
+            call("GET", "/export/{table}", {"table": table}, headers={"X-Admin-Token": "query-plan-check"})
+
+        routes = {
+            f"{method} {route.path}"
+            for route in app_module.app.routes if isinstance(route, APIRoute)
+            for method in route.methods
+        }
+
+    # 実行計画を確認
+    connection = sqlite3.connect("study_game.db")
+    violations = []
+    checked = 0
+    for route, statement, params in captured:
+        plan = connection.execute(f"EXPLAIN QUERY PLAN {statement}", params or ()).fetchall()
+        checked += 1
+        for row in plan:
+            match = SCAN_PATTERN.match(row[-1])
+            if match and (route, match.group(1)) not in ALLOWED_FULL_SCANS:
+                violations.append((route, match.group(1), " ".join(statement.split())))
+    connection.close()
+
+    exercised = {route for route, _, _ in captured} | {"POST /characters"}
+    untested = sorted(routes - exercised)
+
+    print(f"{checked} 件のSQLを確認しました（{len(routes)} エンドポイント）")
+    for route in untested:
+        print(f"⚠️  SQLを発行しなかったエンドポイント: {route}")
+    for route, table, statement in violations:
+        print(f"❌ {route}: {table} を全件走査しています\n    {statement}")
+    if not violations:
+        print("✅ すべてのクエリがインデックスを使用しています")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
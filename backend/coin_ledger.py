@@ -0,0 +1,213 @@
+"""
+コイン残高（characters.coins）と取引履歴（coin_transactions）の突き合わせ
+
+キャラクターごとに「この取引IDまでを反映した残高」をチェックポイントとして保存し、
+突き合わせではチェックポイント以降の取引だけを合計します。
+    期待残高 = チェックポイントの残高 + チェックポイント以降の取引の合計
+一致したキャラクターはチェックポイントを進め、一致しないキャラクターは差分（drift）として報告します。
+MySQL の AUTO_INCREMENT はコミット順ではない（小さいIDの取引が後からコミットされることがある）ため、
+チェックポイントは COIN_CHECKPOINT_SETTLE_SECONDS より前に作られた取引までしか進めません。
+それより新しい取引は毎回チェックポイントの後ろとして合計し直します。
+キャラクターはID順に chunk_size 件ずつ処理するため、全キャラクターでもメモリ使用量は一定です。
+
+    cd backend
+    python coin_ledger.py            # チェックポイント以降だけを確認
+    python coin_ledger.py --full     # チェックポイントを使わず全履歴を合計（チェックポイント自体の検証）
+    python coin_ledger.py --repair   # 差分を調整取引（transaction_type="adjustment"）として記録
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, insert, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+
+from database import Character, CoinTransaction, CoinBalanceCheckpoint
+
+checkpoint_table = CoinBalanceCheckpoint.__table__
+
+# この秒数より前に作られた取引はコミット済みとみなし、チェックポイントに含める
+COIN_CHECKPOINT_SETTLE_SECONDS = int(os.getenv("COIN_CHECKPOINT_SETTLE_SECONDS", "300"))
+
+# レポートに載せる差分の件数の上限（件数自体は drift_count に全件数える）
+MAX_REPORTED_DRIFTS = 1000
+
+
+def checkpoint_upsert_statement(dialect_name: str):
+    """キャラクターのチェックポイントを書き込む UPSERT 文"""
+    if dialect_name == "mysql":
+        stmt = mysql_insert(checkpoint_table)
+        return stmt.on_duplicate_key_update(
+            balance=stmt.inserted.balance,
+            last_transaction_id=stmt.inserted.last_transaction_id,
+            checked_at=stmt.inserted.checked_at
+        )
+    stmt = sqlite_insert(checkpoint_table)
+    return stmt.on_conflict_do_update(
+        index_elements=[checkpoint_table.c.character_id],
+        set_={
+            "balance": stmt.excluded.balance,
+            "last_transaction_id": stmt.excluded.last_transaction_id,
+            "checked_at": stmt.excluded.checked_at
+        }
+    )
+
+
+def ledger_chunk_query(after_id: int, chunk_size: int, full: bool = False, settled_before: Optional[datetime] = None):
+    """
+    キャラクター chunk_size 件分の (id, coins, チェックポイント, 以降の取引の合計, 次のチェックポイント) を取得する select 文。
+    残高と取引の合計を1つの文で読むので、突き合わせ中に購入などが行われても同じ時点の値どうしを比べられる。
+    次のチェックポイントは settled_before より前に作られた取引の最大IDと、そこまでの残高
+    """
+    if settled_before is None:
+        settled_before = datetime.utcnow() - timedelta(seconds=COIN_CHECKPOINT_SETTLE_SECONDS)
+    if full:
+        base_balance = 0
+        after_transaction = 0
+    else:
+        base_balance = func.coalesce(CoinBalanceCheckpoint.balance, 0)
+        after_transaction = func.coalesce(CoinBalanceCheckpoint.last_transaction_id, 0)
+
+    # ix_coin_transactions_character_ledger (character_id, id, amount) だけで計算される
+    newer = (
+        CoinTransaction.character_id == Character.id,
+        CoinTransaction.id > after_transaction
+    )
+    ledger_sum = select(func.coalesce(func.sum(CoinTransaction.amount), 0)).where(*newer).scalar_subquery()
+    # ix_coin_transactions_character_created (character_id, created_at) と主キーだけで求まる
+    def settled_last_id(transaction):
+        return (
+            select(func.max(transaction.id))
+            .where(
+                transaction.character_id == Character.id,
+                transaction.id > after_transaction,
+                transaction.created_at < settled_before
+            )
+            .correlate(Character, CoinBalanceCheckpoint)
+            .scalar_subquery()
+        )
+
+    settled = aliased(CoinTransaction)
+    settled_sum = (
+        select(func.coalesce(func.sum(CoinTransaction.amount), 0))
+        .where(*newer, CoinTransaction.id <= settled_last_id(settled))
+        .scalar_subquery()
+    )
+
+    return (
+        select(
+            Character.id,
+            Character.coins,
+            CoinBalanceCheckpoint.last_transaction_id.label("checkpoint_transaction_id"),
+            (base_balance + ledger_sum).label("expected"),
+            settled_last_id(CoinTransaction).label("last_transaction_id"),
+            (base_balance + settled_sum).label("settled_balance")
+        )
+        .outerjoin(CoinBalanceCheckpoint, CoinBalanceCheckpoint.character_id == Character.id)
+        .where(Character.id > after_id)
+        .order_by(Character.id)
+        .limit(chunk_size)
+    )
+
+
+def reconcile_coins(db: Session, chunk_size: int = 1000, full: bool = False, repair: bool = False) -> dict:
+    """
+    全キャラクターの残高を取引履歴と突き合わせる。
+    repair=True の場合は差分を調整取引として記録する（チェックポイントは次回の突き合わせで進む）
+    """
+    started = time.perf_counter()
+    upsert = checkpoint_upsert_statement(db.get_bind().dialect.name)
+    report = {
+        "characters": 0,
+        "checkpoints_written": 0,
+        "drift_count": 0,
+        "drifts": [],
+        "repaired": 0
+    }
+    last_id = 0
+    while True:
+        rows = db.execute(ledger_chunk_query(last_id, chunk_size, full)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        checkpoints = []
+        adjustments = []
+        now = datetime.utcnow()
+        for row in rows:
+            coins = row.coins or 0
+            # MySQL の SUM() は Decimal を返すので整数にそろえる
+            expected = int(row.expected)
+            drift = coins - expected
+            if drift != 0:
+                report["drift_count"] += 1
+                if len(report["drifts"]) < MAX_REPORTED_DRIFTS:
+                    report["drifts"].append({
+                        "character_id": row.id,
+                        "balance": coins,
+                        "expected": expected,
+                        "drift": drift
+                    })
+                if repair:
+                    adjustments.append({
+                        "character_id": row.id,
+                        "amount": drift,
+                        "transaction_type": "adjustment",
+                        "source": "reconciliation",
+                        "created_at": now
+                    })
+            elif row.last_transaction_id is not None and (
+                row.checkpoint_transaction_id is None or row.last_transaction_id > row.checkpoint_transaction_id
+            ):
+                # 確定した新しい取引があったキャラクターだけチェックポイントを進める（それ以降の取引は次回も合計する）
+                checkpoints.append({
+                    "character_id": row.id,
+                    "balance": int(row.settled_balance),
+                    "last_transaction_id": row.last_transaction_id,
+                    "checked_at": now
+                })
+
+        if checkpoints:
+            db.execute(upsert, checkpoints)
+        if adjustments:
+            db.execute(insert(CoinTransaction), adjustments)
+        db.commit()
+
+        report["characters"] += len(rows)
+        report["checkpoints_written"] += len(checkpoints)
+        report["repaired"] += len(adjustments)
+
+    report["consistent"] = report["drift_count"] == 0
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, create_tables
+
+    parser = argparse.ArgumentParser(description="コイン残高と取引履歴の突き合わせ")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--full", action="store_true", help="チェックポイントを使わず全履歴を合計する")
+    parser.add_argument("--repair", action="store_true", help="差分を調整取引として記録する")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        report = reconcile_coins(db, args.chunk_size, full=args.full, repair=args.repair)
+    finally:
+        db.close()
+
+    for drift in report["drifts"]:
+        print(f"❌ character_id={drift['character_id']}: 残高 {drift['balance']} / 履歴 {drift['expected']}（差 {drift['drift']:+d}）")
+    print(
+        f"{report['characters']} キャラクターを確認しました（差分 {report['drift_count']} 件、"
+        f"チェックポイント更新 {report['checkpoints_written']} 件、{report['elapsed_seconds']} 秒）"
+    )
+    if report["drift_count"] == 0:
+        print("✅ 残高と取引履歴は一致しています")
@@ -0,0 +1,130 @@
+"""
+レスポンスの gzip 圧縮
+
+履歴一覧や装備マスター・ショップのJSONは同じキーと日本語の文字列が繰り返されるため、gzip で大きく縮みます。
+- COMPRESSION_MIN_SIZE (1024) バイト未満のレスポンスは圧縮しない
+- Accept-Encoding を q値まで見て gzip を受け付けるクライアントにだけ圧縮して返す
+- @no_compression を付けたエンドポイント（/metrics・ストリーミングの /export）は圧縮しない
+- すでに Content-Encoding が付いたレスポンス（PrecompressedPayload）はそのまま返す
+圧縮したレスポンスの ETag は弱い ETag（W/"..."）にします（表現が変わるため。If-None-Match の比較は弱い比較）。
+"""
+
+import gzip
+import os
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from etags import etag_matches
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+
+# 圧縮しても縮まない・意味のない Content-Type
+INCOMPRESSIBLE_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def no_compression(endpoint: Callable) -> Callable:
+    """エンドポイントのレスポンスを圧縮しない（@app.get の下に付ける）"""
+    endpoint.no_compression = True
+    return endpoint
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Accept-Encoding が gzip（または *）を q>0 で受け付けているか"""
+    if not accept_encoding:
+        return False
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    if "gzip" in accepted:
+        return accepted["gzip"] > 0
+    return accepted.get("*", 0) > 0
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE, compresslevel: int = COMPRESSION_LEVEL) -> None:
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and accepts_gzip(Headers(scope=scope).get("accept-encoding")):
+            responder = _CompressionResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class _CompressionResponder(GZipResponder):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.scope = scope
+
+        async def send_weakening_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and not self.content_encoding_set:
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if headers.get("content-encoding") == "gzip" and etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+            await send(message)
+
+        self.send = send_weakening_etag
+        await self.app(scope, receive, self.send_with_gzip)
+
+    async def send_with_gzip(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            await super().send_with_gzip(message)
+            # ルーティング後なので scope["endpoint"] で対象のエンドポイントが分かる
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                getattr(self.scope.get("endpoint"), "no_compression", False)
+                or message["status"] in (204, 304)
+                or content_type.startswith(INCOMPRESSIBLE_TYPES)
+            ):
+                # Content-Encoding 付きと同じ扱いにして素通しさせる
+                self.content_encoding_set = True
+            return
+        await super().send_with_gzip(message)
+
+
+class PrecompressedPayload:
+    """
+    めったに変わらないJSON（装備マスターなど）を、版番号ごとに非圧縮・gzip の両方で1回だけ作っておく。
+    版番号が変わったら build() を呼び直して作り直す
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._cached = (None, b"", b"", "")
+
+    def prepare(self, version, build: Callable[[], bytes]) -> tuple:
+        """版番号の (非圧縮, gzip, ETag) を返す（未作成なら作る。起動時のウォームアップでも呼ぶ）"""
+        cached_version, body, compressed, etag = self._cached
+        if cached_version != version or not body:
+            body = build()
+            compressed = gzip.compress(body, compresslevel=9)
+            etag = f'"{self.name}-{version}"'
+            self._cached = (version, body, compressed, etag)
+        return body, compressed, etag
+
+    def response(self, request: Request, version, build: Callable[[], bytes]) -> Response:
+        body, compressed, etag = self.prepare(version, build)
+
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if accepts_gzip(request.headers.get("accept-encoding")):
+            headers["Content-Encoding"] = "gzip"
+            headers["ETag"] = f"W/{etag}"
+            return Response(compressed, media_type="application/json", headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
@@ -1,10 +1,20 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, ForeignKey, Text
+from sqlalchemy import create_engine, inspect, select, func, Column, Integer, String, DateTime, Date, Float, ForeignKey, Text, Index
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from datetime import datetime
+from typing import Optional
 import os
+import threading
 from dotenv import load_dotenv
 
+from engine_profiles import engine_options, apply_profile
+from metrics import instrument_engine
+from replicas import current_replica
+
 load_dotenv()
 
 # データベース接続設定
@@ -14,17 +24,97 @@ DB_NAME = os.getenv("DB_NAME", "study_game")
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
 
-# MySQLを使用する場合とSQLiteを使用する場合を環境に応じて切り替え
-if DB_HOST == "localhost" and os.path.exists("./study_game.db"):
-    # ローカル開発時はSQLiteを使用
-    DATABASE_URL = "sqlite:///./study_game.db"
-    engine = create_engine(DATABASE_URL)
-else:
+# 起動時に確認するスキーマの版（migrations.py の最後のマイグレーションの版と一致させる）
+SCHEMA_VERSION = 11
+
+
+def database_urls() -> tuple:
+    """接続先の (同期URL, 非同期URL)。エンジンを初めて使うときに決める"""
+    # MySQLを使用する場合とSQLiteを使用する場合を環境に応じて切り替え
+    if DB_HOST == "localhost" and os.path.exists("./study_game.db"):
+        # ローカル開発時はSQLiteを使用
+        return "sqlite:///./study_game.db", "sqlite+aiosqlite:///./study_game.db"
     # Docker環境ではMySQLを使用
-    DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    engine = create_engine(DATABASE_URL, echo=True)
+    return (
+        f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+        f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+    )
+
+
+# エンジンは import 時ではなく最初に使うときに作る（import だけのスクリプトや起動直後の負荷を減らす）
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    engine = _engines.get("sync")
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get("sync")
+            if engine is None:
+                url = database_urls()[0]
+                # 接続先ごとのチューニング（SQLite の PRAGMA、MySQL のプール設定）は engine_profiles.py を参照
+                engine = apply_profile(create_engine(url, **engine_options(url)))
+                # SQL文の件数・時間とコネクションプールの取得時間を /metrics 用に計測（metrics.py）
+                _engines["sync"] = instrument_engine(engine, "sync")
+    return engine
+
+
+def get_async_engine() -> AsyncEngine:
+    engine = _engines.get("async")
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get("async")
+            if engine is None:
+                url = database_urls()[1]
+                engine = create_async_engine(url, **engine_options(url))
+                apply_profile(engine.sync_engine)
+                instrument_engine(engine.sync_engine, "async")
+                _engines["async"] = engine
+    return engine
+
+
+async def dispose_async_engine():
+    """プールしている非同期の接続を閉じる（aiosqlite は接続ごとのスレッドが残るとプロセスが終了しない）"""
+    engine = _engines.pop("async", None)
+    if engine is not None:
+        await engine.dispose()
+
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _is_write(session: Session, clause) -> bool:
+    return session._flushing or isinstance(clause, UpdateBase)
+
+
+class LazyEngineSession(Session):
+    """
+    bind を指定しなければ get_engine() のエンジンを使うセッション
+    （use_replica を付けたリクエストの読み取りはレプリカに送る。replicas.py）
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.bind is None:
+            replica = current_replica()
+            if replica is not None and not _is_write(self, clause):
+                return replica.engine
+            return get_engine()
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+class LazyAsyncEngineSession(Session):
+    """AsyncSession の内部で使うセッション（get_async_engine() のエンジンを使う）"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.bind is None:
+            replica = current_replica()
+            if replica is not None and not _is_write(self, clause):
+                return replica.async_engine.sync_engine
+            return get_async_engine().sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+SessionLocal = sessionmaker(class_=LazyEngineSession, autocommit=False, autoflush=False)
+# 非同期エンドポイント用（コミット後にレスポンスを組み立てるため expire_on_commit=False）
+AsyncSessionLocal = async_sessionmaker(sync_session_class=LazyAsyncEngineSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -37,7 +127,24 @@ class StudySession(Base):
     duration = Column(Float, nullable=False)  # 学習時間（分）
     subject = Column(String(200))
     started_at = Column(DateTime, default=datetime.utcnow)
-    ended_at = Column(DateTime)
+    ended_at = Column(DateTime)  # NULL の間は実行中タイマー
+    heartbeat_at = Column(DateTime)  # タイマーの最終ハートビート（リース延長）
+    
+    __table_args__ = (
+        # 履歴一覧・統計・期間指定はすべて character_id + started_at で絞り込む
+        Index("ix_study_sessions_character_started", "character_id", "started_at", "ended_at"),
+        # 実行中タイマー（ended_at IS NULL）の件数・リース切れの掃除
+        Index("ix_study_sessions_ended_at", "ended_at"),
+    )
+
+# 日別学習集計（stop_timer / 一括登録で加算し、/stats はこの表だけを読む）
+class StudyDailyRollup(Base):
+    __tablename__ = "study_daily_rollups"
+    
+    character_id = Column(Integer, ForeignKey("characters.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # 学習開始日（started_at の日付）
+    minutes = Column(Float, nullable=False, default=0.0)  # 学習時間合計（分）
+    session_count = Column(Integer, nullable=False, default=0)  # 完了セッション数
 
 # 資格モデル
 class Certification(Base):
@@ -54,6 +161,10 @@ class Certification(Base):
     
     # リレーション
     character = relationship("Character", back_populates="certifications")
+    
+    __table_args__ = (
+        Index("ix_certifications_character_created", "character_id", "created_at"),
+    )
 
 # キャラクターモデルを更新
 class Character(Base):
@@ -66,12 +177,21 @@ class Character(Base):
     experience = Column(Integer, default=0)
     coins = Column(Integer, default=0)  # 所持コイン
     current_color = Column(String(20), default="#8B4513")  # 現在の色
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # 楽観的排他制御用（optimistic.py）
+    revision = Column(Integer, nullable=False, default=0, server_default="0")  # 関連データも含めた変更カウンタ（etags.py）
     created_at = Column(DateTime, default=datetime.utcnow)
+    # UPDATE 文（versioned_update・bump_revision を含む）のたびに更新。ランキングの差分読み込みに使う（leaderboard.py）
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # リレーション
     certifications = relationship("Certification", back_populates="character")
     equipment = relationship("CharacterEquipment", back_populates="character")
     exam_schedules = relationship("ExamSchedule", back_populates="character")
+    
+    __table_args__ = (
+        Index("ix_characters_created_at", "created_at"),
+        Index("ix_characters_updated_at", "updated_at"),
+    )
 
 # 装備アイテムマスター
 class Equipment(Base):
@@ -83,8 +203,20 @@ class Equipment(Base):
     price = Column(Integer, nullable=False)
     description = Column(Text)
     color_code = Column(String(10))  # 色装備の場合のカラーコード
+    # 装備ボーナス（equipment_bonus.py で組み合わせごとに計算）
+    experience_multiplier = Column(Float, nullable=False, default=1.0, server_default="1.0")
+    coin_multiplier = Column(Float, nullable=False, default=1.0, server_default="1.0")
+    special_effect = Column(String(100))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# マスターデータの版番号（キャッシュの無効化に使う）
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+    
+    name = Column(String(50), primary_key=True)  # "equipment"
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 # キャラクターの装備情報
 class CharacterEquipment(Base):
     __tablename__ = "character_equipment"
@@ -98,6 +230,13 @@ class CharacterEquipment(Base):
     # リレーション
     character = relationship("Character", back_populates="equipment")
     equipment_item = relationship("Equipment")
+    
+    __table_args__ = (
+        # 同じ装備を二重に所持しない（購入時の所持チェックもこの索引を使う）
+        Index("uq_character_equipment_character_equipment", "character_id", "equipment_id", unique=True),
+        # 装備中アイテムの取得（外見・装備ボーナス）
+        Index("ix_character_equipment_character_equipped", "character_id", "is_equipped", "equipment_id"),
+    )
 
 # コイン取得履歴
 class CoinTransaction(Base):
@@ -106,11 +245,26 @@ class CoinTransaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     character_id = Column(Integer, ForeignKey("characters.id"), nullable=False)
     amount = Column(Integer, nullable=False)  # 取得/消費したコイン数
-    transaction_type = Column(String(20), nullable=False)  # "earned", "spent"
+    transaction_type = Column(String(20), nullable=False)  # "earned", "spent", "adjustment"（突き合わせの調整）, "opening"（開始残高）
     source = Column(String(50))  # "study", "equipment_purchase"等
     study_session_id = Column(Integer, ForeignKey("study_sessions.id"))
     equipment_id = Column(String(50), ForeignKey("equipment.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_coin_transactions_character_created", "character_id", "created_at"),
+        # 残高チェックポイント以降の取引だけを合計するため（amount まで含めてテーブルを読まずに済ませる）
+        Index("ix_coin_transactions_character_ledger", "character_id", "id", "amount"),
+    )
+
+# コイン残高のチェックポイント（coin_ledger.py の突き合わせで更新）
+class CoinBalanceCheckpoint(Base):
+    __tablename__ = "coin_balance_checkpoints"
+    
+    character_id = Column(Integer, ForeignKey("characters.id"), primary_key=True)
+    balance = Column(Integer, nullable=False)  # last_transaction_id までの取引を反映した残高
+    last_transaction_id = Column(Integer, nullable=False)
+    checked_at = Column(DateTime, default=datetime.utcnow)
 
 # 試験予定モデル
 class ExamSchedule(Base):
@@ -129,6 +283,29 @@ class ExamSchedule(Base):
     
     # リレーション
     character = relationship("Character", back_populates="exam_schedules")
+    
+    __table_args__ = (
+        Index("ix_exam_schedules_character_date_status", "character_id", "exam_date", "status"),
+    )
+
+# 発火したリマインダー（reminders.py のスケジューラーが書き込み、クライアントは /reminders/due で受け取る）
+class ReminderOutbox(Base):
+    __tablename__ = "reminder_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    exam_schedule_id = Column(Integer, ForeignKey("exam_schedules.id", ondelete="CASCADE"), nullable=False)
+    character_id = Column(Integer, ForeignKey("characters.id", ondelete="CASCADE"), nullable=False)
+    exam_name = Column(String(200), nullable=False)
+    exam_date = Column(DateTime, nullable=False)
+    remind_at = Column(DateTime, nullable=False)  # exam_date - reminder_days
+    fired_at = Column(DateTime, default=datetime.utcnow)
+    delivered_at = Column(DateTime)  # クライアントが受け取り済みにした日時
+    
+    __table_args__ = (
+        # 複数ワーカー・再起動で同じリマインダーを二重に書き込まない
+        Index("uq_reminder_outbox_exam_remind_at", "exam_schedule_id", "remind_at", unique=True),
+        Index("ix_reminder_outbox_character_delivered", "character_id", "delivered_at", "remind_at"),
+    )
 
 def get_db():
     db = SessionLocal()
@@ -137,5 +314,70 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# 適用したマイグレーションの版（migrations.py。適用した版ごとに1行）
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100))
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+# マイグレーション中のバックフィルの進捗（中断しても last_key の続きから再開する）
+class MigrationCheckpoint(Base):
+    __tablename__ = "migration_checkpoints"
+    
+    version = Column(Integer, primary_key=True)
+    step = Column(String(100), primary_key=True)
+    last_key = Column(Integer, nullable=False, default=0)  # 処理済みの主キーの最大値
+    rows_done = Column(Integer, nullable=False, default=0)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+def stamp_schema_version(connection, version: int, name: str):
+    connection.execute(SchemaVersion.__table__.insert(), {"version": version, "name": name, "applied_at": datetime.utcnow()})
+
 def create_tables():
+    """
+    全テーブルを作成する（既存テーブルはそのまま）。空のデータベースに作った場合は最新の版として記録する
+    （既存のデータベースの列・インデックスの変更は migrations.py で行う）
+    """
+    engine = get_engine()
+    fresh = not inspect(engine).get_table_names()
     Base.metadata.create_all(bind=engine)
+    if fresh:
+        try:
+            with engine.begin() as connection:
+                stamp_schema_version(connection, SCHEMA_VERSION, "create_all")
+        except IntegrityError:
+            pass  # 同時に起動した別のワーカーが記録済み
+
+def current_schema_version(engine: Optional[Engine] = None) -> Optional[int]:
+    """データベースのスキーマの版（schema_version が未作成・空なら None）"""
+    try:
+        with (engine or get_engine()).connect() as connection:
+            return connection.scalar(select(func.max(SchemaVersion.version)))
+    except (OperationalError, ProgrammingError):
+        return None
+
+def ensure_schema() -> Optional[int]:
+    """
+    起動時のスキーマ確認。schema_version を1回読み、SCHEMA_VERSION と一致すれば何もしない
+    （空のデータベースなら create_tables() で作る。未適用のマイグレーションがあれば起動しない。確認前の版を返す）
+    """
+    engine = get_engine()
+    version = current_schema_version(engine)
+    if version == SCHEMA_VERSION:
+        return version
+    if version is not None and version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this application ({SCHEMA_VERSION})")
+    if version is None and not inspect(engine).get_table_names():
+        create_tables()
+        return version
+    raise RuntimeError(
+        f"Database schema version {version} is older than this application ({SCHEMA_VERSION}). "
+        "Run `python migrations.py upgrade` first"
+    )
@@ -0,0 +1,100 @@
+"""
+データベースエンジンのチューニングプロファイル
+
+接続先（SQLite / MySQL）に応じて create_engine の引数と接続時の設定を切り替えます。
+各値は環境変数で上書きできます。
+
+SQLite（接続ごとに PRAGMA を適用）
+- SQLITE_JOURNAL_MODE (WAL)       : 読み取りと書き込みが互いをブロックしない
+- SQLITE_SYNCHRONOUS (NORMAL)     : WAL 時はコミットごとの fsync を省略しても破損しない
+- SQLITE_BUSY_TIMEOUT_MS (5000)   : 書き込みロック待ちで即 "database is locked" にしない
+- SQLITE_CACHE_SIZE (-64000)      : ページキャッシュ（負値はKB単位、約64MB）
+- SQLITE_MMAP_SIZE (268435456)    : メモリマップI/O（256MB）
+- SQLITE_FOREIGN_KEYS (ON)
+- SQLITE_ASYNC_POOL_SIZE (10) / SQLITE_ASYNC_MAX_OVERFLOW (20) : aiosqlite の接続を使い回すプール
+  （既定の NullPool ではリクエストごとに接続と PRAGMA の適用をやり直す）
+
+MySQL（コネクションプール）
+- DB_POOL_SIZE (10) / DB_MAX_OVERFLOW (20) / DB_POOL_RECYCLE (1800秒) / DB_POOL_PRE_PING (true)
+- DB_ISOLATION_LEVEL (READ COMMITTED) : 楽観的排他制御の再試行で最新の値を読み直せるようにする
+- DB_ECHO (false) : SQL をすべてログ出力する（デバッグ用）
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+def sqlite_pragmas() -> dict:
+    """接続ごとに適用する SQLite の PRAGMA"""
+    return {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-64000")),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),
+        "foreign_keys": os.getenv("SQLITE_FOREIGN_KEYS", "ON"),
+    }
+
+
+def engine_options(url: str) -> dict:
+    """接続URLに応じた create_engine / create_async_engine の引数"""
+    options = {"echo": _env_bool("DB_ECHO", "false")}
+    if url.startswith("mysql"):
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", "true"),
+            isolation_level=os.getenv("DB_ISOLATION_LEVEL", "READ COMMITTED"),
+        )
+    elif url.startswith("sqlite+aiosqlite"):
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=int(os.getenv("SQLITE_ASYNC_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("SQLITE_ASYNC_MAX_OVERFLOW", "20")),
+        )
+    return options
+
+
+def apply_profile(engine: Engine) -> Engine:
+    """エンジンに接続時の設定を登録する（非同期エンジンは sync_engine を渡す）"""
+    if engine.dialect.name == "sqlite":
+        pragmas = sqlite_pragmas()
+
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+    return engine
+
+
+def describe_engine(engine: Engine) -> dict:
+    """実際に適用されている設定を返す（起動時のログ出力用）"""
+    settings = {"dialect": engine.dialect.name, "driver": engine.dialect.driver, "echo": engine.echo}
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            for name in sqlite_pragmas():
+                settings[name] = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+    else:
+        pool = engine.pool
+        settings.update(
+            pool_class=type(pool).__name__,
+            pool_size=pool.size() if hasattr(pool, "size") else None,
+            max_overflow=getattr(pool, "_max_overflow", None),
+            pool_recycle=getattr(pool, "_recycle", None),
+            pool_pre_ping=getattr(pool, "_pre_ping", None),
+            isolation_level=engine.dialect.isolation_level,
+        )
+    return settings
@@ -0,0 +1,90 @@
+"""
+装備ボーナス表
+
+equipment テーブルの experience_multiplier / coin_multiplier / special_effect 列を、
+装備マスターの読み込み時にボーナスを持つ装備だけの表へまとめます（equipment_catalog.py から作成）。
+装備の組み合わせ（frozenset）ごとの計算結果をメモ化するため、タイマー停止や外見取得のたびに
+ボーナス辞書を組み立て直すことはありません。装備マスターを読み込み直すと表ごと作り直されます。
+"""
+
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import select
+
+from database import CharacterEquipment
+
+# メモ化する組み合わせ数の上限（超えたら作り直す）
+BONUS_MEMO_SIZE = int(os.getenv("BONUS_MEMO_SIZE", "4096"))
+
+# POST /equipment/bonuses で1回に指定できるキャラクター数の上限
+BONUS_BATCH_LIMIT = 1000
+
+# (経験値倍率, コイン倍率, 特殊効果)
+NO_BONUS = (1.0, 1.0, ())
+
+
+class BonusTable:
+    def __init__(self, items: Iterable):
+        # ボーナスのない装備（色など）は表に入れない
+        self._effects = {}
+        for item in items:
+            effects = (item.special_effect,) if item.special_effect else ()
+            if item.experience_multiplier != 1.0 or item.coin_multiplier != 1.0 or effects:
+                self._effects[item.id] = (item.experience_multiplier, item.coin_multiplier, effects)
+        self._memo = {frozenset(): NO_BONUS}
+
+    def __len__(self) -> int:
+        return len(self._effects)
+
+    def combination(self, equipment_ids: Iterable[str]) -> Tuple[float, float, tuple]:
+        """装備IDの組み合わせに対する (経験値倍率, コイン倍率, 特殊効果) を返す"""
+        # ボーナスのない装備を除いてからキーにするので、色違いなどは同じ組み合わせとして扱われる
+        key = frozenset(equipment_id for equipment_id in equipment_ids if equipment_id in self._effects)
+        result = self._memo.get(key)
+        if result is None:
+            experience_multiplier = 1.0
+            coin_multiplier = 1.0
+            effects = []
+            for equipment_id in sorted(key):
+                item_experience, item_coin, item_effects = self._effects[equipment_id]
+                experience_multiplier *= item_experience
+                coin_multiplier *= item_coin
+                effects.extend(item_effects)
+            result = (experience_multiplier, coin_multiplier, tuple(effects))
+            if len(self._memo) >= BONUS_MEMO_SIZE:
+                self._memo = {frozenset(): NO_BONUS}
+            self._memo[key] = result
+        return result
+
+    def bonus(self, equipment_ids: Iterable[str]) -> dict:
+        """装備による能力ボーナスをAPIレスポンスの形式で返す"""
+        experience_multiplier, coin_multiplier, effects = self.combination(equipment_ids)
+        return {
+            "experience_multiplier": experience_multiplier,
+            "coin_multiplier": coin_multiplier,
+            "special_effects": list(effects)
+        }
+
+    def bonuses(self, equipped_by_character: Dict[int, Iterable[str]], character_ids: Iterable[int]) -> Dict[int, dict]:
+        """複数キャラクター分のボーナスをまとめて計算（装備のないキャラクターはボーナスなし）"""
+        return {
+            character_id: self.bonus(equipped_by_character.get(character_id, ()))
+            for character_id in character_ids
+        }
+
+
+def equipped_ids_query(character_ids: Iterable[int]):
+    """複数キャラクターの装備中アイテムを1回で取得する select 文"""
+    return select(CharacterEquipment.character_id, CharacterEquipment.equipment_id).where(
+        CharacterEquipment.character_id.in_(list(character_ids)),
+        CharacterEquipment.is_equipped == 1
+    )
+
+
+def group_equipped(rows) -> Dict[int, List[str]]:
+    """equipped_ids_query の結果をキャラクターごとにまとめる"""
+    equipped = {}
+    for character_id, equipment_id in rows:
+        equipped.setdefault(character_id, []).append(equipment_id)
+    return equipped
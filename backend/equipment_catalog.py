@@ -0,0 +1,107 @@
+"""
+装備マスター（equipment テーブル）のプロセス内キャッシュ
+
+装備マスターはほぼ変化しないため、起動時に全件を読み込み、ID引き・カテゴリ別一覧をメモリから返します。
+変更は catalog_versions テーブルの版番号で検知します。
+- init_equipment.py や管理APIで装備を書き換えたら bump_catalog_version() で版番号を上げる
+- 各ワーカーは CATALOG_REFRESH_SECONDS ごとに版番号だけを確認し、変わっていれば読み込み直す
+リクエスト処理中にDBへ問い合わせることはありません。
+"""
+
+import os
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from database import Equipment, CatalogVersion
+from equipment_bonus import BonusTable
+
+EQUIPMENT_CATALOG = "equipment"
+
+# 他のワーカーによる更新を確認する間隔（秒）
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+
+# 装備1件分（Equipment と同じ属性名なのでレスポンスモデルにもそのまま渡せる）
+CatalogItem = namedtuple(
+    "CatalogItem",
+    "id name category price description color_code experience_multiplier coin_multiplier special_effect"
+)
+
+
+def get_catalog_version(db: Session) -> int:
+    version = db.scalar(select(CatalogVersion.version).where(CatalogVersion.name == EQUIPMENT_CATALOG))
+    return version or 0
+
+
+def bump_catalog_version(db: Session) -> int:
+    """装備マスターの版番号を上げる（呼び出し元でコミットする）"""
+    result = db.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.name == EQUIPMENT_CATALOG)
+        .values(version=CatalogVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        db.add(CatalogVersion(name=EQUIPMENT_CATALOG, version=1, updated_at=datetime.utcnow()))
+        db.flush()
+    return get_catalog_version(db)
+
+
+class EquipmentCatalog:
+    def __init__(self):
+        # 読み込みごとに丸ごと差し替えるので、参照側はロック不要
+        self._snapshot = (0, [], {}, {}, BonusTable([]))
+
+    @property
+    def version(self) -> int:
+        return self._snapshot[0]
+
+    def load(self, db: Session) -> int:
+        """equipment テーブルを読み込む。読み込んだ版番号を返す"""
+        version = get_catalog_version(db)
+        items = [
+            CatalogItem(*row)
+            for row in db.execute(select(
+                Equipment.id, Equipment.name, Equipment.category,
+                Equipment.price, Equipment.description, Equipment.color_code,
+                Equipment.experience_multiplier, Equipment.coin_multiplier, Equipment.special_effect
+            ))
+        ]
+        by_id = {item.id: item for item in items}
+        by_category = {}
+        for item in items:
+            by_category.setdefault(item.category, []).append(item)
+        self._snapshot = (version, items, by_id, by_category, BonusTable(items))
+        return version
+
+    def refresh_if_stale(self, db: Session) -> bool:
+        """版番号が変わっていれば読み込み直す"""
+        if get_catalog_version(db) != self.version:
+            self.load(db)
+            return True
+        return False
+
+    def all(self) -> List[CatalogItem]:
+        return self._snapshot[1]
+
+    def get(self, equipment_id: str) -> Optional[CatalogItem]:
+        return self._snapshot[2].get(equipment_id)
+
+    def by_category(self, category: str) -> List[CatalogItem]:
+        return self._snapshot[3].get(category, [])
+
+    def ids_in_category(self, category: str) -> List[str]:
+        return [item.id for item in self.by_category(category)]
+
+    def bonus(self, equipment_ids: Iterable[str]) -> dict:
+        """装備中アイテムIDの組み合わせから能力ボーナスを取得"""
+        return self._snapshot[4].bonus(equipment_ids)
+
+    def bonuses(self, equipped_by_character: Dict[int, Iterable[str]], character_ids: Iterable[int]) -> Dict[int, dict]:
+        """複数キャラクター分の能力ボーナスをまとめて取得"""
+        return self._snapshot[4].bonuses(equipped_by_character, character_ids)
+
+
+equipment_catalog = EquipmentCatalog()
@@ -0,0 +1,75 @@
+"""
+キャラクター単位の ETag / 条件付きGET
+
+characters.revision は、そのキャラクターに関わるデータを書き換えるたびに1ずつ増える変更カウンタです
+（キャラクター本体は optimistic.versioned_update、資格・試験予定・タイマー開始・装備は bump_revision で加算）。
+キャラクター別の参照APIは revision とURL（パス＋クエリ）から強い ETag を作り、If-None-Match が一致すれば
+本来のクエリもシリアライズも行わずに 304 Not Modified を返します。確認に使うのは主キーでの revision 1列の取得だけです。
+"""
+
+import hashlib
+from typing import Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Character
+from replicas import replica_router
+
+
+def bump_revision(character_id: int):
+    """キャラクターの変更カウンタを進める UPDATE 文（書き込みと同じトランザクションで実行する）"""
+    # 書き込んだ直後の読み取りはレプリカではなくプライマリから返す（replicas.py）
+    replica_router.pin(character_id)
+    return update(Character).where(Character.id == character_id).values(revision=Character.revision + 1)
+
+
+def bump_revisions(character_ids):
+    """複数キャラクターの変更カウンタをまとめて進める UPDATE 文（一括登録用）"""
+    replica_router.pin(*character_ids)
+    return update(Character).where(Character.id.in_(character_ids)).values(revision=Character.revision + 1)
+
+
+def make_etag(character_id: int, revision: int, request: Request, *extra) -> str:
+    """revision・URL・追加の要素（日付やマスターの版番号など）から強い ETag を作る"""
+    key = "|".join(str(part) for part in (request.url.path, request.url.query, *extra))
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return f'"{character_id}-{revision}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match（カンマ区切り・弱い比較）に etag が含まれるか"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _conditional(character_id: int, revision: Optional[int], request: Request, response: Response, extra) -> Tuple[Optional[int], Optional[Response]]:
+    if revision is None:
+        return None, None
+    etag = make_etag(character_id, revision, request, *extra)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return revision, Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return revision, None
+
+
+async def conditional_get(db: AsyncSession, character_id: int, request: Request, response: Response, *extra) -> Tuple[Optional[int], Optional[Response]]:
+    """
+    (revision, 304 レスポンス) を返す。変更がなければ 304 レスポンスを、変更があれば response に ETag を付けて None を返す。
+    キャラクターが存在しない場合は (None, None)。404 は呼び出し元で revision を見て返す
+    """
+    revision = await db.scalar(select(Character.revision).where(Character.id == character_id))
+    return _conditional(character_id, revision, request, response, extra)
+
+
+def conditional_get_sync(db: Session, character_id: int, request: Request, response: Response, *extra) -> Tuple[Optional[int], Optional[Response]]:
+    """conditional_get の同期版"""
+    revision = db.scalar(select(Character.revision).where(Character.id == character_id))
+    return _conditional(character_id, revision, request, response, extra)
@@ -0,0 +1,120 @@
+"""
+学習履歴のエクスポート（NDJSON / CSV）
+
+study_sessions・coin_transactions・certifications・exam_schedules を、1キャラクター分または全件、
+サーバー側カーソル（yield_per）で EXPORT_CHUNK_SIZE 行ずつ読みながら書き出します。
+行をまとめてメモリに載せないので、100行でも1000万行でもメモリ使用量は一定です。
+- 1キャラクター分は既存のインデックス（character_id + 日時）の順に読む
+- 全件は主キー順に読む
+
+    cd backend
+    python export.py sessions --character-id 1 --format csv > sessions.csv
+    python export.py coin-transactions --output coins.ndjson
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from database import SessionLocal, StudySession, CoinTransaction, Certification, ExamSchedule
+from fast_json import dumps
+
+# サーバー側カーソルから一度に受け取る行数（= 1回に書き出す行数）
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# テーブル名 -> (モデル, 1キャラクター分を読む順序)
+# 順序はインデックスの列（+ 末尾の主キー）と同じにして、DB側でも並べ替えのための一時領域を使わない
+EXPORT_TABLES = {
+    "sessions": (StudySession, ("started_at", "ended_at", "id")),
+    "coin-transactions": (CoinTransaction, ("id",)),
+    "certifications": (Certification, ("created_at", "id")),
+    "exam-schedules": (ExamSchedule, ("exam_date", "status", "id")),
+}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def export_query(table: str, character_id: Optional[int] = None):
+    model, character_order = EXPORT_TABLES[table]
+    columns = list(model.__table__.columns)
+    query = select(*columns)
+    if character_id is None:
+        return columns, query.order_by(model.id)
+    query = query.where(model.character_id == character_id)
+    return columns, query.order_by(*(getattr(model, name) for name in character_order))
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_chunk(rows, names) -> bytes:
+    return b"".join(dumps(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+def _csv_chunk(rows, writer, buffer: io.StringIO) -> bytes:
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    chunk = buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def export_stream(table: str, export_format: str = "ndjson", character_id: Optional[int] = None) -> Iterator[bytes]:
+    """
+    エクスポートの本文を EXPORT_CHUNK_SIZE 行ごとのバイト列で返すジェネレーター。
+    StreamingResponse が送り終わるまで読み続けるため、リクエストのセッションではなく自前のセッションを使う
+    """
+    columns, query = export_query(table, character_id)
+    names = [column.key for column in columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if export_format == "csv":
+        writer.writerow(names)
+        yield _csv_chunk([], writer, buffer)
+
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        for rows in result.partitions():
+            if export_format == "csv":
+                yield _csv_chunk(rows, writer, buffer)
+            else:
+                yield _ndjson_chunk(rows, names)
+    finally:
+        db.close()
+
+
+def export_filename(table: str, export_format: str, character_id: Optional[int] = None) -> str:
+    scope = f"character-{character_id}" if character_id is not None else "all"
+    return f"{table}-{scope}.{export_format}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="学習履歴のエクスポート")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("--character-id", type=int, help="指定しなければ全キャラクター分")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--output", help="出力ファイル（指定しなければ標準出力）")
+    args = parser.parse_args()
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_stream(args.table, args.format, args.character_id):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
@@ -0,0 +1,52 @@
+"""
+件数の多い一覧APIのための高速なレスポンス出力
+
+通常の経路（ORMオブジェクト → response_model で1行ずつ検証 → JSON）は、数万行の履歴では
+ORMオブジェクトの生成と Pydantic の from_attributes 検証が処理時間の大半を占めます。
+DBの値はすでに列の型どおりなので、ここでは
+- レスポンスモデルのフィールドと同じ列だけをタプルで取得し（ORMオブジェクトを作らない）
+- 辞書に詰めて検証なしでそのまま orjson で出力します（orjson がなければ標準の json）
+出力されるJSONは response_model を通した場合と同じです（benchmarks/serialization.py で比較できます）。
+"""
+
+import json
+from datetime import date, datetime
+from typing import Iterable, List, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson がない環境では標準の json で出力する
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """検証済みの辞書・リストをそのまま高速にJSON化するレスポンス"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def response_columns(model, schema: Type[BaseModel]) -> list:
+    """レスポンスモデルのフィールドと同名のモデル列（select(*columns) 用）"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows_as_dicts(rows: Iterable, columns: list) -> List[dict]:
+    """select(*columns) の結果を列名をキーにした辞書のリストにする"""
+    names = [column.key for column in columns]
+    return [dict(zip(names, row)) for row in rows]
@@ -49,17 +49,17 @@ def calculate_coins(study_minutes: float) -> int:
     return base_coins + bonus_coins
 
 def get_available_equipment() -> dict:
-    """購入可能な装備一覧を取得"""
+    """購入可能な装備一覧を取得（ボーナスを持つ装備は倍率と特殊効果も含む）"""
     equipment_list = {
         "accessories": [
             {"id": "hat", "name": "帽子", "price": 50, "description": "おしゃれな帽子"},
-            {"id": "glasses", "name": "眼鏡", "price": 100, "description": "知的な眼鏡"},
-            {"id": "book", "name": "本", "price": 30, "description": "学習の友"},
-            {"id": "crown", "name": "王冠", "price": 500, "description": "王者の証"},
-            {"id": "robe", "name": "ローブ", "price": 200, "description": "魔法使いのローブ"},
-            {"id": "sword", "name": "剣", "price": 300, "description": "勇者の剣"},
-            {"id": "shield", "name": "盾", "price": 250, "description": "守護の盾"},
-            {"id": "staff", "name": "杖", "price": 400, "description": "魔法の杖"},
+            {"id": "glasses", "name": "眼鏡", "price": 100, "description": "知的な眼鏡", "experience_multiplier": 1.05, "special_effect": "集中力向上"},
+            {"id": "book", "name": "本", "price": 30, "description": "学習の友", "experience_multiplier": 1.05, "special_effect": "知識の蓄積"},
+            {"id": "crown", "name": "王冠", "price": 500, "description": "王者の証", "experience_multiplier": 1.2, "special_effect": "王者の威厳"},
+            {"id": "robe", "name": "ローブ", "price": 200, "description": "魔法使いのローブ", "experience_multiplier": 1.15, "special_effect": "魔法の加護"},
+            {"id": "sword", "name": "剣", "price": 300, "description": "勇者の剣", "coin_multiplier": 1.1, "special_effect": "戦士の勇気"},
+            {"id": "shield", "name": "盾", "price": 250, "description": "守護の盾", "experience_multiplier": 1.1, "special_effect": "守護の力"},
+            {"id": "staff", "name": "杖", "price": 400, "description": "魔法の杖", "coin_multiplier": 1.15, "special_effect": "魔法の知識"},
         ],
         "colors": [
             {"id": "red", "name": "赤色", "price": 80, "color": "#FF6347"},
@@ -71,31 +71,3 @@ def get_available_equipment() -> dict:
         ]
     }
     return equipment_list
-
-def calculate_equipment_bonus(equipment_list: list) -> dict:
-    """装備による能力ボーナスを計算"""
-    # 装備の種類に応じて経験値ボーナスを付与
-    bonus = {
-        "experience_multiplier": 1.0,
-        "coin_multiplier": 1.0,
-        "special_effects": []
-    }
-    
-    equipment_bonuses = {
-        "crown": {"experience_multiplier": 1.2, "special_effects": ["王者の威厳"]},
-        "robe": {"experience_multiplier": 1.15, "special_effects": ["魔法の加護"]},
-        "sword": {"coin_multiplier": 1.1, "special_effects": ["戦士の勇気"]},
-        "shield": {"experience_multiplier": 1.1, "special_effects": ["守護の力"]},
-        "staff": {"coin_multiplier": 1.15, "special_effects": ["魔法の知識"]},
-        "book": {"experience_multiplier": 1.05, "special_effects": ["知識の蓄積"]},
-        "glasses": {"experience_multiplier": 1.05, "special_effects": ["集中力向上"]},
-    }
-    
-    for equipment in equipment_list:
-        if equipment in equipment_bonuses:
-            item_bonus = equipment_bonuses[equipment]
-            bonus["experience_multiplier"] *= item_bonus.get("experience_multiplier", 1.0)
-            bonus["coin_multiplier"] *= item_bonus.get("coin_multiplier", 1.0)
-            bonus["special_effects"].extend(item_bonus.get("special_effects", []))
-    
-    return bonus
@@ -4,12 +4,14 @@
 """
 
 from sqlalchemy.orm import sessionmaker
-from database import engine, Equipment
+from database import get_engine, create_tables, Equipment
 from game_logic import get_available_equipment
+from equipment_catalog import bump_catalog_version
 
 def init_equipment_data():
     """装備マスターデータをデータベースに登録"""
-    SessionLocal = sessionmaker(bind=engine)
+    create_tables()
+    SessionLocal = sessionmaker(bind=get_engine())
     db = SessionLocal()
     
     try:
@@ -36,7 +38,10 @@ def init_equipment_data():
                 name=item["name"],
                 category="accessory",
                 price=item["price"],
-                description=item["description"]
+                description=item["description"],
+                experience_multiplier=item.get("experience_multiplier", 1.0),
+                coin_multiplier=item.get("coin_multiplier", 1.0),
+                special_effect=item.get("special_effect")
             )
             db.add(equipment)
         
@@ -52,8 +57,10 @@ def init_equipment_data():
             )
             db.add(equipment)
         
+        # 起動中のサーバーの装備キャッシュを無効化
+        version = bump_catalog_version(db)
         db.commit()
-        print(f"装備データの初期化が完了しました。")
+        print(f"装備データの初期化が完了しました。（カタログ版番号: {version}）")
         print(f"アクセサリー: {len(equipment_data['accessories'])} 件")
         print(f"カラー: {len(equipment_data['colors'])} 件")
         
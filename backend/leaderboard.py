@@ -0,0 +1,165 @@
+"""
+キャラクターのランキング（リーダーボード）
+
+経験値・総学習時間・コインごとに (−スコア, キャラクターID) の順序付きリストをメモリ上に持ち、
+上位取得・順位検索・スコア更新をいずれも O(log n) で行います。
+起動時に characters テーブルから作り直し、stop_timer や購入などの書き込み時に更新します。
+
+各ワーカーは自分が処理した書き込みだけをすぐに反映し、他のワーカーの書き込みは
+LEADERBOARD_REFRESH_SECONDS ごとの refresh（main.py）で取り込みます。refresh は全件を読み直さず、
+characters.updated_at が前回以降のキャラクターだけを読んで1件ずつ反映します（コミットの遅れや時計のずれに備えて
+LEADERBOARD_REFRESH_OVERLAP_SECONDS だけ遡る）。characters.revision が手元より古い行は反映しません。
+ずれは check_consistency（POST /admin/leaderboard/consistency）で確認できます。
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sortedcontainers import SortedList
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import Character
+
+LEADERBOARD_METRICS = ("experience", "total_study_time", "coins")
+
+# 他のワーカーの書き込みを取り込む間隔（秒）と、前回の読み込みから遡る秒数
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "60"))
+LEADERBOARD_REFRESH_OVERLAP_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_OVERLAP_SECONDS", "60"))
+
+# ランキング表示に使うキャラクター情報
+_ENTRY_FIELDS = ("name", "level") + LEADERBOARD_METRICS
+
+
+class Leaderboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._indexes = {metric: SortedList() for metric in LEADERBOARD_METRICS}
+        self._revisions = {}  # character_id -> 反映済みの characters.revision
+        self._refreshed_at = None  # 最後に読み込みを始めた時刻（UTC）
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_from(character) -> dict:
+        entry = {field: getattr(character, field) for field in _ENTRY_FIELDS}
+        for metric in LEADERBOARD_METRICS:
+            entry[metric] = entry[metric] or 0
+        return entry
+
+    def load(self, rows: Iterable) -> None:
+        """キャラクター一覧（Character もしくは同じ属性を持つ行）から作り直す"""
+        rows = list(rows)
+        entries = {row.id: self._entry_from(row) for row in rows}
+        indexes = {
+            metric: SortedList((-entry[metric], character_id) for character_id, entry in entries.items())
+            for metric in LEADERBOARD_METRICS
+        }
+        revisions = {row.id: row.revision for row in rows if getattr(row, "revision", None) is not None}
+        with self._lock:
+            self._entries = entries
+            self._indexes = indexes
+            self._revisions = revisions
+
+    def _columns(self):
+        return (Character.id, Character.revision, *(getattr(Character, f) for f in _ENTRY_FIELDS))
+
+    def rebuild(self, db: Session) -> int:
+        """characters テーブルから作り直し、件数を返す（起動時と整合性の修復用）"""
+        started = datetime.utcnow()
+        rows = db.execute(select(*self._columns())).all()
+        self.load(rows)
+        self._refreshed_at = started
+        return len(rows)
+
+    def refresh(self, db: Session) -> int:
+        """前回の読み込み以降に更新されたキャラクターだけを読み直して反映し、読んだ件数を返す"""
+        if self._refreshed_at is None:
+            return self.rebuild(db)
+        started = datetime.utcnow()
+        since = self._refreshed_at - timedelta(seconds=LEADERBOARD_REFRESH_OVERLAP_SECONDS)
+        rows = db.execute(select(*self._columns()).where(Character.updated_at >= since)).all()
+        for row in rows:
+            self.update(row)
+        self._refreshed_at = started
+        return len(rows)
+
+    def update(self, character) -> None:
+        """キャラクターのスコアを反映（新規キャラクターは追加）。revision が反映済みより古ければ無視する"""
+        entry = self._entry_from(character)
+        revision = getattr(character, "revision", None)
+        with self._lock:
+            if revision is not None:
+                if revision < self._revisions.get(character.id, revision):
+                    return
+                self._revisions[character.id] = revision
+            old = self._entries.get(character.id)
+            for metric in LEADERBOARD_METRICS:
+                if old is not None:
+                    if old[metric] == entry[metric]:
+                        continue
+                    self._indexes[metric].remove((-old[metric], character.id))
+                self._indexes[metric].add((-entry[metric], character.id))
+            self._entries[character.id] = entry
+
+    def _ranked(self, metric: str, character_id: int, score) -> dict:
+        # 同点は同順位（自分より高いスコアの人数 + 1）
+        rank = self._indexes[metric].bisect_left((-score, float("-inf"))) + 1
+        return {"rank": rank, "character_id": character_id, "score": score, **self._entries[character_id]}
+
+    def top(self, metric: str, offset: int = 0, limit: int = 20) -> List[dict]:
+        """上位から offset 件目以降を limit 件取得"""
+        with self._lock:
+            index = self._indexes[metric]
+            return [
+                self._ranked(metric, character_id, -negative_score)
+                for negative_score, character_id in index.islice(offset, offset + limit)
+            ]
+
+    def rank(self, metric: str, character_id: int) -> Optional[dict]:
+        """キャラクターの順位を取得。未登録なら None"""
+        with self._lock:
+            entry = self._entries.get(character_id)
+            if entry is None:
+                return None
+            return self._ranked(metric, character_id, entry[metric])
+
+    def check_consistency(self, db: Session, chunk_size: int = 10000) -> dict:
+        """characters テーブルとの差分を調べる"""
+        mismatched = []
+        seen = set()
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(Character.id, *(getattr(Character, f) for f in _ENTRY_FIELDS))
+                .where(Character.id > last_id)
+                .order_by(Character.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            with self._lock:
+                for row in rows:
+                    seen.add(row.id)
+                    if self._entries.get(row.id) != self._entry_from(row):
+                        mismatched.append(row.id)
+            last_id = rows[-1].id
+
+        with self._lock:
+            stale = [character_id for character_id in self._entries if character_id not in seen]
+            indexes_ok = all(len(index) == len(self._entries) for index in self._indexes.values())
+
+        return {
+            "characters": len(seen),
+            "indexed": len(self._entries),
+            "mismatched": mismatched,
+            "stale": stale,
+            "consistent": not mismatched and not stale and indexes_ok
+        }
+
+
+leaderboard = Leaderboard()
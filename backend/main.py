@@ -1,30 +1,159 @@
-from fastapi import FastAPI, Depends, HTTPException
+# 起動時間をプロセスの開始に近いところから計るため、最初に import する
+from startup import startup_state, warm_pool, warm_async_pool, STARTUP_WARMUP, STARTUP_WARM_PROFILES
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Header
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, date, timedelta
+from typing import List, Optional, Union
 from contextlib import asynccontextmanager
+import asyncio
+import csv
+import hmac
+import os
 
-from database import get_db, create_tables, Character, StudySession, Certification, Equipment, CharacterEquipment, CoinTransaction, ExamSchedule
+from database import get_db, get_async_db, ensure_schema, get_engine, get_async_engine, dispose_async_engine, SessionLocal, AsyncSessionLocal, Character, StudySession, Certification, CharacterEquipment, CoinTransaction, ExamSchedule, ReminderOutbox
 from schemas import (
-    CharacterCreate, CharacterResponse, StudySessionCreate, StudySessionResponse, 
-    TimerStart, TimerStop, CertificationCreate, CertificationUpdate, CertificationResponse,
+    CharacterCreate, CharacterResponse, CharacterPage, StudySessionCreate, StudySessionResponse, StudySessionPage,
+    TimerStart, TimerStop, TimerHeartbeat, CertificationCreate, CertificationUpdate, CertificationResponse, CertificationPage,
     CharacterWithCertifications, EquipmentResponse, CharacterEquipmentResponse,
-    EquipmentPurchase, EquipmentEquip, CoinTransactionResponse,
-    ExamScheduleCreate, ExamScheduleUpdate, ExamScheduleResponse
+    EquipmentPurchase, EquipmentEquip, CoinTransactionResponse, CoinTransactionPage,
+    ExamScheduleCreate, ExamScheduleUpdate, ExamScheduleResponse, ExamSchedulePage, ReminderResponse
 )
-from game_logic import calculate_experience, calculate_level, get_character_appearance, get_next_level_exp, calculate_coins, get_available_equipment, calculate_equipment_bonus
+from game_logic import calculate_experience, calculate_level, get_character_appearance, get_next_level_exp, calculate_coins, get_available_equipment
+from timer_store import create_timer_store
+from engine_profiles import describe_engine
+from rollups import increment_statement, rollup_day, rollup_totals_query, rollup_range_query
+from leaderboard import leaderboard, LEADERBOARD_METRICS, LEADERBOARD_REFRESH_SECONDS
+from pagination import is_paginated, keyset_query, build_page
+from equipment_catalog import equipment_catalog, bump_catalog_version, CATALOG_REFRESH_SECONDS
+from session_ingest import ingest_sessions, parse_ndjson_lines, BULK_SESSION_LIMIT
+from profile_cache import profile_cache
+from equipment_bonus import equipped_ids_query, group_equipped, BONUS_BATCH_LIMIT
+from coin_ledger import reconcile_coins
+from optimistic import update_character
+from etags import bump_revision, conditional_get, conditional_get_sync
+from fast_json import FastJSONResponse, response_columns, rows_as_dicts, dumps
+from compression import CompressionMiddleware, PrecompressedPayload, no_compression
+from export import export_stream, export_filename, EXPORT_TABLES, EXPORT_FORMATS
+from bulk_import import import_records, parse_csv, parse_date, INVALID_DATE_MESSAGE, BULK_IMPORT_LIMIT
+from reminders import reminder_scheduler
+from replicas import replica_router, use_replica, REPLICA_HEALTH_CHECK_SECONDS
+import metrics
+import profiling
 
-# アクティブなタイマーセッションを管理しています。
-active_sessions = {}
+# アクティブなタイマーセッションを管理しています（TIMER_STORE で保存先を切り替え）。
+timer_store = create_timer_store()
+
+# 管理用APIのトークン（未設定の場合は管理用APIを無効化）
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+async def refresh_catalog_periodically():
+    """他のワーカーや init_equipment.py による装備マスターの更新を取り込む"""
+    while True:
+        await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                if await db.run_sync(equipment_catalog.refresh_if_stale):
+                    # 装備の色・ボーナスが変わりうるのでプロフィールを作り直させる
+                    profile_cache.clear()
+        except Exception as e:
+            print(f"Error refreshing equipment catalog: {e}")
+
+def refresh_leaderboard():
+    db = SessionLocal()
+    try:
+        leaderboard.refresh(db)
+    finally:
+        db.close()
+
+async def refresh_leaderboard_periodically():
+    """他のワーカーの書き込みをランキングに取り込む（前回以降に更新されたキャラクターだけを読む）"""
+    while True:
+        await asyncio.sleep(LEADERBOARD_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(refresh_leaderboard)
+        except Exception as e:
+            print(f"Error refreshing leaderboard: {e}")
+
+async def check_replicas_periodically():
+    """リードレプリカのヘルスチェック（失敗・遅延の大きいものは振り分けから外す）"""
+    while True:
+        await run_in_threadpool(replica_router.check_all)
+        await asyncio.sleep(REPLICA_HEALTH_CHECK_SECONDS)
+
+async def warm_up():
+    """コネクションプールと頻繁に使うキャッシュを埋めてから準備完了にする（startup.py）"""
+    try:
+        if STARTUP_WARMUP:
+            with startup_state.phase("warmup_pool"):
+                await run_in_threadpool(warm_pool, get_engine())
+                await warm_async_pool(get_async_engine())
+            with startup_state.phase("warmup_caches"):
+                equipment_catalog_payload.prepare(equipment_catalog.version, equipment_catalog_json)
+                # ランキング上位のキャラクターはすぐにアクセスされるのでプロフィールを作っておく
+                async with AsyncSessionLocal() as db:
+                    for entry in leaderboard.top("experience", 0, STARTUP_WARM_PROFILES):
+                        try:
+                            await get_character_appearance_api(entry["character_id"], db)
+                        except HTTPException:
+                            pass
+    except Exception as e:
+        print(f"Error warming up: {e}")
+    startup_state.mark_ready()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    create_tables()
+    startup_state.begin()
+    # create_all（全テーブルの存在確認）ではなく schema_version を1回読むだけにする
+    with startup_state.phase("schema"):
+        ensure_schema()
+    print(f"Database engine settings: {describe_engine(get_engine())}")
+    db = SessionLocal()
+    try:
+        # リース切れで放置されたタイマーを片付ける
+        with startup_state.phase("timers"):
+            timer_store.expire(db)
+        # ランキングをDBから作り直す
+        with startup_state.phase("leaderboard"):
+            leaderboard.rebuild(db)
+        # 装備マスターをキャッシュに読み込む
+        with startup_state.phase("equipment_catalog"):
+            equipment_catalog.load(db)
+        # 予定中の試験のリマインダーを読み込む
+        with startup_state.phase("reminders"):
+            reminder_scheduler.load(db)
+    finally:
+        db.close()
+    # 同期エンドポイントもプロファイリングの対象にする
+    profiling.wrap_sync_endpoints(app)
+    catalog_refresher = asyncio.create_task(refresh_catalog_periodically())
+    leaderboard_refresher = asyncio.create_task(refresh_leaderboard_periodically())
+    reminder_runner = asyncio.create_task(reminder_scheduler.run())
+    replica_checker = asyncio.create_task(check_replicas_periodically()) if replica_router.replicas else None
+    warmup = asyncio.create_task(warm_up())
     yield
     # Shutdown
-    pass
+    tasks = [catalog_refresher, leaderboard_refresher, reminder_runner]
+    if replica_checker:
+        tasks.append(replica_checker)
+    for task in tasks:
+        task.cancel()
+    # 取り消したタスクが接続を返し終えてから、プールした非同期の接続を閉じる。
+    # ウォームアップは接続中に取り消すと aiosqlite の接続スレッドが残ってプロセスが終了しないので、終わるまで待つ
+    await asyncio.gather(warmup, *tasks, return_exceptions=True)
+    await replica_router.dispose()
+    await dispose_async_engine()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # 一致するまでの文字数で処理時間が変わらないよう compare_digest で比較する
+    if not ADMIN_TOKEN or not hmac.compare_digest((x_admin_token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Admin token required")
 
 app = FastAPI(title="Study Game API", lifespan=lifespan)
 
@@ -35,39 +164,69 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# レスポンスの gzip 圧縮（しきい値・除外は compression.py）
+app.add_middleware(CompressionMiddleware)
+
+# リクエスト単位のプロファイリング（X-Profile ヘッダー + 管理トークン、または PROFILE_SAMPLE_RATE。profiling.py）
+app.add_middleware(profiling.ProfilingMiddleware, admin_token=ADMIN_TOKEN)
+
+# ルートごとのレイテンシ・SQLの計測。add_middleware は後に追加したものほど外側になるので最後に追加し、
+# 圧縮とプロファイリングも含めた全リクエストを計る
+app.add_middleware(metrics.MetricsMiddleware)
+
+# 装備マスターのJSONは版番号ごとに圧縮済みのものを使い回す
+equipment_catalog_payload = PrecompressedPayload("equipment-catalog")
+
 # キャラクター関連API
 @app.post("/characters", response_model=CharacterResponse)
-def create_character(character: CharacterCreate, db: Session = Depends(get_db)):
+async def create_character(character: CharacterCreate, db: AsyncSession = Depends(get_async_db)):
     db_character = Character(name=character.name)
     db.add(db_character)
-    db.commit()
-    db.refresh(db_character)
+    await db.commit()
+    await db.refresh(db_character)
+    leaderboard.update(db_character)
+    # 作成直後の読み取りがレプリカの遅延で 404 にならないようにする
+    replica_router.pin(db_character.id)
     return db_character
 
-@app.get("/characters", response_model=List[CharacterResponse])
-def get_characters(db: Session = Depends(get_db)):
-    return db.query(Character).all()
+@app.get("/characters", response_model=Union[List[CharacterResponse], CharacterPage])
+async def get_characters(limit: Optional[int] = None, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    if not is_paginated(limit, cursor):
+        return (await db.scalars(select(Character))).all()
+    
+    query = keyset_query(select(Character), Character.created_at, Character.id, limit, cursor, descending=False)
+    return build_page((await db.scalars(query)).all(), limit, "created_at")
 
-@app.get("/characters/{character_id}", response_model=CharacterResponse)
-def get_character(character_id: int, db: Session = Depends(get_db)):
-    character = db.query(Character).filter(Character.id == character_id).first()
+@app.get("/characters/{character_id}", response_model=CharacterResponse, dependencies=[Depends(use_replica)])
+async def get_character(character_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    _, not_modified = await conditional_get(db, character_id, request, response)
+    if not_modified:
+        return not_modified
+    
+    character = await db.get(Character, character_id)
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     return character
 
-@app.get("/characters/{character_id}/appearance")
-def get_character_appearance_api(character_id: int, db: Session = Depends(get_db)):
-    character = db.query(Character).filter(Character.id == character_id).first()
+@app.get("/characters/{character_id}/appearance", dependencies=[Depends(use_replica)])
+async def get_character_appearance_api(character_id: int, db: AsyncSession = Depends(get_async_db)):
+    cached = profile_cache.get(character_id)
+    if cached is not None:
+        return cached
+    generation = profile_cache.generation(character_id)
+    
+    character = await db.get(Character, character_id)
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     
     # 装備中のアイテムを取得
-    equipped_items = db.query(CharacterEquipment).filter(
+    equipped_items = (await db.scalars(select(CharacterEquipment).where(
         CharacterEquipment.character_id == character_id,
         CharacterEquipment.is_equipped == 1
-    ).all()
+    ))).all()
     
     # 基本の外見を取得
     base_appearance = get_character_appearance(character.level)
@@ -77,7 +236,7 @@ def get_character_appearance_api(character_id: int, db: Session = Depends(get_db
     current_color = character.current_color
     
     for item in equipped_items:
-        equipment = db.query(Equipment).filter(Equipment.id == item.equipment_id).first()
+        equipment = equipment_catalog.get(item.equipment_id)
         if equipment:
             if equipment.category == "accessory":
                 equipped_accessories.append(equipment.id)
@@ -85,8 +244,7 @@ def get_character_appearance_api(character_id: int, db: Session = Depends(get_db
                 current_color = equipment.color_code
     
     # 装備ボーナス情報を取得
-    equipment_list = [item.equipment_id for item in equipped_items]
-    bonus = calculate_equipment_bonus(equipment_list)
+    bonus = equipment_catalog.bonus(item.equipment_id for item in equipped_items)
     
     appearance = {
         "color": current_color,
@@ -97,19 +255,21 @@ def get_character_appearance_api(character_id: int, db: Session = Depends(get_db
     
     next_level_exp = get_next_level_exp(character.level)
     
-    return {
-        "character": character,
+    profile = {
+        "character": CharacterResponse.model_validate(character).model_dump(),
         "appearance": appearance,
         "next_level_exp": next_level_exp,
         "exp_to_next_level": next_level_exp - character.experience,
         "equipment_bonus": bonus
     }
+    profile_cache.put(character_id, profile, generation)
+    return profile
 
 # タイマー関連API
 @app.post("/timer/start")
-def start_timer(timer_data: TimerStart, db: Session = Depends(get_db)):
+async def start_timer(timer_data: TimerStart, db: AsyncSession = Depends(get_async_db)):
     # キャラクターが存在するかチェック
-    character = db.query(Character).filter(Character.id == timer_data.character_id).first()
+    character = await db.get(Character, timer_data.character_id)
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     
@@ -121,48 +281,58 @@ def start_timer(timer_data: TimerStart, db: Session = Depends(get_db)):
         started_at=datetime.utcnow()
     )
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.execute(bump_revision(timer_data.character_id))
+    await db.commit()
+    await db.refresh(session)
     
-    # アクティブセッションに追加
-    active_sessions[session.id] = {
-        "start_time": datetime.utcnow(),
-        "character_id": timer_data.character_id
-    }
+    # アクティブセッションに追加（タイマーストアは同期APIなので run_sync 経由で呼ぶ）
+    await db.run_sync(timer_store.start, session)
+    
+    metrics.TIMERS_STARTED.inc()
     
     return {"session_id": session.id, "message": "Timer started"}
 
+@app.post("/timer/heartbeat")
+async def heartbeat_timer(timer_data: TimerHeartbeat, db: AsyncSession = Depends(get_async_db)):
+    """実行中タイマーのリースを延長"""
+    if not await db.run_sync(timer_store.heartbeat, timer_data.session_id):
+        raise HTTPException(status_code=404, detail="Active session not found")
+    
+    return {"session_id": timer_data.session_id, "message": "Heartbeat received"}
+
 @app.post("/timer/stop")
-def stop_timer(timer_data: TimerStop, db: Session = Depends(get_db)):
+async def stop_timer(timer_data: TimerStop, db: AsyncSession = Depends(get_async_db)):
     session_id = timer_data.session_id
     
-    if session_id not in active_sessions:
+    active_timer = await db.run_sync(timer_store.get, session_id)
+    if active_timer is None:
         raise HTTPException(status_code=404, detail="Active session not found")
     
     # 経過時間を計算
-    start_time = active_sessions[session_id]["start_time"]
+    start_time = active_timer["start_time"]
     end_time = datetime.utcnow()
     duration_minutes = (end_time - start_time).total_seconds() / 60
     
     # セッションを更新
-    session = db.query(StudySession).filter(StudySession.id == session_id).first()
+    session = await db.get(StudySession, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    # 他のワーカーが先に停止していた場合は二重計上しない
+    if not await db.run_sync(timer_store.finish, session_id, end_time):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Active session not found")
+    
     session.duration = duration_minutes
     session.ended_at = end_time
     
     # キャラクターの装備ボーナスを取得
-    character = db.query(Character).filter(Character.id == session.character_id).first()
-    equipped_items = db.query(CharacterEquipment).filter(
-        CharacterEquipment.character_id == character.id,
+    equipped_items = (await db.scalars(select(CharacterEquipment).where(
+        CharacterEquipment.character_id == session.character_id,
         CharacterEquipment.is_equipped == 1
-    ).all()
-    
-    equipment_list = [item.equipment_id for item in equipped_items]
-    bonus = calculate_equipment_bonus(equipment_list)
+    ))).all()
     
-    old_level = character.level
+    bonus = equipment_catalog.bonus(item.equipment_id for item in equipped_items)
     
     # 基本経験値とコイン計算
     base_experience = calculate_experience(duration_minutes)
@@ -172,11 +342,13 @@ def stop_timer(timer_data: TimerStop, db: Session = Depends(get_db)):
     final_experience = int(base_experience * bonus["experience_multiplier"])
     final_coins = int(base_coins * bonus["coin_multiplier"])
     
-    # キャラクター更新
-    character.total_study_time += duration_minutes
-    character.experience += final_experience
-    character.coins += final_coins
-    character.level = calculate_level(character.experience)
+    # キャラクター更新（他のリクエストと競合したら読み直して再計算）
+    character = await update_character(db, session.character_id, lambda c: {
+        "total_study_time": c.total_study_time + duration_minutes,
+        "experience": c.experience + final_experience,
+        "coins": c.coins + final_coins,
+        "level": calculate_level(c.experience + final_experience)
+    })
     
     # コイン取得履歴を記録
     coin_transaction = CoinTransaction(
@@ -188,12 +360,21 @@ def stop_timer(timer_data: TimerStop, db: Session = Depends(get_db)):
     )
     db.add(coin_transaction)
     
-    db.commit()
+    # 日別集計に加算
+    await db.execute(increment_statement(db.get_bind().dialect.name), [{
+        "character_id": character.id,
+        "day": rollup_day(session.started_at),
+        "minutes": duration_minutes,
+        "session_count": 1
+    }])
     
-    # アクティブセッションから削除
-    del active_sessions[session_id]
+    await db.commit()
+    leaderboard.update(character)
+    profile_cache.invalidate(character.id)
+    metrics.TIMERS_STOPPED.inc()
+    metrics.COINS_EARNED.inc("study", amount=final_coins)
     
-    level_up = character.level > old_level
+    level_up = character.level > calculate_level(character.experience - final_experience)
     
     return {
         "duration_minutes": duration_minutes,
@@ -207,48 +388,151 @@ def stop_timer(timer_data: TimerStop, db: Session = Depends(get_db)):
     }
 
 # 学習セッション関連API
-@app.get("/sessions/{character_id}", response_model=List[StudySessionResponse])
-def get_character_sessions(character_id: int, db: Session = Depends(get_db)):
-    return db.query(StudySession).filter(
+@app.get("/sessions/{character_id}", response_model=Union[List[StudySessionResponse], StudySessionPage], dependencies=[Depends(use_replica)])
+def get_character_sessions(character_id: int, limit: Optional[int] = None, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    # 件数が多くなるので列のタプルを直接JSONにする（fast_json.py）
+    columns = response_columns(StudySession, StudySessionResponse)
+    query = select(*columns).where(
         StudySession.character_id == character_id,
         StudySession.ended_at.isnot(None)
-    ).order_by(StudySession.started_at.desc()).all()
+    )
+    if not is_paginated(limit, cursor):
+        rows = db.execute(query.order_by(StudySession.started_at.desc())).all()
+        return FastJSONResponse(rows_as_dicts(rows, columns))
+    
+    query = keyset_query(query, StudySession.started_at, StudySession.id, limit, cursor)
+    page = build_page(db.execute(query).all(), limit, "started_at")
+    page["items"] = rows_as_dicts(page["items"], columns)
+    return FastJSONResponse(page)
 
-@app.get("/stats/{character_id}")
-def get_character_stats(character_id: int, db: Session = Depends(get_db)):
-    character = db.query(Character).filter(Character.id == character_id).first()
-    if not character:
+@app.post("/sessions/bulk")
+async def bulk_create_sessions(request: Request, db: Session = Depends(get_db)):
+    """完了済みの学習セッションを一括登録（JSON配列 または NDJSON）"""
+    content_type = request.headers.get("content-type", "")
+    
+    if "ndjson" in content_type or "jsonl" in content_type:
+        # NDJSON はストリームを行単位で読み進める
+        # （チャンクの境界がマルチバイト文字の途中に来ることがあるので、バイト列のまま行に分けてからデコードする）
+        lines = []
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *complete, buffer = buffer.split(b"\n")
+            lines.extend(complete)
+            if len(lines) > BULK_SESSION_LIMIT:
+                raise HTTPException(status_code=413, detail=f"Too many sessions (max {BULK_SESSION_LIMIT})")
+        lines.append(buffer)
+        items = parse_ndjson_lines(lines)
+    else:
+        try:
+            items = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of sessions")
+    
+    if len(items) > BULK_SESSION_LIMIT:
+        raise HTTPException(status_code=413, detail=f"Too many sessions (max {BULK_SESSION_LIMIT})")
+    
+    # DB書き込みはスレッドプールで実行してイベントループを塞がない
+    return await run_in_threadpool(ingest_sessions, db, items)
+
+# ランキング関連API
+def _check_leaderboard_metric(metric: str):
+    if metric not in LEADERBOARD_METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(LEADERBOARD_METRICS)}")
+
+@app.get("/leaderboard")
+async def get_leaderboard(metric: str = "experience", offset: int = 0, limit: int = 20):
+    """ランキング上位を取得（offset / limit でページング）"""
+    _check_leaderboard_metric(metric)
+    if offset < 0 or limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit between 1 and 100")
+    
+    return {
+        "metric": metric,
+        "total": len(leaderboard),
+        "offset": offset,
+        "limit": limit,
+        "entries": leaderboard.top(metric, offset, limit)
+    }
+
+@app.get("/leaderboard/rank/{character_id}")
+async def get_leaderboard_rank(character_id: int, metric: str = "experience"):
+    """キャラクターの順位を取得"""
+    _check_leaderboard_metric(metric)
+    ranked = leaderboard.rank(metric, character_id)
+    if ranked is None:
         raise HTTPException(status_code=404, detail="Character not found")
     
-    # 今日の学習時間
+    return {"metric": metric, "total": len(leaderboard), **ranked}
+
+@app.post("/admin/leaderboard/consistency", dependencies=[Depends(require_admin)])
+def check_leaderboard_consistency(repair: bool = False, db: Session = Depends(get_db)):
+    """ランキングと characters テーブルの整合性を確認（repair=true で作り直す）"""
+    report = leaderboard.check_consistency(db)
+    if repair and not report["consistent"]:
+        leaderboard.rebuild(db)
+        report["repaired"] = True
+    return report
+
+@app.get("/stats/{character_id}", dependencies=[Depends(use_replica)])
+async def get_character_stats(
+    character_id: int,
+    request: Request,
+    response: Response,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """学習統計を取得（start / end を指定するとその期間の日別集計も返す）"""
+    # 「今日」「今週」の集計は日付が変わると変化するので ETag に日付を含める
     today = datetime.now().date()
-    today_sessions = db.query(StudySession).filter(
-        StudySession.character_id == character_id,
-        StudySession.started_at >= datetime.combine(today, datetime.min.time()),
-        StudySession.ended_at.isnot(None)
-    ).all()
+    _, not_modified = await conditional_get(db, character_id, request, response, today)
+    if not_modified:
+        return not_modified
     
-    today_study_time = sum(session.duration for session in today_sessions)
+    character = await db.get(Character, character_id)
+    if not character:
+        raise HTTPException(status_code=404, detail="Character not found")
+    
+    # 日別集計（study_daily_rollups）から計算するので、処理量は期間の日数分で済む
+    # 今日の学習時間
+    today_study_time, _ = (await db.execute(rollup_totals_query(character_id, start=today))).one()
     
     # 今週の学習時間
     week_start = today - timedelta(days=today.weekday())
-    week_sessions = db.query(StudySession).filter(
-        StudySession.character_id == character_id,
-        StudySession.started_at >= datetime.combine(week_start, datetime.min.time()),
-        StudySession.ended_at.isnot(None)
-    ).all()
+    week_study_time, _ = (await db.execute(rollup_totals_query(character_id, start=week_start))).one()
     
-    week_study_time = sum(session.duration for session in week_sessions)
+    _, total_sessions = (await db.execute(rollup_totals_query(character_id))).one()
     
-    return {
-        "character": character,
+    stats = {
+        "character": CharacterResponse.model_validate(character).model_dump(),
         "today_study_time": today_study_time,
         "week_study_time": week_study_time,
-        "total_sessions": len(db.query(StudySession).filter(
-            StudySession.character_id == character_id,
-            StudySession.ended_at.isnot(None)
-        ).all())
+        "total_sessions": total_sessions
     }
+    
+    # 任意期間の集計
+    if start is not None or end is not None:
+        range_end = end or today
+        range_start = start or range_end
+        if range_start > range_end:
+            raise HTTPException(status_code=400, detail="start must be on or before end")
+        
+        days = (await db.scalars(rollup_range_query(character_id, range_start, range_end))).all()
+        stats["range"] = {
+            "start": range_start,
+            "end": range_end,
+            "study_time": sum(day.minutes for day in days),
+            "sessions": sum(day.session_count for day in days),
+            "days": [
+                {"day": day.day, "minutes": day.minutes, "session_count": day.session_count}
+                for day in days
+            ]
+        }
+    
+    return stats
 
 # 資格関連API
 @app.post("/certifications", response_model=CertificationResponse)
@@ -267,12 +551,9 @@ def create_certification(certification: CertificationCreate, db: Session = Depen
         obtained_date_obj = None
         if certification.obtained_date:
             try:
-                obtained_date_obj = datetime.fromisoformat(certification.obtained_date.replace('Z', '+00:00'))
+                obtained_date_obj = parse_date(certification.obtained_date)
             except ValueError:
-                try:
-                    obtained_date_obj = datetime.strptime(certification.obtained_date, '%Y-%m-%d')
-                except ValueError:
-                    raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD or ISO format")
+                raise HTTPException(status_code=400, detail=INVALID_DATE_MESSAGE)
         
         db_certification = Certification(
             character_id=certification.character_id,
@@ -283,6 +564,7 @@ def create_certification(certification: CertificationCreate, db: Session = Depen
             description=certification.description
         )
         db.add(db_certification)
+        db.execute(bump_revision(certification.character_id))
         db.commit()
         db.refresh(db_certification)
         return db_certification
@@ -294,18 +576,53 @@ def create_certification(certification: CertificationCreate, db: Session = Depen
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@app.get("/certifications/{character_id}", response_model=List[CertificationResponse])
-def get_character_certifications(character_id: int, db: Session = Depends(get_db)):
-    # キャラクターが存在するかチェック
-    character = db.query(Character).filter(Character.id == character_id).first()
-    if not character:
+async def _read_import_items(request: Request) -> list:
+    """一括登録の本文（CSV または JSON配列）を行のリストにする"""
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        try:
+            items = parse_csv((await request.body()).decode("utf-8"))
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV body: {e}")
+    else:
+        try:
+            items = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    if len(items) > BULK_IMPORT_LIMIT:
+        raise HTTPException(status_code=413, detail=f"Too many rows (max {BULK_IMPORT_LIMIT})")
+    return items
+
+@app.post("/certifications/bulk")
+async def bulk_create_certifications(request: Request, db: Session = Depends(get_db)):
+    """資格を一括登録（CSV または JSON配列）"""
+    items = await _read_import_items(request)
+    return await run_in_threadpool(import_records, db, "certifications", items)
+
+@app.get("/certifications/{character_id}", response_model=Union[List[CertificationResponse], CertificationPage], dependencies=[Depends(use_replica)])
+def get_character_certifications(character_id: int, request: Request, response: Response, limit: Optional[int] = None, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    # キャラクターが存在するかチェック（変更がなければ 304）
+    revision, not_modified = conditional_get_sync(db, character_id, request, response)
+    if revision is None:
         raise HTTPException(status_code=404, detail="Character not found")
+    if not_modified:
+        return not_modified
+    
+    if not is_paginated(limit, cursor):
+        return db.query(Certification).filter(Certification.character_id == character_id).order_by(Certification.created_at.desc()).all()
     
-    return db.query(Certification).filter(Certification.character_id == character_id).order_by(Certification.created_at.desc()).all()
+    query = keyset_query(
+        select(Certification).where(Certification.character_id == character_id),
+        Certification.created_at, Certification.id, limit, cursor
+    )
+    return build_page(db.scalars(query).all(), limit, "created_at")
 
-@app.get("/characters/{character_id}/with-certifications", response_model=CharacterWithCertifications)
-def get_character_with_certifications(character_id: int, db: Session = Depends(get_db)):
-    character = db.query(Character).filter(Character.id == character_id).first()
+@app.get("/characters/{character_id}/with-certifications", response_model=CharacterWithCertifications, dependencies=[Depends(use_replica)])
+async def get_character_with_certifications(character_id: int, db: AsyncSession = Depends(get_async_db)):
+    # 非同期セッションでは遅延ロードできないため資格をまとめて読み込む
+    character = await db.get(Character, character_id, options=[selectinload(Character.certifications)])
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     return character
@@ -328,16 +645,14 @@ def update_certification(certification_id: int, certification_update: Certificat
         # 日付文字列の変換
         if 'obtained_date' in update_data and update_data['obtained_date']:
             try:
-                update_data['obtained_date'] = datetime.fromisoformat(update_data['obtained_date'].replace('Z', '+00:00'))
+                update_data['obtained_date'] = parse_date(update_data['obtained_date'])
             except ValueError:
-                try:
-                    update_data['obtained_date'] = datetime.strptime(update_data['obtained_date'], '%Y-%m-%d')
-                except ValueError:
-                    raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD or ISO format")
+                raise HTTPException(status_code=400, detail=INVALID_DATE_MESSAGE)
         
         for field, value in update_data.items():
             setattr(certification, field, value)
         
+        db.execute(bump_revision(certification.character_id))
         db.commit()
         db.refresh(certification)
         return certification
@@ -357,6 +672,7 @@ def delete_certification(certification_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Certification not found")
     
     db.delete(certification)
+    db.execute(bump_revision(certification.character_id))
     db.commit()
     return {"message": "Certification deleted successfully"}
 
@@ -398,25 +714,33 @@ def get_itss_level_name(level: int) -> str:
     return level_names.get(level, "不明")
 
 # 装備関連API
+def equipment_catalog_json() -> bytes:
+    return dumps([item._asdict() for item in equipment_catalog.all()])
+
 @app.get("/equipment", response_model=List[EquipmentResponse])
-def get_all_equipment(db: Session = Depends(get_db)):
+async def get_all_equipment(request: Request):
     """すべての装備アイテムを取得"""
-    return db.query(Equipment).all()
+    return equipment_catalog_payload.response(request, equipment_catalog.version, equipment_catalog_json)
 
-@app.get("/equipment/shop/{character_id}")
-def get_equipment_shop(character_id: int, db: Session = Depends(get_db)):
+@app.get("/equipment/shop/{character_id}", dependencies=[Depends(use_replica)])
+async def get_equipment_shop(character_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """キャラクター用の装備ショップ情報を取得"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    # 装備マスターの更新でも内容が変わるので ETag に版番号を含める
+    _, not_modified = await conditional_get(db, character_id, request, response, equipment_catalog.version)
+    if not_modified:
+        return not_modified
+    
+    character = await db.get(Character, character_id)
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     
     # すべての装備アイテム
-    all_equipment = db.query(Equipment).all()
+    all_equipment = equipment_catalog.all()
     
     # キャラクターが所持している装備
-    owned_equipment = db.query(CharacterEquipment).filter(
+    owned_equipment = (await db.scalars(select(CharacterEquipment).where(
         CharacterEquipment.character_id == character_id
-    ).all()
+    ))).all()
     
     owned_ids = {item.equipment_id for item in owned_equipment}
     equipped_ids = {item.equipment_id for item in owned_equipment if item.is_equipped == 1}
@@ -431,6 +755,9 @@ def get_equipment_shop(character_id: int, db: Session = Depends(get_db)):
             "price": equipment.price,
             "description": equipment.description,
             "color_code": equipment.color_code,
+            "experience_multiplier": equipment.experience_multiplier,
+            "coin_multiplier": equipment.coin_multiplier,
+            "special_effect": equipment.special_effect,
             "owned": equipment.id in owned_ids,
             "equipped": equipment.id in equipped_ids
         })
@@ -440,32 +767,42 @@ def get_equipment_shop(character_id: int, db: Session = Depends(get_db)):
         "equipment": shop_items
     }
 
+@app.post("/equipment/bonuses")
+async def get_equipment_bonuses(character_ids: List[int], db: AsyncSession = Depends(get_async_db)):
+    """複数キャラクターの装備ボーナスをまとめて取得（装備のないキャラクターはボーナスなし）"""
+    if len(character_ids) > BONUS_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"Too many characters (max {BONUS_BATCH_LIMIT})")
+    if not character_ids:
+        return {}
+    equipped = group_equipped((await db.execute(equipped_ids_query(set(character_ids)))).all())
+    return equipment_catalog.bonuses(equipped, character_ids)
+
 @app.post("/equipment/purchase")
-def purchase_equipment(purchase: EquipmentPurchase, db: Session = Depends(get_db)):
+async def purchase_equipment(purchase: EquipmentPurchase, db: AsyncSession = Depends(get_async_db)):
     """装備を購入"""
-    character = db.query(Character).filter(Character.id == purchase.character_id).first()
-    if not character:
+    if not await db.get(Character, purchase.character_id):
         raise HTTPException(status_code=404, detail="Character not found")
     
-    equipment = db.query(Equipment).filter(Equipment.id == purchase.equipment_id).first()
+    equipment = equipment_catalog.get(purchase.equipment_id)
     if not equipment:
         raise HTTPException(status_code=404, detail="Equipment not found")
     
     # 既に所持しているかチェック
-    existing = db.query(CharacterEquipment).filter(
+    existing = (await db.scalars(select(CharacterEquipment).where(
         CharacterEquipment.character_id == purchase.character_id,
         CharacterEquipment.equipment_id == purchase.equipment_id
-    ).first()
+    ))).first()
     
     if existing:
         raise HTTPException(status_code=400, detail="Already owned this equipment")
     
-    # コイン不足チェック
-    if character.coins < equipment.price:
-        raise HTTPException(status_code=400, detail="Insufficient coins")
+    # コイン消費（残高が足りている場合だけ書き込む）
+    def spend(character: Character) -> dict:
+        if character.coins < equipment.price:
+            raise HTTPException(status_code=400, detail="Insufficient coins")
+        return {"coins": character.coins - equipment.price}
     
-    # コイン消費
-    character.coins -= equipment.price
+    character = await update_character(db, purchase.character_id, spend, Character.coins >= equipment.price)
     
     # 装備を追加
     character_equipment = CharacterEquipment(
@@ -485,7 +822,15 @@ def purchase_equipment(purchase: EquipmentPurchase, db: Session = Depends(get_db
     )
     db.add(coin_transaction)
     
-    db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 同時に同じ装備を購入した場合は一意インデックスで片方だけが成功する
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Already owned this equipment")
+    leaderboard.update(character)
+    profile_cache.invalidate(character.id)
+    metrics.COINS_SPENT.inc("equipment_purchase", amount=equipment.price)
     
     return {
         "message": f"{equipment.name}を購入しました",
@@ -493,71 +838,158 @@ def purchase_equipment(purchase: EquipmentPurchase, db: Session = Depends(get_db
     }
 
 @app.post("/equipment/equip")
-def equip_unequip_item(equip_data: EquipmentEquip, db: Session = Depends(get_db)):
+async def equip_unequip_item(equip_data: EquipmentEquip, db: AsyncSession = Depends(get_async_db)):
     """装備の着脱"""
-    character = db.query(Character).filter(Character.id == equip_data.character_id).first()
-    if not character:
+    if not await db.get(Character, equip_data.character_id):
         raise HTTPException(status_code=404, detail="Character not found")
     
-    character_equipment = db.query(CharacterEquipment).filter(
+    character_equipment = (await db.scalars(select(CharacterEquipment).where(
         CharacterEquipment.character_id == equip_data.character_id,
         CharacterEquipment.equipment_id == equip_data.equipment_id
-    ).first()
+    ))).first()
     
     if not character_equipment:
         raise HTTPException(status_code=404, detail="Equipment not owned")
     
-    equipment = db.query(Equipment).filter(Equipment.id == equip_data.equipment_id).first()
+    equipment = equipment_catalog.get(equip_data.equipment_id)
+    
+    # カラー装備は現在の色を書き換えるので、同時に別の色を装備した場合に備えて version を進める
+    if equipment.category == "color":
+        color = equipment.color_code if equip_data.equip else "#8B4513"  # 外す場合はデフォルト色
+        await update_character(db, equip_data.character_id, lambda c: {"current_color": color})
     
     if equip_data.equip:
         # 装備する
         # カラー装備の場合は、他のカラーを外す
         if equipment.category == "color":
-            db.query(CharacterEquipment).filter(
-                CharacterEquipment.character_id == equip_data.character_id,
-                CharacterEquipment.equipment_item.has(category="color")
-            ).update({"is_equipped": 0})
-            
-            # キャラクターの現在の色を更新
-            character.current_color = equipment.color_code
+            await db.execute(
+                update(CharacterEquipment)
+                .where(
+                    CharacterEquipment.character_id == equip_data.character_id,
+                    CharacterEquipment.equipment_id.in_(equipment_catalog.ids_in_category("color"))
+                )
+                .values(is_equipped=0)
+                .execution_options(synchronize_session="fetch")
+            )
         
         character_equipment.is_equipped = 1
         message = f"{equipment.name}を装備しました"
     else:
         # 装備を外す
         character_equipment.is_equipped = 0
-        
-        # カラー装備の場合は、デフォルト色に戻す
-        if equipment.category == "color":
-            character.current_color = "#8B4513"  # デフォルト色
-        
         message = f"{equipment.name}の装備を外しました"
     
-    db.commit()
+    if equipment.category != "color":
+        await db.execute(bump_revision(equip_data.character_id))
+    await db.commit()
+    profile_cache.invalidate(equip_data.character_id)
     
     return {"message": message}
 
-@app.get("/equipment/{character_id}", response_model=List[CharacterEquipmentResponse])
-def get_character_equipment(character_id: int, db: Session = Depends(get_db)):
+@app.get("/equipment/{character_id}", response_model=List[CharacterEquipmentResponse], dependencies=[Depends(use_replica)])
+async def get_character_equipment(character_id: int, db: AsyncSession = Depends(get_async_db)):
     """キャラクターの所持装備を取得"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    character = await db.get(Character, character_id)
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     
-    return db.query(CharacterEquipment).filter(
+    columns = [
+        CharacterEquipment.id, CharacterEquipment.character_id, CharacterEquipment.equipment_id,
+        CharacterEquipment.is_equipped, CharacterEquipment.purchased_at
+    ]
+    owned_equipment = (await db.execute(select(*columns).where(
         CharacterEquipment.character_id == character_id
-    ).all()
+    ))).all()
+    
+    # 装備の詳細はキャッシュから補う
+    result = []
+    for item in rows_as_dicts(owned_equipment, columns):
+        equipment = equipment_catalog.get(item["equipment_id"])
+        if equipment is None:
+            continue
+        item["equipment_item"] = equipment._asdict()
+        result.append(item)
+    
+    return FastJSONResponse(result)
+
+@app.post("/admin/equipment/catalog/reload", dependencies=[Depends(require_admin)])
+def reload_equipment_catalog(db: Session = Depends(get_db)):
+    """装備マスターを直接更新した後に呼び出し、全ワーカーのキャッシュを無効化する"""
+    version = bump_catalog_version(db)
+    db.commit()
+    equipment_catalog.load(db)
+    profile_cache.clear()
+    return {"catalog_version": version, "items": len(equipment_catalog.all())}
+
+def count_active_timers():
+    db = SessionLocal()
+    try:
+        metrics.ACTIVE_TIMERS.set(timer_store.count_active(db))
+    except Exception as e:
+        print(f"Error counting active timers: {e}")
+    finally:
+        db.close()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+@no_compression  # Prometheus は数秒ごとに取得するので、毎回圧縮するCPUを使わない
+async def get_metrics():
+    """Prometheus 形式のメトリクス（metrics.py）"""
+    # 実行中タイマーは開始・停止したワーカーが異なりうるので、取得のたびにタイマーストアから数える
+    await run_in_threadpool(count_active_timers)
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
-@app.get("/coins/{character_id}/transactions", response_model=List[CoinTransactionResponse])
-def get_coin_transactions(character_id: int, db: Session = Depends(get_db)):
-    """キャラクターのコイン取引履歴を取得"""
+@app.get("/health/ready")
+async def get_readiness():
+    """準備完了（起動処理とウォームアップが終わった）なら 200、それまでは 503。起動にかかった時間も返す"""
+    status = startup_state.status()
+    return JSONResponse(status, status_code=200 if startup_state.ready else 503)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """プロフィールキャッシュのヒット率などを返す"""
+    return profile_cache.stats()
+
+@app.get("/replicas/stats")
+async def get_replica_stats():
+    """リードレプリカごとのヘルスチェックの結果を返す"""
+    return replica_router.stats()
+
+@app.post("/admin/coins/reconcile", dependencies=[Depends(require_admin)])
+def reconcile_coin_ledger(full: bool = False, repair: bool = False, db: Session = Depends(get_db)):
+    """所持コインと取引履歴を突き合わせる（full=true で全履歴を合計、repair=true で差分を調整取引として記録）"""
+    return reconcile_coins(db, full=full, repair=repair)
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def get_request_profiles():
+    """保存済みのリクエストプロファイルの一覧（新しい順）"""
+    return profiling.list_profiles()
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+def get_request_profile(profile_id: str):
+    """リクエストプロファイル（collapsed stack 形式。flamegraph.pl や speedscope で表示できる）"""
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(path, encoding="utf-8") as f:
+        return PlainTextResponse(f.read())
+
+@app.get("/coins/{character_id}/transactions", response_model=Union[List[CoinTransactionResponse], CoinTransactionPage], dependencies=[Depends(use_replica)])
+def get_coin_transactions(character_id: int, limit: Optional[int] = None, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    """キャラクターのコイン取引履歴を取得（limit / cursor でページング）"""
     character = db.query(Character).filter(Character.id == character_id).first()
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     
-    return db.query(CoinTransaction).filter(
-        CoinTransaction.character_id == character_id
-    ).order_by(CoinTransaction.created_at.desc()).all()
+    columns = response_columns(CoinTransaction, CoinTransactionResponse)
+    query = select(*columns).where(CoinTransaction.character_id == character_id)
+    if not is_paginated(limit, cursor):
+        rows = db.execute(query.order_by(CoinTransaction.created_at.desc())).all()
+        return FastJSONResponse(rows_as_dicts(rows, columns))
+    
+    query = keyset_query(query, CoinTransaction.created_at, CoinTransaction.id, limit, cursor)
+    page = build_page(db.execute(query).all(), limit, "created_at")
+    page["items"] = rows_as_dicts(page["items"], columns)
+    return FastJSONResponse(page)
 
 # 試験予定関連API
 @app.post("/exam-schedules", response_model=ExamScheduleResponse)
@@ -571,12 +1003,9 @@ def create_exam_schedule(exam_schedule: ExamScheduleCreate, db: Session = Depend
         
         # 日付文字列をdatetimeオブジェクトに変換
         try:
-            exam_date_obj = datetime.fromisoformat(exam_schedule.exam_date.replace('Z', '+00:00'))
+            exam_date_obj = parse_date(exam_schedule.exam_date)
         except ValueError:
-            try:
-                exam_date_obj = datetime.strptime(exam_schedule.exam_date, '%Y-%m-%d')
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD or ISO format")
+            raise HTTPException(status_code=400, detail=INVALID_DATE_MESSAGE)
         
         db_exam_schedule = ExamSchedule(
             character_id=exam_schedule.character_id,
@@ -588,8 +1017,10 @@ def create_exam_schedule(exam_schedule: ExamScheduleCreate, db: Session = Depend
         )
         
         db.add(db_exam_schedule)
+        db.execute(bump_revision(exam_schedule.character_id))
         db.commit()
         db.refresh(db_exam_schedule)
+        reminder_scheduler.schedule(db_exam_schedule)
         return db_exam_schedule
     except HTTPException:
         raise
@@ -598,23 +1029,39 @@ def create_exam_schedule(exam_schedule: ExamScheduleCreate, db: Session = Depend
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@app.get("/exam-schedules/{character_id}", response_model=List[ExamScheduleResponse])
-def get_character_exam_schedules(character_id: int, db: Session = Depends(get_db)):
-    """キャラクターの試験予定一覧を取得"""
+@app.post("/exam-schedules/bulk")
+async def bulk_create_exam_schedules(request: Request, db: Session = Depends(get_db)):
+    """試験予定を一括登録（CSV または JSON配列）"""
+    items = await _read_import_items(request)
+    return await run_in_threadpool(import_records, db, "exam-schedules", items)
+
+@app.get("/exam-schedules/{character_id}", response_model=Union[List[ExamScheduleResponse], ExamSchedulePage], dependencies=[Depends(use_replica)])
+def get_character_exam_schedules(character_id: int, limit: Optional[int] = None, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    """キャラクターの試験予定一覧を取得（limit / cursor でページング）"""
     character = db.query(Character).filter(Character.id == character_id).first()
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     
-    return db.query(ExamSchedule).filter(
-        ExamSchedule.character_id == character_id
-    ).order_by(ExamSchedule.exam_date.asc()).all()
+    if not is_paginated(limit, cursor):
+        return db.query(ExamSchedule).filter(
+            ExamSchedule.character_id == character_id
+        ).order_by(ExamSchedule.exam_date.asc()).all()
+    
+    # 試験予定は従来どおり試験日の昇順
+    query = keyset_query(
+        select(ExamSchedule).where(ExamSchedule.character_id == character_id),
+        ExamSchedule.exam_date, ExamSchedule.id, limit, cursor, descending=False
+    )
+    return build_page(db.scalars(query).all(), limit, "exam_date")
 
-@app.get("/exam-schedules/calendar/{character_id}")
-def get_exam_calendar(character_id: int, year: int, month: int, db: Session = Depends(get_db)):
+@app.get("/exam-schedules/calendar/{character_id}", dependencies=[Depends(use_replica)])
+def get_exam_calendar(character_id: int, year: int, month: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """指定した年月のカレンダー形式で試験予定を取得"""
-    character = db.query(Character).filter(Character.id == character_id).first()
-    if not character:
+    revision, not_modified = conditional_get_sync(db, character_id, request, response)
+    if revision is None:
         raise HTTPException(status_code=404, detail="Character not found")
+    if not_modified:
+        return not_modified
     
     # 指定月の開始日と終了日
     start_date = datetime(year, month, 1)
@@ -662,12 +1109,9 @@ def update_exam_schedule(exam_id: int, exam_update: ExamScheduleUpdate, db: Sess
         # 日付文字列の変換
         if 'exam_date' in update_data and update_data['exam_date']:
             try:
-                update_data['exam_date'] = datetime.fromisoformat(update_data['exam_date'].replace('Z', '+00:00'))
+                update_data['exam_date'] = parse_date(update_data['exam_date'])
             except ValueError:
-                try:
-                    update_data['exam_date'] = datetime.strptime(update_data['exam_date'], '%Y-%m-%d')
-                except ValueError:
-                    raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD or ISO format")
+                raise HTTPException(status_code=400, detail=INVALID_DATE_MESSAGE)
         
         # 更新日時を設定
         update_data['updated_at'] = datetime.utcnow()
@@ -675,8 +1119,10 @@ def update_exam_schedule(exam_id: int, exam_update: ExamScheduleUpdate, db: Sess
         for field, value in update_data.items():
             setattr(exam_schedule, field, value)
         
+        db.execute(bump_revision(exam_schedule.character_id))
         db.commit()
         db.refresh(exam_schedule)
+        reminder_scheduler.schedule(exam_schedule)
         return exam_schedule
     except HTTPException:
         raise
@@ -693,18 +1139,20 @@ def delete_exam_schedule(exam_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Exam schedule not found")
     
     db.delete(exam_schedule)
+    db.execute(bump_revision(exam_schedule.character_id))
     db.commit()
+    reminder_scheduler.cancel(exam_id)
     return {"message": "Exam schedule deleted successfully"}
 
-@app.get("/exam-schedules/upcoming/{character_id}")
+@app.get("/exam-schedules/upcoming/{character_id}", dependencies=[Depends(use_replica)])
 def get_upcoming_exams(character_id: int, days: int = 30, db: Session = Depends(get_db)):
     """近日中の試験予定を取得（リマインダー用）"""
     character = db.query(Character).filter(Character.id == character_id).first()
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
     
-    # 今日から指定日数後までの範囲
-    today = datetime.now().date()
+    # 今日から指定日数後までの範囲（試験日はUTCで保存しているので今日もUTCの日付）
+    today = datetime.utcnow().date()
     end_date = today + timedelta(days=days)
     
     upcoming_exams = db.query(ExamSchedule).filter(
@@ -716,6 +1164,64 @@ def get_upcoming_exams(character_id: int, days: int = 30, db: Session = Depends(
     
     return upcoming_exams
 
+# リマインダー関連API（reminders.py のスケジューラーが発火したもの）
+@app.get("/reminders/due/{character_id}", response_model=List[ReminderResponse])
+def get_due_reminders(character_id: int, db: Session = Depends(get_db)):
+    """発火済みで未受信のリマインダーを取得"""
+    character = db.query(Character).filter(Character.id == character_id).first()
+    if not character:
+        raise HTTPException(status_code=404, detail="Character not found")
+    
+    return db.query(ReminderOutbox).filter(
+        ReminderOutbox.character_id == character_id,
+        ReminderOutbox.delivered_at.is_(None)
+    ).order_by(ReminderOutbox.remind_at.asc()).all()
+
+@app.post("/reminders/{reminder_id}/delivered", response_model=ReminderResponse)
+def mark_reminder_delivered(reminder_id: int, db: Session = Depends(get_db)):
+    """リマインダーを受信済みにする（/reminders/due に出なくなる）"""
+    reminder = db.query(ReminderOutbox).filter(ReminderOutbox.id == reminder_id).first()
+    if not reminder:
+        raise HTTPException(status_code=404, detail="Reminder not found")
+    if reminder.delivered_at is None:
+        reminder.delivered_at = datetime.utcnow()
+        db.commit()
+        db.refresh(reminder)
+    return reminder
+
+@app.get("/reminders/stats")
+async def get_reminder_stats():
+    """スケジューラーの待機中・発火済みの件数を返す"""
+    return reminder_scheduler.stats()
+
+# エクスポートAPI（export.py）
+def _export_response(table: str, export_format: str, character_id: Optional[int] = None) -> StreamingResponse:
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown export table (choose from {', '.join(EXPORT_TABLES)})")
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format (choose from {', '.join(EXPORT_FORMATS)})")
+    filename = export_filename(table, export_format, character_id)
+    return StreamingResponse(
+        export_stream(table, export_format, character_id),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/export/{table}", dependencies=[Depends(require_admin), Depends(use_replica)])
+@no_compression  # 長いストリームを圧縮器のバッファに溜めず、書き出した分からすぐに送る
+def export_all(table: str, format: str = "ndjson"):
+    """全キャラクター分をエクスポート（分析用）"""
+    return _export_response(table, format)
+
+@app.get("/export/{table}/{character_id}", dependencies=[Depends(use_replica)])
+@no_compression
+def export_character(table: str, character_id: int, format: str = "ndjson", db: Session = Depends(get_db)):
+    """1キャラクター分の履歴をエクスポート"""
+    character = db.query(Character).filter(Character.id == character_id).first()
+    if not character:
+        raise HTTPException(status_code=404, detail="Character not found")
+    return _export_response(table, format, character_id)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
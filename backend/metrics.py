@@ -0,0 +1,294 @@
+"""
+Prometheus 形式のメトリクス（GET /metrics）
+
+外部ライブラリを使わず、カウンター・ゲージ・ヒストグラムをプロセス内の辞書で集計し、テキスト形式（0.0.4）で出力します。
+- http_*       : ルート（パスのテンプレート）ごとのレイテンシのヒストグラム・処理中のリクエスト数
+- db_*         : SQL文の件数と時間（エンジンのイベントで計測し、リクエストごとの件数・時間もルート別に集計）、
+                 コネクションプールの取得待ち時間・使用中の接続数
+- threadpool_* : 同期エンドポイント用スレッドプールの使用数・上限・待ち数（飽和の確認用）
+- study_game_* : タイマー開始/停止・コイン獲得/消費などの業務カウンター
+1リクエストあたりの処理は時刻の取得数回とロック付きの加算だけなので、常時有効のままで構いません。
+ワーカーごとの値なので、複数ワーカーで動かす場合は Prometheus 側で合計してください。
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional, Sequence
+
+import anyio.to_thread
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in values]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable[[], dict]] = None):
+        """function を渡すと出力のたびに呼び、返した {ラベル値のタプル: 値} を出力する"""
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self) -> list:
+        if self.function is None:
+            return super().samples()
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.function().items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self) -> list:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = []
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            samples = metric.samples()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "リクエストの処理時間", ("method", "route", "status")
+))
+HTTP_IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "処理中のリクエスト数"))
+HTTP_DB_STATEMENTS = registry.register(Counter(
+    "http_request_db_statements_total", "リクエスト中に実行したSQL文の数（ルート別）", ("method", "route")
+))
+HTTP_DB_SECONDS = registry.register(Counter(
+    "http_request_db_seconds_total", "リクエスト中のSQLの実行時間の合計（ルート別）", ("method", "route")
+))
+DB_STATEMENT_SECONDS = registry.register(Histogram(
+    "db_statement_duration_seconds", "SQL文1件の実行時間", ("engine", "operation"), DB_BUCKETS
+))
+DB_POOL_CHECKOUT_SECONDS = registry.register(Histogram(
+    "db_pool_checkout_duration_seconds", "コネクションプールから接続を取得するまでの時間（待ち・新規接続を含む）", ("engine",), DB_BUCKETS
+))
+DB_POOL_CHECKOUTS = registry.register(Counter("db_pool_checkouts_total", "コネクションプールからの取得回数", ("engine",)))
+
+TIMERS_STARTED = registry.register(Counter("study_game_timers_started_total", "開始したタイマー"))
+TIMERS_STOPPED = registry.register(Counter("study_game_timers_stopped_total", "停止したタイマー"))
+ACTIVE_TIMERS = registry.register(Gauge(
+    "study_game_active_timers", "リース切れでない実行中のタイマー（/metrics の取得時にタイマーストアから数える。TIMER_STORE=memory ではこのワーカーの分）"
+))
+COINS_EARNED = registry.register(Counter("study_game_coins_earned_total", "獲得したコイン", ("source",)))
+COINS_SPENT = registry.register(Counter("study_game_coins_spent_total", "消費したコイン", ("source",)))
+SESSIONS_INGESTED = registry.register(Counter("study_game_sessions_ingested_total", "一括登録で取り込んだ学習セッション"))
+
+# 現在のリクエストで実行したSQLの [件数, 秒]（MetricsMiddleware がリクエストごとに用意する）
+_request_db_usage: ContextVar[Optional[list]] = ContextVar("request_db_usage", default=None)
+
+
+def _threadpool_stats() -> dict:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    return {
+        ("busy",): statistics.borrowed_tokens,
+        ("limit",): limiter.total_tokens,
+        ("waiting",): statistics.tasks_waiting,
+    }
+
+
+registry.register(Gauge(
+    "threadpool_threads", "同期エンドポイント用スレッドプールの使用中・上限・空き待ちの数", ("state",), function=_threadpool_stats
+))
+
+_pools = {}
+
+
+def _pool_stats() -> dict:
+    stats = {}
+    for name, engine in _pools.items():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            stats[(name, "size")] = pool.size()
+            stats[(name, "checked_out")] = pool.checkedout()
+            stats[(name, "overflow")] = max(pool.overflow(), 0)
+            stats[(name, "idle")] = pool.checkedin()
+    return stats
+
+
+registry.register(Gauge(
+    "db_pool_connections", "コネクションプールの接続数（size / checked_out / overflow / idle）", ("engine", "state"), function=_pool_stats
+))
+
+
+def instrument_engine(engine: Engine, name: str) -> Engine:
+    """SQL文の件数・時間とコネクションプールの取得時間を計測する（非同期エンジンは sync_engine を渡す）"""
+    _pools[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        DB_STATEMENT_SECONDS.observe(elapsed, name, statement.lstrip()[:6].upper())
+        usage = _request_db_usage.get()
+        if usage is not None:
+            usage[0] += 1
+            usage[1] += elapsed
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc(name)
+
+    # 取得待ちはプールのイベントでは分からないので、QueuePool の取得処理を計測で包む
+    # （engine.dispose() でプールを作り直すと外れるが、このアプリでは作り直さない）
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        do_get = pool._do_get
+
+        def timed_do_get():
+            started = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started, name)
+
+        pool._do_get = timed_do_get
+    return engine
+
+
+class MetricsMiddleware:
+    """ルートごとのレイテンシ・処理中の数・リクエストあたりのSQLを計測する"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        usage = [0, 0.0]
+        token = _request_db_usage.set(usage)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            _request_db_usage.reset(token)
+            # パスそのものではなくテンプレート（/characters/{character_id}）で集計し、ラベルの種類を増やさない
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.observe(elapsed, method, path, status)
+            if usage[0]:
+                HTTP_DB_STATEMENTS.inc(method, path, amount=usage[0])
+                HTTP_DB_SECONDS.inc(method, path, amount=usage[1])
@@ -0,0 +1,422 @@
+"""
+バージョン付きマイグレーション
+
+スキーマの変更を版番号付きの関数として MIGRATIONS に並べ、適用した版を schema_version に記録します。
+接続先は database.py の get_engine() と同じで、SQLite でも MySQL でも未適用の版だけを順に適用します。
+- 列・テーブル・インデックスの追加は、既にあれば何もしない。
+  版管理の前に旧 migrate_*.py を手作業で適用したデータベースにもそのまま使える
+- 既存行の書き換え（バックフィル）は主キーの範囲ごとの小さなトランザクションで行う。
+  進捗は同じトランザクションで migration_checkpoints に記録するので、中断しても続きから再開できる
+- 1バッチの時間が MIGRATION_CHUNK_SECONDS 前後になるようにバッチの件数を調整する。
+  バッチの後に MIGRATION_DUTY_CYCLE に応じて休み、稼働中のリクエストがロックを待つ時間を抑える
+空のデータベースには create_tables() で全テーブルを作り、最新の版を記録します。
+アプリは起動時に版を確認し、未適用のマイグレーションがあれば起動しません（database.ensure_schema）。
+
+    cd backend
+    python migrations.py status
+    python migrations.py upgrade
+    python migrations.py upgrade --batch-size 200 --duty-cycle 0.1   # 混雑している時間帯はより控えめに
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import inspect, select, update, insert, literal, func, Table
+from sqlalchemy.engine import Engine
+
+from database import (
+    get_engine, create_tables, current_schema_version, stamp_schema_version, SCHEMA_VERSION,
+    Base, Character, CharacterEquipment, Equipment, StudySession, CatalogVersion, SchemaVersion, MigrationCheckpoint,
+    CoinTransaction, CoinBalanceCheckpoint
+)
+from game_logic import get_available_equipment
+from rollups import rebuild_rollups
+
+# 最初のバッチの件数（以降は MIGRATION_CHUNK_SECONDS に合わせて増減する）
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+MIGRATION_MAX_BATCH_SIZE = int(os.getenv("MIGRATION_MAX_BATCH_SIZE", "20000"))
+# 1バッチ（= 書き込みロックを持つ時間）の目標
+MIGRATION_CHUNK_SECONDS = float(os.getenv("MIGRATION_CHUNK_SECONDS", "0.05"))
+# バックフィルが動いている時間の割合（0.25 ならバッチの3倍の時間休む）
+MIGRATION_DUTY_CYCLE = float(os.getenv("MIGRATION_DUTY_CYCLE", "0.25"))
+
+# バッチの件数の下限
+MIN_BATCH_SIZE = 10
+# バックフィルの進捗を表示する間隔（秒）
+PROGRESS_INTERVAL_SECONDS = 5.0
+
+checkpoint_table = MigrationCheckpoint.__table__
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[["MigrationContext"], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """マイグレーションを登録する（版は1から連番で、最後の版を database.SCHEMA_VERSION に合わせる）"""
+    def register(function):
+        MIGRATIONS.append(Migration(version, name, function))
+        return function
+    return register
+
+
+class Throttle:
+    """バックフィルのバッチの件数と、バッチの後に休む時間を決める"""
+
+    def __init__(self, batch_size: int = MIGRATION_BATCH_SIZE, chunk_seconds: float = MIGRATION_CHUNK_SECONDS,
+                 duty_cycle: float = MIGRATION_DUTY_CYCLE, max_batch_size: int = MIGRATION_MAX_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.chunk_seconds = chunk_seconds
+        self.duty_cycle = min(max(duty_cycle, 0.01), 1.0)
+        self.max_batch_size = max_batch_size
+
+    def after_batch(self, elapsed: float) -> float:
+        """バッチの所要時間から次の件数を決め、休む秒数を返す"""
+        if elapsed > 0:
+            # 1回で極端に変えないよう 0.5〜2倍にとどめる
+            factor = min(max(self.chunk_seconds / elapsed, 0.5), 2.0)
+            self.batch_size = int(min(max(self.batch_size * factor, MIN_BATCH_SIZE), self.max_batch_size))
+        return elapsed * (1 / self.duty_cycle - 1)
+
+
+class MigrationContext:
+    """マイグレーション関数に渡す、冪等なスキーマ変更とバックフィルの道具"""
+
+    def __init__(self, engine: Engine, version: int, throttle: Throttle):
+        self.engine = engine
+        self.version = version
+        self.throttle = throttle
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.engine).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in {info["name"] for info in inspect(self.engine).get_columns(table)}
+
+    def add_column(self, table: str, column: str, definition: str) -> bool:
+        """列がなければ追加する（追加したら True）"""
+        if self.has_column(table, column):
+            print(f"ℹ️  {table}.{column} は既に存在します")
+            return False
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"✅ {table}.{column} を追加しました")
+        return True
+
+    def _checkpoint(self, step: str):
+        with self.engine.connect() as connection:
+            return connection.execute(select(checkpoint_table).where(
+                checkpoint_table.c.version == self.version, checkpoint_table.c.step == step
+            )).first()
+
+    def start_step(self, step: str):
+        """
+        バックフィルの開始を記録する。列の追加などの直後に中断しても再実行でバックフィルを続けられるよう、
+        その変更より前に呼ぶ
+        """
+        if self._checkpoint(step) is None:
+            with self.engine.begin() as connection:
+                connection.execute(checkpoint_table.insert(), {
+                    "version": self.version, "step": step, "last_key": 0, "rows_done": 0, "updated_at": datetime.utcnow()
+                })
+
+    def step_pending(self, step: str) -> bool:
+        """開始を記録したまま終わっていないバックフィルか"""
+        checkpoint = self._checkpoint(step)
+        return checkpoint is not None and checkpoint.finished_at is None
+
+    def backfill(self, step: str, table: Table, values: dict, where=None) -> int:
+        """
+        where に当たる行を主キー（整数）の範囲ごとに values で更新し、更新した行数を返す。
+        1バッチごとにコミットし、同じトランザクションで進捗を記録する（完了済みなら何もしない）
+        """
+        def apply(connection, key, lower, upper):
+            statement = update(table).where(key > lower, key <= upper).values(**values)
+            if where is not None:
+                statement = statement.where(where)
+            return connection.execute(statement).rowcount
+
+        return self.each_batch(step, table, apply)
+
+    def each_batch(self, step: str, table: Table, apply: Callable, verb: str = "更新") -> int:
+        """
+        table の主キー（整数）の範囲ごとに apply(connection, key, lower, upper) を呼び、その戻り値（行数）の合計を返す。
+        apply は lower < key <= upper の範囲だけを処理する。backfill と同じく1バッチごとにコミットし、進捗も同じトランザクションで記録する
+        """
+        self.start_step(step)
+        checkpoint = self._checkpoint(step)
+        if checkpoint.finished_at is not None:
+            return checkpoint.rows_done
+
+        key = table.primary_key.columns.values()[0]
+        last_key, rows_done = checkpoint.last_key, checkpoint.rows_done
+        if last_key:
+            print(f"ℹ️  {step}: {key.name}={last_key} の続きから再開します（{rows_done} 行{verb}済み）")
+        progress_at = time.monotonic()
+        while True:
+            started = time.perf_counter()
+            with self.engine.begin() as connection:
+                # バッチの上端の主キー。where に当たる行がまばらでも、1バッチで触れる行は batch_size 件まで
+                upper = connection.scalar(
+                    select(key).where(key > last_key).order_by(key).offset(self.throttle.batch_size - 1).limit(1)
+                )
+                if upper is None:
+                    upper = connection.scalar(select(func.max(key)).where(key > last_key))
+                progress = {"updated_at": datetime.utcnow()}
+                if upper is None:
+                    progress["finished_at"] = progress["updated_at"]
+                else:
+                    rows_done += apply(connection, key, last_key, upper)
+                    last_key = upper
+                    progress.update(last_key=last_key, rows_done=rows_done)
+                connection.execute(update(checkpoint_table).where(
+                    checkpoint_table.c.version == self.version, checkpoint_table.c.step == step
+                ).values(**progress))
+            if upper is None:
+                break
+            pause = self.throttle.after_batch(time.perf_counter() - started)
+            if time.monotonic() - progress_at >= PROGRESS_INTERVAL_SECONDS:
+                print(f"   {step}: {rows_done} 行（{key.name}={last_key} まで、バッチ {self.throttle.batch_size} 件）")
+                progress_at = time.monotonic()
+            time.sleep(pause)
+        print(f"✅ {step}: {rows_done} 行を{verb}しました")
+        return rows_done
+
+
+@migration(1, "create_missing_tables")
+def create_missing_tables(context: MigrationContext):
+    """まだないテーブルをインデックスごと作成する（旧 migrate_certifications.py・migrate_exam_schedules.py など）"""
+    existing = set(inspect(context.engine).get_table_names())
+    Base.metadata.create_all(bind=context.engine)
+    for table in sorted(set(Base.metadata.tables) - existing):
+        print(f"✅ テーブル {table} を作成しました")
+
+
+@migration(2, "character_coins_and_color")
+def character_coins_and_color(context: MigrationContext):
+    """キャラクターに coins・current_color を追加し、追加前からいたキャラクターに初期コイン100を付与する（旧 migrate_coins.py）"""
+    if not context.has_column("characters", "coins"):
+        context.start_step("initial_coins")
+        context.add_column("characters", "coins", "INTEGER DEFAULT 0")
+    context.add_column("characters", "current_color", "VARCHAR(20) DEFAULT '#8B4513'")
+    # 列が既にあった（コインを使い切ったキャラクターがいるかもしれない）場合は付与しない
+    if context.step_pending("initial_coins"):
+        characters = Character.__table__
+        context.backfill("initial_coins", characters, {"coins": 100}, characters.c.coins == 0)
+
+
+# init.sql の初期データ（init.sql の INSERT 文と同じ値）
+INIT_SQL_BONUSES = {
+    "hat_basic": {"experience_multiplier": 1.05, "special_effect": "集中力向上"},
+    "glasses_reading": {"experience_multiplier": 1.05, "special_effect": "知識の蓄積"},
+    "hat_graduation": {"experience_multiplier": 1.1, "special_effect": "学習の成果"},
+    "glasses_smart": {"experience_multiplier": 1.1, "coin_multiplier": 1.05, "special_effect": "未来の知恵"},
+}
+
+
+def equipment_bonuses() -> dict:
+    """装備ID -> ボーナスの対応表"""
+    bonuses = dict(INIT_SQL_BONUSES)
+    for item in get_available_equipment()["accessories"]:
+        if "special_effect" in item:
+            bonuses[item["id"]] = item
+    return bonuses
+
+
+@migration(3, "equipment_bonus")
+def equipment_bonus(context: MigrationContext):
+    """装備マスターにボーナス列を追加して値を設定し、起動中のサーバーが読み込み直すよう版番号を上げる（旧 migrate_equipment_bonus.py）"""
+    context.add_column("equipment", "experience_multiplier", "FLOAT NOT NULL DEFAULT 1.0")
+    context.add_column("equipment", "coin_multiplier", "FLOAT NOT NULL DEFAULT 1.0")
+    context.add_column("equipment", "special_effect", "VARCHAR(100)")
+
+    # 装備マスターは数十件なので1回で更新する
+    equipment = Equipment.__table__
+    updated = 0
+    with context.engine.begin() as connection:
+        for equipment_id, bonus in equipment_bonuses().items():
+            updated += connection.execute(update(equipment).where(equipment.c.id == equipment_id).values(
+                experience_multiplier=bonus.get("experience_multiplier", 1.0),
+                coin_multiplier=bonus.get("coin_multiplier", 1.0),
+                special_effect=bonus["special_effect"]
+            )).rowcount
+        connection.execute(
+            update(CatalogVersion.__table__).where(CatalogVersion.name == "equipment").values(version=CatalogVersion.version + 1)
+        )
+    print(f"✅ {updated} 件の装備にボーナスを設定しました")
+
+
+@migration(4, "timer_heartbeat")
+def timer_heartbeat(context: MigrationContext):
+    """学習セッションにタイマーのハートビート列を追加する（旧 migrate_timer_heartbeat.py）"""
+    context.add_column("study_sessions", "heartbeat_at", "DATETIME")
+
+
+@migration(5, "character_version")
+def character_version(context: MigrationContext):
+    """キャラクターに楽観的排他制御用の version 列を追加する（旧 migrate_character_version.py）"""
+    context.add_column("characters", "version", "INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(6, "character_revision")
+def character_revision(context: MigrationContext):
+    """キャラクターに ETag 用の変更カウンタ revision 列を追加する（旧 migrate_character_revision.py）"""
+    context.add_column("characters", "revision", "INTEGER NOT NULL DEFAULT 0")
+
+
+def find_duplicate_equipment(connection) -> list:
+    """一意インデックスの作成を妨げる (character_id, equipment_id) の重複を探す"""
+    return connection.execute(
+        select(CharacterEquipment.character_id, CharacterEquipment.equipment_id, func.count())
+        .group_by(CharacterEquipment.character_id, CharacterEquipment.equipment_id)
+        .having(func.count() > 1)
+    ).all()
+
+
+@migration(7, "declared_indexes")
+def declared_indexes(context: MigrationContext):
+    """モデルに宣言した複合インデックスを既存テーブルに作成する（旧 migrate_indexes.py）"""
+    with context.engine.begin() as connection:
+        duplicates = find_duplicate_equipment(connection)
+        if duplicates:
+            for character_id, equipment_id, count in duplicates:
+                print(f"❌ character_id={character_id} が {equipment_id} を {count} 件所持しています")
+            raise RuntimeError("character_equipment に重複があるため一意インデックスを作成できません")
+
+        for table in Base.metadata.sorted_tables:
+            # 後の版で追加する列のインデックスは、その列を追加する版で作る
+            columns = {info["name"] for info in inspect(connection).get_columns(table.name)}
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                if not {column.name for column in index.columns} <= columns:
+                    continue
+                index.create(bind=connection, checkfirst=True)
+                print(f"✅ {table.name}.{index.name}")
+
+
+@migration(8, "active_timer_index")
+def active_timer_index(context: MigrationContext):
+    """実行中タイマー（study_sessions.ended_at IS NULL）を数えるためのインデックス"""
+    index = next(i for i in StudySession.__table__.indexes if i.name == "ix_study_sessions_ended_at")
+    with context.engine.begin() as connection:
+        index.create(bind=connection, checkfirst=True)
+
+
+@migration(9, "character_updated_at")
+def character_updated_at(context: MigrationContext):
+    """ランキングを差分で読み直すための characters.updated_at（既存行は NULL のまま。起動時の作り直しで読む）"""
+    context.add_column("characters", "updated_at", "DATETIME")
+    index = next(i for i in Character.__table__.indexes if i.name == "ix_characters_updated_at")
+    with context.engine.begin() as connection:
+        index.create(bind=connection, checkfirst=True)
+
+
+@migration(10, "coin_opening_balances")
+def coin_opening_balances(context: MigrationContext):
+    """
+    取引履歴ができる前に付与されたコイン（init.sql の初期データ、002 の初期コイン）を開始残高の取引として記録する。
+    チェックポイントのないキャラクターに「残高 - 既存の取引の合計」を transaction_type="opening" で1件書く
+    """
+    characters = Character.__table__
+    transactions = CoinTransaction.__table__
+    ledger_sum = (
+        select(func.coalesce(func.sum(transactions.c.amount), 0))
+        .where(transactions.c.character_id == characters.c.id)
+        .scalar_subquery()
+    )
+    opening = characters.c.coins - ledger_sum
+    has_checkpoint = (
+        select(CoinBalanceCheckpoint.character_id)
+        .where(CoinBalanceCheckpoint.character_id == characters.c.id)
+        .exists()
+    )
+
+    def apply(connection, key, lower, upper):
+        rows = select(
+            characters.c.id, opening, literal("opening"), literal("opening_balance"), literal(datetime.utcnow())
+        ).where(key > lower, key <= upper, opening != 0, ~has_checkpoint)
+        return connection.execute(insert(transactions).from_select(
+            ["character_id", "amount", "transaction_type", "source", "created_at"], rows
+        )).rowcount
+
+    context.each_batch("opening_balances", characters, apply, verb="記録")
+
+
+@migration(11, "study_daily_rollups_backfill")
+def study_daily_rollups_backfill(context: MigrationContext):
+    """日別集計（study_daily_rollups）を study_sessions からキャラクターIDの範囲ごとに作り直す（rollups.py のバックフィル）"""
+    def apply(connection, key, lower, upper):
+        return rebuild_rollups(connection, lower, upper)
+
+    context.each_batch("rollups", Character.__table__, apply, verb="集計")
+
+
+if [m.version for m in MIGRATIONS] != list(range(1, SCHEMA_VERSION + 1)):
+    raise RuntimeError(f"Migrations must be numbered 1..{SCHEMA_VERSION} (database.SCHEMA_VERSION)")
+
+
+def pending_migrations(engine: Optional[Engine] = None) -> List[Migration]:
+    version = current_schema_version(engine or get_engine()) or 0
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def upgrade(engine: Optional[Engine] = None, target: Optional[int] = None, throttle: Optional[Throttle] = None) -> int:
+    """未適用のマイグレーションを target の版まで順に適用し、適用した数を返す"""
+    engine = engine or get_engine()
+    if current_schema_version(engine) is None and not inspect(engine).get_table_names():
+        create_tables()
+        print(f"✅ 空のデータベースに全テーブルを作成しました（v{SCHEMA_VERSION}）")
+        return 0
+
+    # 版管理より前のデータベースには版・進捗のテーブルがない
+    Base.metadata.create_all(bind=engine, tables=[SchemaVersion.__table__, checkpoint_table])
+    throttle = throttle or Throttle()
+    applied = 0
+    for m in pending_migrations(engine):
+        if target is not None and m.version > target:
+            break
+        print(f"▶ {m.version:03d} {m.name}")
+        m.upgrade(MigrationContext(engine, m.version, throttle))
+        # MySQL の DDL はトランザクションに含まれないので、適用し終えてから記録する（途中で失敗したら最初からやり直す）
+        with engine.begin() as connection:
+            stamp_schema_version(connection, m.version, m.name)
+        applied += 1
+    print(f"✅ マイグレーションが完了しました（v{current_schema_version(engine)}、{applied} 件適用）")
+    return applied
+
+
+def print_status(engine: Optional[Engine] = None):
+    engine = engine or get_engine()
+    version = current_schema_version(engine)
+    print(f"データベースの版: {version if version is not None else '未記録'} / アプリの版: {SCHEMA_VERSION}")
+    for m in MIGRATIONS:
+        state = "適用済み" if version is not None and m.version <= version else "未適用"
+        print(f"  {m.version:03d} {m.name:<28} {state}")
+    if inspect(engine).has_table(checkpoint_table.name):
+        with engine.connect() as connection:
+            for checkpoint in connection.execute(select(checkpoint_table).where(checkpoint_table.c.finished_at.is_(None))):
+                print(f"  ⏸  {checkpoint.version:03d} {checkpoint.step}: {checkpoint.rows_done} 行（キー {checkpoint.last_key} まで）で中断中")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="バージョン付きマイグレーション")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("status", help="適用済みの版と中断中のバックフィルを表示")
+    upgrade_parser = subcommands.add_parser("upgrade", help="未適用のマイグレーションを適用")
+    upgrade_parser.add_argument("--target", type=int, help="この版まで適用する")
+    upgrade_parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    upgrade_parser.add_argument("--chunk-seconds", type=float, default=MIGRATION_CHUNK_SECONDS)
+    upgrade_parser.add_argument("--duty-cycle", type=float, default=MIGRATION_DUTY_CYCLE)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print_status()
+    else:
+        upgrade(target=args.target, throttle=Throttle(args.batch_size, args.chunk_seconds, args.duty_cycle))
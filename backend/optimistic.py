@@ -0,0 +1,81 @@
+"""
+キャラクターの楽観的排他制御
+
+characters.version を使い、読み込んだ時点から誰も更新していない場合だけ書き込みます。
+    UPDATE characters SET ..., version = version + 1 WHERE id = ? AND version = ? [AND coins >= ?]
+更新件数が0（他のリクエストが先に更新した）なら読み込み直して計算し直し、OPTIMISTIC_MAX_RETRIES 回まで再試行します。
+行ロック（SELECT ... FOR UPDATE）を取らないので、同じキャラクターへの読み込みが書き込みを待つことはありません。
+
+再試行はトランザクション内で読み込み直すため、MySQL は READ COMMITTED で接続します（engine_profiles.py）。
+SQLite は最初の書き込み以降は他の書き込みが入らないので、競合は最初の書き込みの前にしか起きません。
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Callable
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Character
+from replicas import replica_router
+
+OPTIMISTIC_MAX_RETRIES = int(os.getenv("OPTIMISTIC_MAX_RETRIES", "8"))
+
+# 再試行前の待ち時間の上限（秒、試行ごとに倍にしてランダムに待つ）
+OPTIMISTIC_BACKOFF_SECONDS = float(os.getenv("OPTIMISTIC_BACKOFF_SECONDS", "0.002"))
+
+
+def versioned_update(character: Character, values: dict, *conditions):
+    """読み込んだ version のままの場合だけ values を書き込む UPDATE 文（ETag 用の変更カウンタも進める）"""
+    # 書き込んだ直後の読み取りはレプリカではなくプライマリから返す（replicas.py）
+    replica_router.pin(character.id)
+    return (
+        update(Character)
+        .where(Character.id == character.id, Character.version == character.version, *conditions)
+        .values(version=character.version + 1, revision=Character.revision + 1, **values)
+    )
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, OPTIMISTIC_BACKOFF_SECONDS * (2 ** attempt))
+
+
+def _conflict() -> HTTPException:
+    return HTTPException(status_code=409, detail="Character was updated concurrently, please retry")
+
+
+async def update_character(db: AsyncSession, character_id: int, compute: Callable[[Character], dict], *conditions) -> Character:
+    """
+    キャラクターを読み込み、compute(character) が返す値を楽観的排他制御で書き込む。
+    compute は再試行のたびに最新の値で呼ばれる（HTTPException を送出すればそのまま中断する）。
+    書き込み後の値を反映したキャラクターを返す（コミットは呼び出し元で行う）
+    """
+    for attempt in range(OPTIMISTIC_MAX_RETRIES):
+        character = await db.get(Character, character_id, populate_existing=True)
+        if character is None:
+            raise HTTPException(status_code=404, detail="Character not found")
+        values = compute(character)
+        result = await db.execute(versioned_update(character, values, *conditions))
+        if result.rowcount == 1:
+            return character
+        await asyncio.sleep(_backoff(attempt))
+    raise _conflict()
+
+
+def update_character_sync(db: Session, character_id: int, compute: Callable[[Character], dict], *conditions) -> Character:
+    """update_character の同期版（一括登録やバッチ処理用）"""
+    for attempt in range(OPTIMISTIC_MAX_RETRIES):
+        character = db.get(Character, character_id, populate_existing=True)
+        if character is None:
+            raise HTTPException(status_code=404, detail="Character not found")
+        values = compute(character)
+        result = db.execute(versioned_update(character, values, *conditions))
+        if result.rowcount == 1:
+            return character
+        time.sleep(_backoff(attempt))
+    raise _conflict()
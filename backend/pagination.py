@@ -0,0 +1,86 @@
+"""
+履歴一覧APIのキーセット（カーソル）ページング
+
+(並び順の列, id) の組で並べ、前ページ最後の行より後ろだけを取得するため、
+OFFSET と違って何ページ目でも先頭ページと同じコストで取得できます。
+カーソルは (並び順の値, id) を base64 で包んだ不透明な文字列です。
+
+limit と cursor のどちらも指定されない場合は従来どおり全件を配列で返します（既存フロントエンド互換）。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_is_datetime: bool = True) -> Tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if sort_is_datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def is_paginated(limit: Optional[int], cursor: Optional[str]) -> bool:
+    """ページングが要求されたか（どちらもなければ従来の全件配列レスポンス）"""
+    return limit is not None or cursor is not None
+
+
+def keyset_query(query, sort_column, id_column, limit: Optional[int], cursor: Optional[str], descending: bool = True):
+    """
+    select 文にキーセット条件・並び順・件数を付ける。
+    次ページの有無を判定するため limit + 1 件を取得するので、結果は build_page に渡す
+    """
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+
+    if cursor is not None:
+        sort_is_datetime = sort_column.type.python_type is datetime
+        sort_value, row_id = decode_cursor(cursor, sort_is_datetime)
+        if descending:
+            query = query.where(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < row_id)
+            ))
+        else:
+            query = query.where(or_(
+                sort_column > sort_value,
+                and_(sort_column == sort_value, id_column > row_id)
+            ))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    return query.limit(limit + 1)
+
+
+def build_page(rows: list, limit: Optional[int], sort_attr: str) -> dict:
+    """keyset_query の結果から {"items", "next_cursor"} を組み立てる"""
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_attr), last.id)
+    return {"items": items, "next_cursor": next_cursor}
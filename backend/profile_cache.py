@@ -0,0 +1,106 @@
+"""
+キャラクタープロフィール（/characters/{id}/appearance のレスポンス）のLRUキャッシュ
+
+外見・装備ボーナス・次のレベルまでの経験値はキャラクターか装備が変わったときにしか変化しないため、
+組み立て済みのレスポンスをキャッシュし、ヒット時はDBに触れずに返します。
+stop_timer・一括登録・購入・装備の着脱がコミット後に invalidate() を呼びます。
+
+各ワーカーは自分が処理した書き込みでしか無効化されないため、複数ワーカー構成で他ワーカーの書き込みを
+反映するまでの上限として PROFILE_CACHE_TTL_SECONDS を設けています（0以下で無期限）。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "30"))
+
+
+class ProfileCache:
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl_seconds: float = PROFILE_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # 読み込み中に無効化されたプロフィールを書き戻さないため、最近の無効化の通し番号を覚えておく
+        # （キャラクターごとに増え続けないよう max_size 件までにし、あふれた分は _forgotten より前として扱う）
+        self._sequence = 0
+        self._invalidated = OrderedDict()  # character_id -> 最後に無効化したときの通し番号
+        self._forgotten = 0  # 捨てた記録のうち最大の通し番号
+        self._epoch = 0  # clear() のたびに進める
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, character_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(character_id)
+            if entry is not None:
+                profile, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(character_id)
+                    self.hits += 1
+                    return profile
+                del self._entries[character_id]
+            self.misses += 1
+            return None
+
+    def generation(self, character_id: int) -> tuple:
+        """DBから組み立てる前に取得し、put() に渡す"""
+        with self._lock:
+            return (self._epoch, self._sequence)
+
+    def put(self, character_id: int, profile: dict, generation: tuple) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            epoch, sequence = generation
+            if epoch != self._epoch or self._invalidated.get(character_id, 0) > sequence:
+                return
+            # 読み込み開始後の記録を捨てていれば、このキャラクターが無効化されたかわからないので書き戻さない
+            if self._forgotten > sequence:
+                return
+            self._entries[character_id] = (profile, expires_at)
+            self._entries.move_to_end(character_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, character_id: int) -> None:
+        with self._lock:
+            self._sequence += 1
+            self._invalidated[character_id] = self._sequence
+            self._invalidated.move_to_end(character_id)
+            while len(self._invalidated) > self.max_size:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+            self._entries.pop(character_id, None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """装備マスターの更新時など、全プロフィールを破棄する"""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._invalidated.clear()
+            self._forgotten = 0
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+profile_cache = ProfileCache()
@@ -0,0 +1,260 @@
+"""
+リクエスト単位のプロファイリング（スタックサンプリング）
+
+遅いエンドポイントの中で時間がどこにかかっているかを、本番でも1リクエストだけ取り出して確認するための仕組みです。
+次のどちらかに当たったリクエストだけを、PROFILE_INTERVAL_SECONDS ごとのスタックサンプリングで計測します。
+- X-Profile ヘッダー付きで、X-Admin-Token が ADMIN_TOKEN と一致するリクエスト
+- PROFILE_SAMPLE_RATE（0〜1、既定 0）の確率で選ばれたリクエスト
+
+サンプリングは別スレッドで行い、このリクエストを処理しているスレッドのスタックだけを集めます（同時に処理中の他のリクエストは混ざらない）。
+- イベントループ: このリクエストのタスクが動いているときのスタック。SQLAlchemy の AsyncSession の処理（greenlet 上）も含む
+- スレッドプール: このリクエストの同期エンドポイントを実行している間のスレッド（wrap_sync_endpoints で登録）
+- どちらも動いていない間（DBの応答待ち・他のタスクの実行中）は "(waiting)" として数える
+SQLAlchemy や Pydantic（Python側の呼び出し）のフレームもそのまま残ります。
+サンプラーも GIL を取ってから動くので、CPUを使い続けている間の実際の間隔は sys.getswitchinterval()（既定 5ms）程度になります。
+
+結果は PROFILE_DIR に collapsed stack 形式（"関数;関数;... 件数"、flamegraph.pl や speedscope で表示可能）で保存し、
+レスポンスの X-Profile-Id ヘッダーの ID で GET /admin/profiles/{profile_id} から取得します。
+どちらの条件も有効でない場合はミドルウェアは何もせずに素通しします。
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import List, Optional
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.001"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "study_game_profiles"))
+# 保存しておくプロファイルの数（古いものから削除）
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    """1リクエスト分のスタックサンプル（どのスレッドのどこから下を集めるかを登録しておく）"""
+
+    def __init__(self):
+        self.id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        self.stacks = Counter()
+        self.samples = 0
+        self._loop = None
+        self._task = None
+        self._loop_thread = None
+        self._roots = {}  # スレッドプールのスレッドID -> 同期エンドポイントの呼び出しのフレーム
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name=f"profile-{self.id}", daemon=True)
+
+    def attach(self, frame):
+        with self._lock:
+            self._roots[threading.get_ident()] = frame
+
+    def detach(self):
+        with self._lock:
+            self._roots.pop(threading.get_ident(), None)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._loop_thread = threading.get_ident()
+        self._sampler.start()
+
+    def stop(self, wait: bool = True):
+        self._stopped.set()
+        if wait:
+            self._sampler.join()
+
+    def _record(self, frame, root=None):
+        stack = []
+        while frame is not None and frame is not root:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        if root is not None:
+            if frame is None:
+                return
+            stack.append(_frame_label(root))
+        self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            roots = list(self._roots.items())
+        for thread_id, root in roots:
+            self._record(frames.get(thread_id), root)
+        # イベントループではこのリクエストのタスクが動いている間だけ集める
+        # （AsyncSession の処理は greenlet 上で動き、呼び出し元のフレームをたどれないのでスタック全体を残す）
+        if asyncio.current_task(self._loop) is self._task:
+            self._record(frames.get(self._loop_thread))
+        elif not roots:
+            # 他のタスクの実行中や、DBの応答・入出力を待っている間
+            self.stacks["(waiting)"] += 1
+            self.samples += 1
+
+    def _run(self):
+        while not self._stopped.wait(PROFILE_INTERVAL_SECONDS):
+            self._sample()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _prune(directory: str):
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in names[:max(len(names) - PROFILE_KEEP, 0)]:
+        for suffix in (".json", ".collapsed"):
+            try:
+                os.remove(os.path.join(directory, name[:-5] + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def save_profile(profile: RequestProfile, info: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile.id}.collapsed"), "w", encoding="utf-8") as f:
+        f.write(profile.collapsed())
+    with open(os.path.join(PROFILE_DIR, f"{profile.id}.json"), "w", encoding="utf-8") as f:
+        json.dump({"id": profile.id, "samples": profile.samples, **info}, f, ensure_ascii=False)
+    _prune(PROFILE_DIR)
+
+
+def list_profiles() -> List[dict]:
+    """保存済みのプロファイルの情報（新しい順）"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted((name for name in os.listdir(PROFILE_DIR) if name.endswith(".json")), reverse=True):
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """プロファイルのファイルのパス（IDの形式が正しくない・存在しない場合は None）"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+    return path if os.path.exists(path) else None
+
+
+def _profiled(call):
+    @wraps(call)
+    def profiled_call(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return call(*args, **kwargs)
+        profile.attach(sys._getframe())
+        try:
+            return call(*args, **kwargs)
+        finally:
+            profile.detach()
+
+    profiled_call.profiling_wrapped = True
+    return profiled_call
+
+
+def wrap_sync_endpoints(app: FastAPI):
+    """
+    同期エンドポイントをスレッドプールで実行している間も計測できるように、呼び出しを包む
+    （プロファイル中でなければ ContextVar を1回読むだけ）
+    """
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        call = route.dependant.call
+        if asyncio.iscoroutinefunction(call) or getattr(call, "profiling_wrapped", False):
+            continue
+        route.dependant.call = _profiled(call)
+
+
+def _finish_profile(profile: RequestProfile, info: dict):
+    profile.stop()
+    try:
+        save_profile(profile, info)
+    except OSError as e:
+        print(f"Error saving request profile: {e}")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, admin_token: Optional[str] = None, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.enabled = bool(admin_token) or sample_rate > 0
+
+    def _requested(self, scope: Scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        if not self.admin_token:
+            return False
+        headers = dict(scope["headers"])
+        return b"x-profile" in headers and hmac.compare_digest(
+            headers.get(b"x-admin-token", b""), self.admin_token.encode("latin-1")
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        status = 500
+
+        async def send_with_profile_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(raw=message["headers"])["X-Profile-Id"] = profile.id
+            await send(message)
+
+        token = _current_profile.set(profile)
+        profile.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            # 書き出しを待つ間のサンプルを含めないよう、先に止めておく
+            profile.stop(wait=False)
+            _current_profile.reset(token)
+            route = scope.get("route")
+            # サンプラーのスレッドの join とファイルの書き込みでイベントループを止めない
+            await run_in_threadpool(_finish_profile, profile, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+                "interval_ms": PROFILE_INTERVAL_SECONDS * 1000,
+                "created_at": datetime.utcnow().isoformat(),
+            })
@@ -0,0 +1,226 @@
+"""
+試験予定のリマインダー（exam_date - reminder_days 日）を発火するスケジューラー
+
+起動時に status="scheduled" で試験日が今日以降の試験予定をヒープ（発火時刻順）に読み込み、
+バックグラウンドタスクが次の発火時刻まで待ってから、期限の来たものだけを取り出して reminder_outbox に書き込みます。
+- 1件の追加・取り出しは O(log n)。試験予定を範囲検索し直すことはない
+- 試験予定の作成・更新・削除・一括登録のたびに schedule / cancel / load で最新に保つ
+  （更新・削除では古いエントリをヒープから探さず、取り出し時に捨てる）
+- reminder_outbox は (exam_schedule_id, remind_at) が一意なので、複数ワーカーや再起動でも二重に書き込まない
+- ヒープはワーカーごとなので、他のワーカーが更新・削除した試験の古いエントリが残りうる。
+  発火時に INSERT … SELECT で試験予定がまだ同じ日付・日数で予定中かを確かめ、1件ずつセーブポイントで書き込む
+試験日・発火時刻・「今日」はすべてタイムゾーンなしのUTC（datetime.utcnow()、bulk_import.parse_date）で扱います。
+クライアントはポーリングの代わりに GET /reminders/due/{character_id} で発火済みのリマインダーを受け取ります。
+"""
+
+import asyncio
+import heapq
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import DateTime, literal, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal, ExamSchedule, ReminderOutbox
+
+# 次の発火時刻が先でも、この秒数ごとには起きる（時計の変更や書き込み失敗の再試行のため）
+REMINDER_MAX_SLEEP_SECONDS = float(os.getenv("REMINDER_MAX_SLEEP_SECONDS", "60"))
+
+outbox_table = ReminderOutbox.__table__
+
+
+class Reminder(NamedTuple):
+    exam_schedule_id: int
+    character_id: int
+    exam_name: str
+    exam_date: datetime
+    remind_at: datetime
+
+
+def outbox_insert_statement(dialect_name: str):
+    """reminder_outbox に書き込む INSERT 文（書き込み済みのリマインダーは無視する）"""
+    if dialect_name == "mysql":
+        return mysql_insert(outbox_table).prefix_with("IGNORE")
+    return sqlite_insert(outbox_table).on_conflict_do_nothing()
+
+
+def outbox_insert_from_exam(dialect_name: str, reminder: Reminder, fired_at: datetime):
+    """試験予定がリマインダーを作ったときのまま（予定中・同じ試験日・同じ日数）のときだけ書き込む INSERT … SELECT"""
+    reminder_days = (reminder.exam_date - reminder.remind_at).days
+    current = select(
+        ExamSchedule.id, ExamSchedule.character_id, ExamSchedule.exam_name, ExamSchedule.exam_date,
+        literal(reminder.remind_at, DateTime()), literal(fired_at, DateTime())
+    ).where(
+        ExamSchedule.id == reminder.exam_schedule_id,
+        ExamSchedule.status == "scheduled",
+        ExamSchedule.exam_date == reminder.exam_date,
+        ExamSchedule.reminder_days == reminder_days
+    )
+    columns = ["exam_schedule_id", "character_id", "exam_name", "exam_date", "remind_at", "fired_at"]
+    return outbox_insert_statement(dialect_name).from_select(columns, current)
+
+
+def _reminder(exam_id: int, character_id: int, exam_name: str, exam_date: datetime, reminder_days: Optional[int]) -> Optional[Reminder]:
+    if reminder_days is None:
+        return None
+    if exam_date.tzinfo is not None:
+        # DBにはタイムゾーンなしのUTCで保存している（bulk_import.parse_date）
+        exam_date = exam_date.astimezone(timezone.utc).replace(tzinfo=None)
+    return Reminder(exam_id, character_id, exam_name, exam_date, exam_date - timedelta(days=reminder_days))
+
+
+class ReminderScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []  # (remind_at, exam_schedule_id)
+        self._entries = {}  # exam_schedule_id -> Reminder（ヒープ内の古いエントリはここと一致しない）
+        self._loop = None
+        self._wakeup = None
+        self.fired = 0
+
+    def load(self, db: Session, character_ids: Optional[Iterable[int]] = None):
+        """予定中の試験を読み込む（character_ids を指定した場合はそのキャラクターの分だけ読み直す）"""
+        query = select(
+            ExamSchedule.id, ExamSchedule.character_id, ExamSchedule.exam_name,
+            ExamSchedule.exam_date, ExamSchedule.reminder_days
+        ).where(
+            ExamSchedule.status == "scheduled",
+            ExamSchedule.exam_date >= datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        )
+        if character_ids is not None:
+            query = query.where(ExamSchedule.character_id.in_(set(character_ids)))
+        reminders = [reminder for reminder in (_reminder(*row) for row in db.execute(query)) if reminder]
+
+        with self._lock:
+            if character_ids is None:
+                self._entries = {reminder.exam_schedule_id: reminder for reminder in reminders}
+                self._heap = [(reminder.remind_at, reminder.exam_schedule_id) for reminder in reminders]
+                heapq.heapify(self._heap)
+            else:
+                for reminder in reminders:
+                    self._push(reminder)
+        self._wake()
+
+    def schedule(self, exam: ExamSchedule):
+        """作成・更新した試験予定を登録し直す（予定中でなくなった試験は取り消す）"""
+        reminder = None
+        if exam.status == "scheduled":
+            reminder = _reminder(exam.id, exam.character_id, exam.exam_name, exam.exam_date, exam.reminder_days)
+        if reminder is None:
+            self.cancel(exam.id)
+            return
+        with self._lock:
+            self._push(reminder)
+            earliest = self._heap[0][1] == reminder.exam_schedule_id
+        if earliest:
+            self._wake()
+
+    def cancel(self, exam_id: int):
+        with self._lock:
+            self._entries.pop(exam_id, None)
+
+    def _push(self, reminder: Reminder):
+        self._entries[reminder.exam_schedule_id] = reminder
+        heapq.heappush(self._heap, (reminder.remind_at, reminder.exam_schedule_id))
+        # 更新・取り消しで古いエントリが溜まったら作り直す
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(entry.remind_at, exam_id) for exam_id, entry in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _is_current(self, remind_at: datetime, exam_id: int) -> bool:
+        entry = self._entries.get(exam_id)
+        return entry is not None and entry.remind_at == remind_at
+
+    def pop_due(self, now: datetime) -> List[Reminder]:
+        """発火時刻が now 以前のリマインダーを取り出す"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                remind_at, exam_id = heapq.heappop(self._heap)
+                if self._is_current(remind_at, exam_id):
+                    due.append(self._entries.pop(exam_id))
+        return due
+
+    def next_due(self) -> Optional[datetime]:
+        with self._lock:
+            while self._heap and not self._is_current(*self._heap[0]):
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def fire_due(self, db: Session, now: Optional[datetime] = None) -> int:
+        """期限の来たリマインダーを reminder_outbox に書き込み、件数を返す"""
+        due = self.pop_due(now or datetime.utcnow())
+        if not due:
+            return 0
+        dialect_name = db.get_bind().dialect.name
+        fired_at = datetime.utcnow()
+        written = 0
+        failed = []
+        try:
+            for reminder in due:
+                try:
+                    # 書き込めない1件（直前に削除された試験など）でバッチ全体を取り消さない
+                    with db.begin_nested():
+                        written += db.execute(outbox_insert_from_exam(dialect_name, reminder, fired_at)).rowcount
+                except DBAPIError as e:
+                    print(f"Error firing reminder for exam {reminder.exam_schedule_id}: {e}")
+                    failed.append(reminder)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._retry(db, due)
+            raise
+        if failed:
+            self._retry(db, failed)
+        self.fired += written
+        return written
+
+    def _retry(self, db: Session, reminders: List[Reminder]):
+        # 次の周回で書き込み直す（その間に削除・変更された試験を拾うため、できればDBから読み直す）
+        try:
+            self.load(db, {reminder.character_id for reminder in reminders})
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for reminder in reminders:
+                    if reminder.exam_schedule_id not in self._entries:
+                        self._push(reminder)
+
+    def _wake(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        """次の発火時刻まで待って発火する（lifespan でタスクとして起動する）"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                self._wakeup.clear()
+                try:
+                    async with AsyncSessionLocal() as db:
+                        await db.run_sync(self.fire_due)
+                except Exception as e:
+                    print(f"Error firing exam reminders: {e}")
+                next_due = self.next_due()
+                timeout = REMINDER_MAX_SLEEP_SECONDS
+                if next_due is not None:
+                    timeout = min(max((next_due - datetime.utcnow()).total_seconds(), 0), timeout)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._loop = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": len(self._entries), "heap_size": len(self._heap), "fired": self.fired}
+
+
+reminder_scheduler = ReminderScheduler()
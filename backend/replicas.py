@@ -0,0 +1,190 @@
+"""
+読み取り専用のエンドポイントをリードレプリカに振り分ける
+
+DB_REPLICA_URLS（カンマ区切り。同期ドライバーのURLで、非同期用は同じ接続先の aiosqlite / aiomysql を使う）を設定すると、
+dependencies=[Depends(use_replica)] を付けたエンドポイントの SELECT をレプリカに送ります。未設定なら何もしません。
+- レプリカはラウンドロビンで選ぶ。REPLICA_HEALTH_CHECK_SECONDS ごとのヘルスチェックに失敗したものは外す
+  （MySQL はレプリケーションの遅延が REPLICA_MAX_LAG_SECONDS を超えたものも外す）。使えるものがなければプライマリを使う
+- INSERT / UPDATE / DELETE と flush は、同じセッションでも常にプライマリに送る（database.py の get_bind）
+- キャラクターを書き換えると（etags.bump_revision / optimistic.versioned_update）、そのキャラクターの読み取りを
+  REPLICA_PIN_SECONDS の間プライマリに固定し、書いた直後の読み取りで古いデータを返さない（read-your-writes）。
+  固定はワーカーごとなので、複数ワーカーではクライアントを同じワーカーに振り分けるか、遅延より長めの時間にしておく
+
+ローカルでは SQLite のファイルをコピーしてレプリカの代わりにできます（コピー以降の書き込みは反映されない）。
+    cp study_game.db study_game_replica.db
+    DB_REPLICA_URLS=sqlite:///./study_game_replica.db python main.py
+"""
+
+import itertools
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+import metrics
+from engine_profiles import engine_options, apply_profile
+
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "5"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_PIN_SECONDS = float(os.getenv("REPLICA_PIN_SECONDS", "10"))
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "mysql+pymysql": "mysql+aiomysql"}
+
+# このリクエストの読み取りに使うレプリカ（use_replica が設定する。None ならプライマリ）
+_replica: ContextVar[Optional["Replica"]] = ContextVar("replica", default=None)
+
+
+def async_url(url: str) -> str:
+    scheme, _, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+class Replica:
+    def __init__(self, index: int, url: str):
+        self.name = f"replica{index}"
+        self.url = url
+        self.healthy = True
+        self.error = None
+        self._engine = None
+        self._async_engine = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    engine = apply_profile(create_engine(self.url, **engine_options(self.url)))
+                    self._watch(engine)
+                    self._engine = metrics.instrument_engine(engine, self.name)
+        return self._engine
+
+    @property
+    def async_engine(self) -> AsyncEngine:
+        if self._async_engine is None:
+            with self._lock:
+                if self._async_engine is None:
+                    url = async_url(self.url)
+                    engine = create_async_engine(url, **engine_options(url))
+                    apply_profile(engine.sync_engine)
+                    self._watch(engine.sync_engine)
+                    metrics.instrument_engine(engine.sync_engine, f"{self.name}-async")
+                    self._async_engine = engine
+        return self._async_engine
+
+    def _watch(self, engine: Engine):
+        # 接続が切れたら次のヘルスチェックを待たずに外す
+        @event.listens_for(engine, "handle_error")
+        def _on_error(context):
+            if context.is_disconnect and self.healthy:
+                print(f"Read replica {self.name} disconnected: {context.original_exception}")
+                self.healthy, self.error = False, str(context.original_exception)
+
+    def check(self):
+        """SELECT 1（MySQL はレプリケーションの遅延も）で使えるかを確かめる"""
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                lag = None
+                if self.engine.dialect.name == "mysql":
+                    status = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+                    if status is not None:
+                        lag = status.get("Seconds_Behind_Source")
+                        if lag is None:
+                            raise RuntimeError("replication is not running")
+                if lag is not None and lag > REPLICA_MAX_LAG_SECONDS:
+                    raise RuntimeError(f"replication lag {lag}s exceeds {REPLICA_MAX_LAG_SECONDS}s")
+            if not self.healthy:
+                print(f"Read replica {self.name} is healthy again")
+            self.healthy, self.error = True, None
+        except Exception as e:
+            if self.healthy:
+                print(f"Read replica {self.name} is unhealthy: {e}")
+            self.healthy, self.error = False, str(e)
+
+
+class ReplicaRouter:
+    def __init__(self, urls: List[str] = DB_REPLICA_URLS, pin_seconds: float = REPLICA_PIN_SECONDS):
+        self.replicas = [Replica(index, url) for index, url in enumerate(urls, 1)]
+        self.pin_seconds = pin_seconds
+        self._counter = itertools.count()
+        self._pins = {}  # character_id -> プライマリに固定する期限（time.monotonic()）
+        self._lock = threading.Lock()
+
+    def choose(self) -> Optional[Replica]:
+        """健全なレプリカをラウンドロビンで選ぶ（なければ None = プライマリ）"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def pin(self, *character_ids: int):
+        """書き込んだキャラクターの読み取りを一定時間プライマリに固定する"""
+        if not self.replicas:
+            return
+        until = time.monotonic() + self.pin_seconds
+        with self._lock:
+            for character_id in character_ids:
+                self._pins[character_id] = until
+            # 期限切れの固定が溜まったら捨てる
+            if len(self._pins) > 10000:
+                now = time.monotonic()
+                self._pins = {key: value for key, value in self._pins.items() if value > now}
+
+    def is_pinned(self, character_id: int) -> bool:
+        until = self._pins.get(character_id)
+        return until is not None and until > time.monotonic()
+
+    def check_all(self):
+        for replica in self.replicas:
+            replica.check()
+
+    async def dispose(self):
+        for replica in self.replicas:
+            if replica._async_engine is not None:
+                await replica._async_engine.dispose()
+                replica._async_engine = None
+
+    def stats(self) -> dict:
+        return {
+            replica.name: {"healthy": replica.healthy, "error": replica.error} for replica in self.replicas
+        }
+
+
+replica_router = ReplicaRouter()
+
+REPLICA_READS = metrics.registry.register(metrics.Counter(
+    "db_replica_routed_requests_total", "use_replica を付けたリクエストの読み取り先（replica / primary / pinned）", ("target",)
+))
+metrics.registry.register(metrics.Gauge(
+    "db_replica_healthy", "リードレプリカのヘルスチェックの結果（1 = 使用可）", ("replica",),
+    function=lambda: {(replica.name,): int(replica.healthy) for replica in replica_router.replicas}
+))
+
+
+def current_replica() -> Optional[Replica]:
+    return _replica.get()
+
+
+async def use_replica(request: Request):
+    """
+    このリクエストの読み取りをレプリカに送る（dependencies=[Depends(use_replica)]）。
+    パスの character_id が最近書き換えられていればプライマリを使う
+    （非同期の依存関係にして、設定した ContextVar がエンドポイントまで引き継がれるようにしている）
+    """
+    if not replica_router.replicas:
+        return
+    character_id = request.path_params.get("character_id", "")
+    if character_id.isdigit() and replica_router.is_pinned(int(character_id)):
+        REPLICA_READS.inc("pinned")
+        return
+    replica = replica_router.choose()
+    REPLICA_READS.inc("replica" if replica else "primary")
+    _replica.set(replica)
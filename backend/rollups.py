@@ -0,0 +1,139 @@
+"""
+日別学習集計（study_daily_rollups）の更新と集計
+
+学習セッションが完了するたびに (character_id, day) の行へ学習時間と件数を加算します。
+/stats は個々のセッションではなくこの表を読むため、処理量は対象期間の日数分で済みます。
+"""
+
+from datetime import date, datetime
+from typing import Iterable
+
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import StudyDailyRollup, StudySession
+
+rollup_table = StudyDailyRollup.__table__
+
+
+def rollup_day(started_at: datetime) -> date:
+    """セッションを集計する日（/stats の「今日」判定と同じく started_at の日付）"""
+    return started_at.date()
+
+
+def increment_statement(dialect_name: str):
+    """(character_id, day) 行に minutes / session_count を加算する UPSERT 文"""
+    if dialect_name == "mysql":
+        stmt = mysql_insert(rollup_table)
+        return stmt.on_duplicate_key_update(
+            minutes=rollup_table.c.minutes + stmt.inserted.minutes,
+            session_count=rollup_table.c.session_count + stmt.inserted.session_count,
+        )
+    stmt = sqlite_insert(rollup_table)
+    return stmt.on_conflict_do_update(
+        index_elements=[rollup_table.c.character_id, rollup_table.c.day],
+        set_={
+            "minutes": rollup_table.c.minutes + stmt.excluded.minutes,
+            "session_count": rollup_table.c.session_count + stmt.excluded.session_count,
+        },
+    )
+
+
+def aggregate_rows(sessions: Iterable[tuple]) -> list:
+    """(character_id, started_at, duration) の並びを日別の加算行にまとめる"""
+    totals = {}
+    for character_id, started_at, duration in sessions:
+        key = (character_id, rollup_day(started_at))
+        minutes, count = totals.get(key, (0.0, 0))
+        totals[key] = (minutes + duration, count + 1)
+    return [
+        {"character_id": character_id, "day": day, "minutes": minutes, "session_count": count}
+        for (character_id, day), (minutes, count) in totals.items()
+    ]
+
+
+def rollup_range_query(character_id: int, start: date, end: date):
+    """指定期間（両端を含む）の日別集計を取得するクエリ"""
+    return select(StudyDailyRollup).where(
+        StudyDailyRollup.character_id == character_id,
+        StudyDailyRollup.day >= start,
+        StudyDailyRollup.day <= end
+    ).order_by(StudyDailyRollup.day.asc())
+
+
+def rollup_totals_query(character_id: int, start: date = None, end: date = None):
+    """期間内（省略時は全期間）の学習時間合計と完了セッション数を取得するクエリ"""
+    query = select(
+        func.coalesce(func.sum(StudyDailyRollup.minutes), 0.0),
+        func.coalesce(func.sum(StudyDailyRollup.session_count), 0)
+    ).where(StudyDailyRollup.character_id == character_id)
+    if start is not None:
+        query = query.where(StudyDailyRollup.day >= start)
+    if end is not None:
+        query = query.where(StudyDailyRollup.day <= end)
+    return query
+
+
+def rebuild_rollups(db, after_character_id: int, last_character_id: int) -> int:
+    """
+    after_character_id < character_id <= last_character_id の日別集計を study_sessions から作り直し、書き込んだ行数を返す
+    （リース切れで破棄された学習時間0のタイマーは数えない）。db は Session でも Connection でもよく、コミットは呼び出し側で行う。
+    先に集計行を削除してロックを取るので、作り直しの間に完了したセッションの加算は作り直しの後に適用される
+    """
+    in_range = (
+        StudyDailyRollup.character_id > after_character_id,
+        StudyDailyRollup.character_id <= last_character_id
+    )
+    db.execute(delete(StudyDailyRollup).where(*in_range))
+    sessions = db.execute(
+        select(StudySession.character_id, StudySession.started_at, StudySession.duration)
+        .where(
+            StudySession.character_id > after_character_id,
+            StudySession.character_id <= last_character_id,
+            StudySession.ended_at.isnot(None),
+            StudySession.duration > 0
+        )
+    ).all()
+    rows = aggregate_rows(sessions)
+    if rows:
+        db.execute(insert(rollup_table), rows)
+    return len(rows)
+
+
+def backfill_rollups(db: Session, chunk_size: int = 500) -> int:
+    """
+    study_sessions から日別集計を作り直す。キャラクターIDの範囲ごとに作り直し、書き込んだ集計行数を返す。
+    稼働中のデータベースでは、間隔を空けて中断・再開できる migrations.py の 011 を使う
+    """
+    written = 0
+    last_id = 0
+    while True:
+        character_ids = db.scalars(
+            select(StudySession.character_id)
+            .where(StudySession.character_id > last_id)
+            .group_by(StudySession.character_id)
+            .order_by(StudySession.character_id)
+            .limit(chunk_size)
+        ).all()
+        if not character_ids:
+            break
+        first_id, after_id, last_id = character_ids[0], last_id, character_ids[-1]
+
+        rows = rebuild_rollups(db, after_id, last_id)
+        db.commit()
+        written += rows
+        print(f"キャラクターID {first_id}〜{last_id}: {rows} 日分を集計しました")
+    return written
+
+if __name__ == "__main__":
+    from database import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        total = backfill_rollups(db)
+        print(f"✅ 日別集計のバックフィルが完了しました（{total} 行）")
+    finally:
+        db.close()
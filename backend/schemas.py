@@ -18,10 +18,16 @@ class CharacterResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CharacterPage(BaseModel):
+    items: List[CharacterResponse]
+    next_cursor: Optional[str] = None
+
 class StudySessionCreate(BaseModel):
     character_id: int
     duration: float
     subject: Optional[str] = None
+    started_at: Optional[datetime] = None  # オフライン記録の開始時刻（省略時は終了時刻から逆算）
+    ended_at: Optional[datetime] = None  # オフライン記録の終了時刻（省略時は受信時刻）
 
 class StudySessionResponse(BaseModel):
     id: int
@@ -34,6 +40,10 @@ class StudySessionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class StudySessionPage(BaseModel):
+    items: List[StudySessionResponse]
+    next_cursor: Optional[str] = None
+
 class TimerStart(BaseModel):
     character_id: int
     subject: Optional[str] = None
@@ -41,6 +51,9 @@ class TimerStart(BaseModel):
 class TimerStop(BaseModel):
     session_id: int
 
+class TimerHeartbeat(BaseModel):
+    session_id: int
+
 # 資格関連スキーマ
 class CertificationCreate(BaseModel):
     character_id: int
@@ -70,6 +83,10 @@ class CertificationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CertificationPage(BaseModel):
+    items: List[CertificationResponse]
+    next_cursor: Optional[str] = None
+
 # 更新されたキャラクターレスポンス（資格情報を含む）
 class CharacterWithCertifications(BaseModel):
     id: int
@@ -93,6 +110,9 @@ class EquipmentResponse(BaseModel):
     price: int
     description: Optional[str]
     color_code: Optional[str]
+    experience_multiplier: float = 1.0
+    coin_multiplier: float = 1.0
+    special_effect: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -128,6 +148,10 @@ class CoinTransactionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CoinTransactionPage(BaseModel):
+    items: List[CoinTransactionResponse]
+    next_cursor: Optional[str] = None
+
 # 試験予定関連スキーマ
 class ExamScheduleCreate(BaseModel):
     character_id: int
@@ -159,3 +183,20 @@ class ExamScheduleResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class ExamSchedulePage(BaseModel):
+    items: List[ExamScheduleResponse]
+    next_cursor: Optional[str] = None
+
+class ReminderResponse(BaseModel):
+    id: int
+    exam_schedule_id: int
+    character_id: int
+    exam_name: str
+    exam_date: datetime
+    remind_at: datetime
+    fired_at: datetime
+    delivered_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
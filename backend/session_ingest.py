@@ -0,0 +1,177 @@
+"""
+オフライン・モバイルクライアントが記録した学習セッションの一括取り込み
+
+受け取ったセッションを StudySessionCreate で検証し、キャラクターごとに装備ボーナスを1回だけ計算して、
+StudySession と CoinTransaction（と日別集計）を1トランザクションでまとめて書き込みます。
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import Character, StudySession, CoinTransaction
+from schemas import StudySessionCreate
+from game_logic import calculate_experience, calculate_level, calculate_coins
+from rollups import increment_statement, aggregate_rows
+from leaderboard import leaderboard
+from profile_cache import profile_cache
+from optimistic import update_character_sync
+from equipment_catalog import equipment_catalog
+from equipment_bonus import equipped_ids_query, group_equipped
+import metrics
+
+# 1リクエストで受け付ける最大件数
+BULK_SESSION_LIMIT = int(os.getenv("BULK_SESSION_LIMIT", "10000"))
+
+
+class ParseError:
+    """パースに失敗した行（結果レポートでエラーとして返す）"""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def parse_ndjson_lines(lines: Iterable[Union[str, bytes]]) -> List:
+    """NDJSON の各行をパースする。パースできない行（UTF-8 として不正な行を含む）は ParseError として返す"""
+    items = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(ParseError(f"Invalid JSON: {e}"))
+    return items
+
+
+def _to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def ingest_sessions(db: Session, raw_items: list) -> dict:
+    """セッションを検証して一括登録し、1件ごとの結果レポートを返す"""
+    results = [None] * len(raw_items)
+    valid = []
+    received_at = datetime.utcnow()
+
+    # 1. 入力を検証
+    for index, raw in enumerate(raw_items):
+        if isinstance(raw, ParseError):
+            results[index] = {"index": index, "status": "error", "error": raw.message}
+            continue
+        try:
+            item = StudySessionCreate.model_validate(raw)
+        except ValidationError as e:
+            results[index] = {"index": index, "status": "error", "error": e.errors(include_url=False)}
+            continue
+        if item.duration <= 0:
+            results[index] = {"index": index, "status": "error", "error": "duration must be positive"}
+            continue
+        valid.append((index, item))
+
+    # 2. 対象キャラクターと装備をまとめて取得し、ボーナスはキャラクターごとに1回だけ計算
+    character_ids = {item.character_id for _, item in valid}
+    characters = {}
+    bonuses = {}
+    if character_ids:
+        characters = {
+            c.id: c for c in db.query(Character).filter(Character.id.in_(character_ids)).all()
+        }
+        equipped = group_equipped(db.execute(equipped_ids_query(characters.keys())).all())
+        bonuses = equipment_catalog.bonuses(equipped, characters.keys())
+
+    # 3. セッション行を組み立て、キャラクターごとの加算量を集計
+    accepted = []
+    totals = {}
+    for index, item in valid:
+        character = characters.get(item.character_id)
+        if character is None:
+            results[index] = {"index": index, "status": "error", "error": "Character not found"}
+            continue
+
+        ended_at = _to_naive_utc(item.ended_at) or received_at
+        started_at = _to_naive_utc(item.started_at) or ended_at - timedelta(minutes=item.duration)
+        bonus = bonuses[character.id]
+        experience = int(calculate_experience(item.duration) * bonus["experience_multiplier"])
+        coins = int(calculate_coins(item.duration) * bonus["coin_multiplier"])
+
+        total = totals.setdefault(character.id, [0.0, 0, 0])
+        total[0] += item.duration
+        total[1] += experience
+        total[2] += coins
+
+        session = StudySession(
+            character_id=character.id,
+            duration=item.duration,
+            subject=item.subject,
+            started_at=started_at,
+            ended_at=ended_at
+        )
+        accepted.append((index, session, experience, coins))
+
+    # 4. キャラクターを更新し、一括INSERT（セッションIDが必要なので StudySession は flush でまとめて採番）
+    try:
+        for character_id, (minutes, experience, coins) in totals.items():
+            characters[character_id] = update_character_sync(db, character_id, lambda c: {
+                "total_study_time": c.total_study_time + minutes,
+                "experience": c.experience + experience,
+                "coins": c.coins + coins,
+                "level": calculate_level(c.experience + experience)
+            })
+        db.add_all([session for _, session, _, _ in accepted])
+        db.flush()
+        coin_rows = [
+            {
+                "character_id": session.character_id,
+                "amount": coins,
+                "transaction_type": "earned",
+                "source": "study",
+                "study_session_id": session.id,
+                "created_at": received_at
+            }
+            for _, session, _, coins in accepted
+        ]
+        if coin_rows:
+            db.execute(insert(CoinTransaction), coin_rows)
+
+        # 日別集計はキャラクター×日ごとに1行へまとめて加算
+        rollup_rows = aggregate_rows(
+            (session.character_id, session.started_at, session.duration) for _, session, _, _ in accepted
+        )
+        if rollup_rows:
+            db.execute(increment_statement(db.get_bind().dialect.name), rollup_rows)
+
+        # コミット後は属性が失効して再SELECTになるため、IDはここで確定させておく
+        for index, session, experience, coins in accepted:
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "session_id": session.id,
+                "experience_gained": experience,
+                "coins_gained": coins
+            }
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for character in characters.values():
+        leaderboard.update(character)
+        profile_cache.invalidate(character.id)
+    metrics.SESSIONS_INGESTED.inc(amount=len(accepted))
+    metrics.COINS_EARNED.inc("study", amount=sum(coins for _, _, _, coins in accepted))
+
+    return {
+        "received": len(raw_items),
+        "created": len(accepted),
+        "failed": len(raw_items) - len(accepted),
+        "results": results
+    }
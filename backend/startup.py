@@ -0,0 +1,102 @@
+"""
+起動時間の計測・ウォームアップ・準備完了（readiness）
+
+main.py の最初に import し、そこから準備完了までの時間を段階ごとに記録します。
+- lifespan の必須の処理（スキーマの版の確認・ランキングや装備マスターの読み込みなど）は phase() で計測する
+- STARTUP_WARMUP が有効なら、起動後にコネクションプールを埋め、装備マスターのJSONや
+  ランキング上位のプロフィールをキャッシュしてから準備完了にする（それまで GET /health/ready は 503）
+- 準備完了までが STARTUP_BUDGET_MS を超えたら警告を出す（benchmarks/cold_start.py で計測できる）
+
+環境変数
+- STARTUP_WARMUP (true)
+- STARTUP_WARMUP_CONNECTIONS : 事前に接続する数（既定はプールの size）
+- STARTUP_WARM_PROFILES (100) : プロフィールをキャッシュしておくランキング上位の人数
+- STARTUP_BUDGET_MS (3000)
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import Pool, QueuePool
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes", "on")
+STARTUP_WARMUP_CONNECTIONS = int(os.getenv("STARTUP_WARMUP_CONNECTIONS", "0")) or None
+STARTUP_WARM_PROFILES = int(os.getenv("STARTUP_WARM_PROFILES", "100"))
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "3000"))
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+class StartupState:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.ready = False
+        self.ready_ms = None
+
+    def begin(self):
+        """lifespan の開始時に呼ぶ（それまでを import の時間として記録する）"""
+        self.phases["import"] = _elapsed_ms(self.started)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = _elapsed_ms(started)
+
+    def mark_ready(self):
+        self.ready_ms = _elapsed_ms(self.started)
+        self.ready = True
+        phases = ", ".join(f"{name} {ms}ms" for name, ms in self.phases.items())
+        print(f"Startup ready in {self.ready_ms}ms ({phases})")
+        if self.ready_ms > STARTUP_BUDGET_MS:
+            print(f"⚠️  起動に {self.ready_ms}ms かかりました（目標 {STARTUP_BUDGET_MS:.0f}ms）")
+
+    def status(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "startup_ms": self.ready_ms,
+            "budget_ms": STARTUP_BUDGET_MS,
+            "phases": dict(self.phases),
+        }
+
+
+startup_state = StartupState()
+
+
+def _warm_count(pool: Pool, connections: Optional[int]) -> int:
+    # プールしない接続先（SQLite の非同期エンジンなど）は接続できることだけ確かめる
+    if not isinstance(pool, QueuePool):
+        return 1
+    return min(connections or pool.size(), pool.size())
+
+
+def warm_pool(engine: Engine, connections: Optional[int] = STARTUP_WARMUP_CONNECTIONS) -> int:
+    """プールの接続を同時に取得して返し、最初のリクエストで接続を待たないようにする"""
+    held = []
+    try:
+        for _ in range(_warm_count(engine.pool, connections)):
+            held.append(engine.connect())
+    finally:
+        for connection in held:
+            connection.close()
+    return len(held)
+
+
+async def warm_async_pool(engine: AsyncEngine, connections: Optional[int] = STARTUP_WARMUP_CONNECTIONS) -> int:
+    held = []
+    try:
+        for _ in range(_warm_count(engine.sync_engine.pool, connections)):
+            held.append(await engine.connect())
+    finally:
+        for connection in held:
+            await connection.close()
+    return len(held)
@@ -0,0 +1,61 @@
+"""
+テスト共通のフィクスチャ
+
+database.py はカレントディレクトリに study_game.db があれば SQLite を使うので、
+テストごとに一時ディレクトリへ空のDBを作り、全テーブルを作成してから実行します。
+
+    cd backend
+    python -m pytest -q
+"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import database  # noqa: E402
+from database import SessionLocal, Character, create_tables  # noqa: E402
+
+
+def _dispose_engines():
+    engine = database._engines.pop("sync", None)
+    if engine is not None:
+        engine.dispose()
+    # 非同期エンジンはテストでは使わない（作られていれば同期側から閉じる）
+    engine = database._engines.pop("async", None)
+    if engine is not None:
+        engine.sync_engine.dispose()
+
+
+@pytest.fixture
+def database_dir(tmp_path, monkeypatch):
+    """空の study_game.db を置いた一時ディレクトリで、全テーブルを作成した状態にする"""
+    monkeypatch.chdir(tmp_path)
+    open("study_game.db", "w").close()
+    _dispose_engines()
+    create_tables()
+    yield tmp_path
+    _dispose_engines()
+
+
+@pytest.fixture
+def db(database_dir):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_character(db):
+    """キャラクターを作成して ID を返す"""
+    def make(name: str = "テスト", **values) -> int:
+        character = Character(name=name, **values)
+        db.add(character)
+        db.commit()
+        return character.id
+    return make
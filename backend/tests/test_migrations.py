@@ -0,0 +1,111 @@
+import os
+import shutil
+
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from coin_ledger import reconcile_coins
+from database import (
+    Character, CoinTransaction, SchemaVersion, SessionLocal, SCHEMA_VERSION, current_schema_version, get_engine,
+    stamp_schema_version
+)
+from migrations import MigrationContext, Throttle, checkpoint_table, upgrade
+
+from conftest import BACKEND_DIR, _dispose_engines
+
+characters = Character.__table__
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FixedThrottle(Throttle):
+    """件数を変えず、休まず、interrupt_after バッチ目の後に中断する（プロセスが落ちた場合の代わり）"""
+
+    def __init__(self, batch_size: int, interrupt_after: int = None):
+        super().__init__(batch_size=batch_size, duty_cycle=1.0)
+        self.interrupt_after = interrupt_after
+        self.batches = 0
+
+    def after_batch(self, elapsed: float) -> float:
+        self.batches += 1
+        if self.batches == self.interrupt_after:
+            raise Interrupted()
+        return 0.0
+
+
+def _add_characters(db, count: int, **values):
+    db.execute(insert(characters), [{"name": f"c{i}", **values} for i in range(count)])
+    db.commit()
+
+
+def test_backfill_resumes_from_checkpoint(db):
+    _add_characters(db, 25, coins=0)
+    engine = get_engine()
+    # 同じ行を2回更新すると coins が2以上になる
+    values = {"coins": characters.c.coins + 1}
+
+    with pytest.raises(Interrupted):
+        MigrationContext(engine, 99, FixedThrottle(10, interrupt_after=2)).backfill("bump", characters, values)
+
+    with engine.connect() as connection:
+        checkpoint = connection.execute(select(checkpoint_table).where(checkpoint_table.c.step == "bump")).one()
+        assert (checkpoint.rows_done, checkpoint.finished_at) == (20, None)
+        assert connection.scalar(select(func.count()).where(characters.c.coins == 1)) == 20
+
+    context = MigrationContext(engine, 99, FixedThrottle(10))
+    assert context.step_pending("bump")
+    assert context.backfill("bump", characters, values) == 25
+    # 完了済みのステップは何もしない
+    assert context.backfill("bump", characters, values) == 25
+    assert not context.step_pending("bump")
+
+    db.expire_all()
+    assert db.scalars(select(Character.coins)).all() == [1] * 25
+
+
+def test_interrupted_upgrade_resumes_and_records_opening_balances(db):
+    # 取引履歴より前からコインを持っているキャラクターがいる v9 のデータベース
+    _add_characters(db, 25, coins=100)
+    db.execute(delete(SchemaVersion))
+    stamp_schema_version(db.connection(), 9, "test")
+    db.commit()
+    engine = get_engine()
+
+    with pytest.raises(Interrupted):
+        upgrade(engine, throttle=FixedThrottle(10, interrupt_after=1))
+    # 途中で止まったマイグレーションは版を記録しない
+    assert current_schema_version(engine) == 9
+
+    upgrade(engine, throttle=FixedThrottle(10))
+    assert current_schema_version(engine) == SCHEMA_VERSION
+
+    # 中断の前後で同じキャラクターに2回書かない
+    openings = db.execute(
+        select(CoinTransaction.character_id, func.count(), func.sum(CoinTransaction.amount))
+        .where(CoinTransaction.transaction_type == "opening")
+        .group_by(CoinTransaction.character_id)
+    ).all()
+    assert len(openings) == 25
+    assert {(count, amount) for _, count, amount in openings} == {(1, 100)}
+    assert reconcile_coins(db)["drift_count"] == 0
+
+
+def test_upgrade_from_committed_database(tmp_path, monkeypatch):
+    # リポジトリの study_game.db（版管理より前のスキーマ）を最新の版まで上げられる
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(BACKEND_DIR, "study_game.db"), tmp_path)
+    _dispose_engines()
+    try:
+        engine = get_engine()
+        upgrade(engine, throttle=FixedThrottle(100))
+        assert current_schema_version(engine) == SCHEMA_VERSION
+
+        db = SessionLocal()
+        try:
+            assert reconcile_coins(db)["drift_count"] == 0
+        finally:
+            db.close()
+    finally:
+        _dispose_engines()
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from database import SessionLocal, Character
+from optimistic import update_character_sync
+
+THREADS = 8
+UPDATES_PER_THREAD = 25
+
+
+def _add_rewards(character_id: int):
+    for _ in range(UPDATES_PER_THREAD):
+        db = SessionLocal()
+        try:
+            update_character_sync(db, character_id, lambda c: {
+                "coins": c.coins + 3,
+                "experience": c.experience + 5
+            })
+            db.commit()
+        finally:
+            db.close()
+
+
+def test_concurrent_updates_keep_every_increment(db, make_character):
+    character_id = make_character(coins=100, experience=0)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        for future in [pool.submit(_add_rewards, character_id) for _ in range(THREADS)]:
+            future.result()
+
+    db.expire_all()
+    character = db.get(Character, character_id)
+    updates = THREADS * UPDATES_PER_THREAD
+    assert character.coins == 100 + 3 * updates
+    assert character.experience == 5 * updates
+    # 書き込みごとに version が1ずつ進む
+    assert character.version == updates
+
+
+def test_conditional_update_does_not_overdraw(db, make_character):
+    character_id = make_character(coins=10)
+
+    def spend(_):
+        session = SessionLocal()
+        try:
+            update_character_sync(session, character_id, lambda c: {"coins": c.coins - 4}, Character.coins >= 4)
+            session.commit()
+            return True
+        except Exception:
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(spend, range(4)))
+
+    db.expire_all()
+    character = db.get(Character, character_id)
+    assert results.count(True) == 2
+    assert character.coins == 2
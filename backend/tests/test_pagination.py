@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from database import ExamSchedule, StudySession
+from pagination import MAX_PAGE_LIMIT, build_page, keyset_query
+
+
+def _walk(db, query, sort_column, id_column, sort_attr, limit, descending=True):
+    """next_cursor を辿って全ページの id を集める"""
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = build_page(
+            db.scalars(keyset_query(query, sort_column, id_column, limit, cursor, descending)).all(), limit, sort_attr
+        )
+        ids.extend(item.id for item in page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.fixture
+def sessions(db, make_character):
+    """同じ開始時刻のセッションを含む履歴（並び順の値が同じ行もページをまたいで漏れなく返ることを確認する）"""
+    character_id = make_character()
+    base = datetime(2026, 1, 1, 9, 0)
+    rows = [
+        StudySession(character_id=character_id, duration=10.0, started_at=base + timedelta(minutes=i // 3), ended_at=base)
+        for i in range(23)
+    ]
+    db.add_all(rows)
+    db.add(StudySession(character_id=make_character("他人"), duration=10.0, started_at=base, ended_at=base))
+    db.commit()
+    return character_id
+
+
+def test_pages_cover_every_row_once_in_order(db, sessions):
+    query = select(StudySession).where(StudySession.character_id == sessions)
+    expected = [s.id for s in db.scalars(query.order_by(StudySession.started_at.desc(), StudySession.id.desc()))]
+
+    for limit in (1, 4, 5, 23, 50):
+        ids, pages = _walk(db, query, StudySession.started_at, StudySession.id, "started_at", limit)
+        assert ids == expected
+        assert pages == max(-(-len(expected) // limit), 1)
+
+
+def test_ascending_pages_on_exam_dates(db, make_character):
+    character_id = make_character()
+    day = datetime(2026, 3, 1)
+    db.add_all([
+        ExamSchedule(character_id=character_id, exam_name=f"試験{i}", exam_date=day + timedelta(days=i % 4))
+        for i in range(10)
+    ])
+    db.commit()
+
+    query = select(ExamSchedule).where(ExamSchedule.character_id == character_id)
+    expected = [e.id for e in db.scalars(query.order_by(ExamSchedule.exam_date.asc(), ExamSchedule.id.asc()))]
+    ids, _ = _walk(db, query, ExamSchedule.exam_date, ExamSchedule.id, "exam_date", 3, descending=False)
+    assert ids == expected
+
+
+def test_rows_added_after_the_first_page_do_not_shift_later_pages(db, sessions):
+    query = select(StudySession).where(StudySession.character_id == sessions)
+    first = build_page(db.scalars(keyset_query(query, StudySession.started_at, StudySession.id, 5, None)).all(), 5, "started_at")
+    # OFFSET と違い、先頭に新しい行が増えても次のページはずれない
+    db.add(StudySession(character_id=sessions, duration=1.0, started_at=datetime(2026, 2, 1), ended_at=datetime(2026, 2, 1)))
+    db.commit()
+    second = db.scalars(keyset_query(query, StudySession.started_at, StudySession.id, 5, first["next_cursor"])).all()
+
+    expected = [s.id for s in db.scalars(query.order_by(StudySession.started_at.desc(), StudySession.id.desc()))]
+    assert [s.id for s in first["items"]] + [s.id for s in second[:5]] == expected[1:11]
+
+
+@pytest.mark.parametrize("limit, cursor", [(0, None), (MAX_PAGE_LIMIT + 1, None), (10, "not-a-cursor")])
+def test_invalid_limit_or_cursor_is_400(limit, cursor):
+    with pytest.raises(HTTPException) as error:
+        keyset_query(select(StudySession), StudySession.started_at, StudySession.id, limit, cursor)
+    assert error.value.status_code == 400
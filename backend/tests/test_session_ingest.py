@@ -0,0 +1,55 @@
+from sqlalchemy import func, select
+
+from database import Character, CoinTransaction, StudyDailyRollup, StudySession
+from game_logic import calculate_coins, calculate_experience
+from session_ingest import ingest_sessions, parse_ndjson_lines
+
+
+def test_report_lists_each_row(db, make_character):
+    character_id = make_character()
+    items = parse_ndjson_lines([
+        f'{{"character_id": {character_id}, "duration": 30, "started_at": "2026-01-05T09:00:00"}}',
+        '{"character_id": "x", "duration": 30}',
+        f'{{"character_id": {character_id}, "duration": 0}}',
+        "not json",
+        '{"character_id": 999, "duration": 10}',
+        f'{{"character_id": {character_id}, "duration": 45, "ended_at": "2026-01-05T12:00:00+09:00"}}',
+    ])
+
+    report = ingest_sessions(db, items)
+
+    assert (report["received"], report["created"], report["failed"]) == (6, 2, 4)
+    assert [r["index"] for r in report["results"]] == list(range(6))
+    assert [r["status"] for r in report["results"]] == ["created", "error", "error", "error", "error", "created"]
+    assert report["results"][2]["error"] == "duration must be positive"
+    assert report["results"][3]["error"].startswith("Invalid JSON")
+    assert report["results"][4]["error"] == "Character not found"
+    assert report["results"][0]["coins_gained"] == calculate_coins(30)
+    assert report["results"][0]["experience_gained"] == calculate_experience(30)
+
+
+def test_created_rows_are_written_together(db, make_character):
+    character_id = make_character(coins=0, experience=0)
+    report = ingest_sessions(db, [
+        {"character_id": character_id, "duration": 30, "started_at": "2026-01-05T09:00:00"},
+        {"character_id": character_id, "duration": 45, "ended_at": "2026-01-05T12:00:00+09:00"},
+    ])
+
+    db.expire_all()
+    character = db.get(Character, character_id)
+    coins = sum(r["coins_gained"] for r in report["results"])
+    assert character.coins == coins
+    assert character.experience == sum(r["experience_gained"] for r in report["results"])
+    assert character.total_study_time == 75
+
+    session_ids = [r["session_id"] for r in report["results"]]
+    assert db.scalar(select(func.count()).select_from(StudySession).where(StudySession.id.in_(session_ids))) == 2
+    assert db.scalar(select(func.sum(CoinTransaction.amount)).where(CoinTransaction.character_id == character_id)) == coins
+
+    # オフセット付きの終了時刻はUTCに直してから開始時刻を逆算する（12:00+09:00 -> 03:00 UTC、45分前）
+    offline = db.get(StudySession, session_ids[1])
+    assert offline.ended_at.isoformat() == "2026-01-05T03:00:00"
+    assert offline.started_at.isoformat() == "2026-01-05T02:15:00"
+
+    rollup = db.scalars(select(StudyDailyRollup).where(StudyDailyRollup.character_id == character_id)).one()
+    assert (rollup.day.isoformat(), rollup.minutes, rollup.session_count) == ("2026-01-05", 75, 2)
@@ -0,0 +1,199 @@
+"""
+実行中タイマーの保存先（タイマーストア）
+
+TIMER_STORE 環境変数で実装を切り替えます。
+- "database"（デフォルト）: study_sessions.ended_at IS NULL の行を実行中タイマーとして扱う。
+  複数ワーカー・再起動をまたいでもタイマーが失われない
+- "memory": プロセス内の dict で管理する（単一プロセス・開発用）
+
+どちらもセッションIDでの O(1) 参照と、リース（ハートビート）による放置タイマーの失効に対応します。
+"""
+
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, func, update, delete, or_, and_
+from sqlalchemy.orm import Session
+
+from database import StudySession
+
+# ハートビートが途絶えてからタイマーを失効させるまでの秒数（0以下で無期限）
+TIMER_LEASE_SECONDS = int(os.getenv("TIMER_LEASE_SECONDS", "43200"))
+
+
+class TimerStore(ABC):
+    """タイマーストアの共通インターフェース"""
+
+    def __init__(self, lease_seconds: int = TIMER_LEASE_SECONDS):
+        self.lease_seconds = lease_seconds
+
+    def _lease_deadline(self, now: datetime) -> Optional[datetime]:
+        """この時刻より前に最終ハートビートがあるタイマーは失効扱い"""
+        if self.lease_seconds <= 0:
+            return None
+        return now - timedelta(seconds=self.lease_seconds)
+
+    @abstractmethod
+    def start(self, db: Session, session: StudySession) -> None:
+        """コミット済みの学習セッションを実行中タイマーとして登録"""
+
+    @abstractmethod
+    def get(self, db: Session, session_id: int) -> Optional[dict]:
+        """実行中タイマーを取得（start_time, character_id, heartbeat_at）。なければ None"""
+
+    @abstractmethod
+    def heartbeat(self, db: Session, session_id: int) -> bool:
+        """リースを延長する。実行中タイマーがなければ False"""
+
+    @abstractmethod
+    def finish(self, db: Session, session_id: int, end_time: datetime) -> bool:
+        """
+        タイマーを停止状態にする。呼び出し元のトランザクション内で実行し、
+        同じタイマーを停止できるのは1リクエストだけ（二重停止時は False）
+        """
+
+    @abstractmethod
+    def expire(self, db: Session, now: Optional[datetime] = None) -> int:
+        """リース切れのタイマーを破棄し（学習履歴には残さない）、破棄した件数を返す"""
+
+    @abstractmethod
+    def count_active(self, db: Session, now: Optional[datetime] = None) -> int:
+        """リース切れでない実行中タイマーの数"""
+
+
+class InMemoryTimerStore(TimerStore):
+    """プロセス内 dict によるタイマーストア（単一ワーカー用）"""
+
+    def __init__(self, lease_seconds: int = TIMER_LEASE_SECONDS):
+        super().__init__(lease_seconds)
+        self._sessions = {}
+
+    def _is_alive(self, entry: dict, now: datetime) -> bool:
+        deadline = self._lease_deadline(now)
+        return deadline is None or entry["heartbeat_at"] >= deadline
+
+    def start(self, db: Session, session: StudySession) -> None:
+        self._sessions[session.id] = {
+            "start_time": session.started_at,
+            "character_id": session.character_id,
+            "heartbeat_at": session.started_at,
+        }
+
+    def get(self, db: Session, session_id: int) -> Optional[dict]:
+        entry = self._sessions.get(session_id)
+        if entry is None or not self._is_alive(entry, datetime.utcnow()):
+            return None
+        return entry
+
+    def heartbeat(self, db: Session, session_id: int) -> bool:
+        entry = self.get(db, session_id)
+        if entry is None:
+            return False
+        entry["heartbeat_at"] = datetime.utcnow()
+        return True
+
+    def finish(self, db: Session, session_id: int, end_time: datetime) -> bool:
+        # pop は原子的なので、同時に停止しても成功するのは1リクエストだけ
+        return self._sessions.pop(session_id, None) is not None
+
+    def expire(self, db: Session, now: Optional[datetime] = None) -> int:
+        now = now or datetime.utcnow()
+        expired = [sid for sid, entry in self._sessions.items() if not self._is_alive(entry, now)]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return len(expired)
+
+    def count_active(self, db: Session, now: Optional[datetime] = None) -> int:
+        # プロセス内の dict なのでこのワーカーで開始したタイマーだけ
+        now = now or datetime.utcnow()
+        return sum(1 for entry in list(self._sessions.values()) if self._is_alive(entry, now))
+
+
+class DatabaseTimerStore(TimerStore):
+    """study_sessions テーブルによるタイマーストア（複数ワーカー・再起動対応）"""
+
+    def _active_filter(self, now: datetime):
+        conditions = [StudySession.ended_at.is_(None)]
+        deadline = self._lease_deadline(now)
+        if deadline is not None:
+            # ハートビート未送信のタイマーは開始時刻からリースを数える
+            conditions.append(or_(
+                StudySession.heartbeat_at >= deadline,
+                and_(StudySession.heartbeat_at.is_(None), StudySession.started_at >= deadline)
+            ))
+        return conditions
+
+    def start(self, db: Session, session: StudySession) -> None:
+        # 行自体が実行中タイマーなので追加の書き込みは不要
+        pass
+
+    def get(self, db: Session, session_id: int) -> Optional[dict]:
+        session = db.query(StudySession).filter(
+            StudySession.id == session_id,
+            *self._active_filter(datetime.utcnow())
+        ).first()
+        if session is None:
+            return None
+        return {
+            "start_time": session.started_at,
+            "character_id": session.character_id,
+            "heartbeat_at": session.heartbeat_at or session.started_at,
+        }
+
+    def heartbeat(self, db: Session, session_id: int) -> bool:
+        now = datetime.utcnow()
+        result = db.execute(
+            update(StudySession)
+            .where(StudySession.id == session_id, *self._active_filter(now))
+            .values(heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def finish(self, db: Session, session_id: int, end_time: datetime) -> bool:
+        # ended_at IS NULL を条件にした UPDATE で、先に停止したワーカーだけが成功する
+        result = db.execute(
+            update(StudySession)
+            .where(StudySession.id == session_id, StudySession.ended_at.is_(None))
+            .values(ended_at=end_time)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def expire(self, db: Session, now: Optional[datetime] = None) -> int:
+        now = now or datetime.utcnow()
+        deadline = self._lease_deadline(now)
+        if deadline is None:
+            return 0
+        # 失効したタイマーは行ごと削除する（終了扱いにすると学習時間0のセッションとして履歴に残る）
+        result = db.execute(
+            delete(StudySession)
+            .where(
+                StudySession.ended_at.is_(None),
+                or_(
+                    StudySession.heartbeat_at < deadline,
+                    and_(StudySession.heartbeat_at.is_(None), StudySession.started_at < deadline)
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
+    def count_active(self, db: Session, now: Optional[datetime] = None) -> int:
+        # 全ワーカーのタイマーが対象（ix_study_sessions_ended_at で実行中の行だけを読む）
+        now = now or datetime.utcnow()
+        return db.scalar(select(func.count()).select_from(StudySession).where(*self._active_filter(now)))
+
+
+def create_timer_store(kind: Optional[str] = None) -> TimerStore:
+    """環境変数 TIMER_STORE に応じたタイマーストアを生成"""
+    kind = (kind or os.getenv("TIMER_STORE", "database")).lower()
+    if kind == "memory":
+        return InMemoryTimerStore()
+    if kind == "database":
+        return DatabaseTimerStore()
+    raise ValueError(f"Unknown TIMER_STORE: {kind}")
@@ -3,7 +3,6 @@
 """
 
 import requests
-import json
 from datetime import datetime, timedelta
 
 API_BASE_URL = "http://localhost:8000"
@@ -83,24 +82,19 @@ def create_sample_certifications():
             }
         ]
         
-        # 各資格を作成
-        for cert_data in sample_certifications:
-            try:
-                response = requests.post(
-                    f"{API_BASE_URL}/certifications",
-                    headers={"Content-Type": "application/json"},
-                    data=json.dumps(cert_data)
-                )
-                
-                if response.status_code == 200:
-                    cert = response.json()
-                    print(f"✅ 資格「{cert['name']}」を作成しました (レベル {cert['itss_level']})")
-                else:
-                    print(f"❌ 資格「{cert_data['name']}」の作成に失敗: {response.status_code}")
-                    print(f"   エラー: {response.text}")
-            
-            except Exception as e:
-                print(f"❌ 資格「{cert_data['name']}」の作成中にエラー: {e}")
+        # まとめて1回のリクエストで登録
+        response = requests.post(f"{API_BASE_URL}/certifications/bulk", json=sample_certifications)
+        if response.status_code != 200:
+            print(f"❌ 資格の一括登録に失敗: {response.status_code}")
+            print(f"   エラー: {response.text}")
+            return
+        
+        for result in response.json()["results"]:
+            cert_data = sample_certifications[result["index"]]
+            if result["status"] == "created":
+                print(f"✅ 資格「{cert_data['name']}」を作成しました (レベル {cert_data['itss_level']})")
+            else:
+                print(f"❌ 資格「{cert_data['name']}」の作成に失敗: {result['error']}")
         
         print("\n📊 サンプル資格データの作成が完了しました！")
         print("アプリケーションの「資格管理」タブで確認してください。")
@@ -1,10 +1,16 @@
 -- データベースとテーブルの初期化
 -- 既存のテーブルが存在する場合は削除
+DROP TABLE IF EXISTS migration_checkpoints;
+DROP TABLE IF EXISTS schema_version;
+DROP TABLE IF EXISTS reminder_outbox;
+DROP TABLE IF EXISTS coin_balance_checkpoints;
 DROP TABLE IF EXISTS coin_transactions;
 DROP TABLE IF EXISTS character_equipment;
+DROP TABLE IF EXISTS catalog_versions;
 DROP TABLE IF EXISTS equipment;
 DROP TABLE IF EXISTS exam_schedules;
 DROP TABLE IF EXISTS certifications;
+DROP TABLE IF EXISTS study_daily_rollups;
 DROP TABLE IF EXISTS study_sessions;
 DROP TABLE IF EXISTS characters;
 
@@ -17,7 +23,12 @@ CREATE TABLE characters (
     experience INT DEFAULT 0,
     coins INT DEFAULT 0,
     current_color VARCHAR(20) DEFAULT '#8B4513',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    version INT NOT NULL DEFAULT 0,
+    revision INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NULL,
+    INDEX ix_characters_created_at (created_at),
+    INDEX ix_characters_updated_at (updated_at)
 );
 
 -- 学習セッションテーブル
@@ -28,6 +39,19 @@ CREATE TABLE study_sessions (
     subject VARCHAR(200),
     started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     ended_at TIMESTAMP NULL,
+    heartbeat_at TIMESTAMP NULL,
+    INDEX ix_study_sessions_character_started (character_id, started_at, ended_at),
+    INDEX ix_study_sessions_ended_at (ended_at),
+    FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE
+);
+
+-- 日別学習集計テーブル
+CREATE TABLE study_daily_rollups (
+    character_id INT NOT NULL,
+    day DATE NOT NULL,
+    minutes DOUBLE NOT NULL DEFAULT 0,
+    session_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (character_id, day),
     FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE
 );
 
@@ -41,6 +65,7 @@ CREATE TABLE certifications (
     obtained_date DATE,
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_certifications_character_created (character_id, created_at),
     FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE
 );
 
@@ -52,9 +77,19 @@ CREATE TABLE equipment (
     price INT NOT NULL,
     description TEXT,
     color_code VARCHAR(10),
+    experience_multiplier FLOAT NOT NULL DEFAULT 1.0,
+    coin_multiplier FLOAT NOT NULL DEFAULT 1.0,
+    special_effect VARCHAR(100),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- マスターデータの版番号テーブル
+CREATE TABLE catalog_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version INT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- キャラクター装備テーブル
 CREATE TABLE character_equipment (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -62,6 +97,8 @@ CREATE TABLE character_equipment (
     equipment_id VARCHAR(50) NOT NULL,
     is_equipped TINYINT DEFAULT 0,
     purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE INDEX uq_character_equipment_character_equipment (character_id, equipment_id),
+    INDEX ix_character_equipment_character_equipped (character_id, is_equipped, equipment_id),
     FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE,
     FOREIGN KEY (equipment_id) REFERENCES equipment(id) ON DELETE CASCADE
 );
@@ -76,11 +113,22 @@ CREATE TABLE coin_transactions (
     study_session_id INT,
     equipment_id VARCHAR(50),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_coin_transactions_character_created (character_id, created_at),
+    INDEX ix_coin_transactions_character_ledger (character_id, id, amount),
     FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE,
     FOREIGN KEY (study_session_id) REFERENCES study_sessions(id) ON DELETE SET NULL,
     FOREIGN KEY (equipment_id) REFERENCES equipment(id) ON DELETE SET NULL
 );
 
+-- コイン残高チェックポイントテーブル
+CREATE TABLE coin_balance_checkpoints (
+    character_id INT PRIMARY KEY,
+    balance INT NOT NULL,
+    last_transaction_id INT NOT NULL,
+    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE
+);
+
 -- 試験予定テーブル
 CREATE TABLE exam_schedules (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -93,21 +141,64 @@ CREATE TABLE exam_schedules (
     reminder_days INT DEFAULT 7,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_exam_schedules_character_date_status (character_id, exam_date, status),
+    FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE
+);
+
+-- 発火したリマインダーテーブル
+CREATE TABLE reminder_outbox (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    exam_schedule_id INT NOT NULL,
+    character_id INT NOT NULL,
+    exam_name VARCHAR(200) NOT NULL,
+    exam_date DATETIME NOT NULL,
+    remind_at DATETIME NOT NULL,
+    fired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    delivered_at DATETIME NULL,
+    UNIQUE INDEX uq_reminder_outbox_exam_remind_at (exam_schedule_id, remind_at),
+    INDEX ix_reminder_outbox_character_delivered (character_id, delivered_at, remind_at),
+    FOREIGN KEY (exam_schedule_id) REFERENCES exam_schedules(id) ON DELETE CASCADE,
     FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE
 );
 
+-- 適用したマイグレーションの版テーブル（migrations.py。database.py の SCHEMA_VERSION と一致すれば起動時に create_all を省略）
+CREATE TABLE schema_version (
+    version INT PRIMARY KEY,
+    name VARCHAR(100),
+    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- マイグレーション中のバックフィルの進捗テーブル
+CREATE TABLE migration_checkpoints (
+    version INT NOT NULL,
+    step VARCHAR(100) NOT NULL,
+    last_key INT NOT NULL DEFAULT 0,
+    rows_done INT NOT NULL DEFAULT 0,
+    finished_at DATETIME NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (version, step)
+);
+
+INSERT INTO schema_version (version, name) VALUES (11, 'init.sql');
+
 -- 初期データの挿入
 INSERT INTO characters (name, level, total_study_time, experience, coins) VALUES
 ('学習太郎', 1, 0.0, 0, 100);
 
+-- 初期コインの開始残高（coin_ledger.py の突き合わせで差分にならないよう取引履歴にも残す）
+INSERT INTO coin_transactions (character_id, amount, transaction_type, source) VALUES
+(1, 100, 'opening', 'opening_balance');
+
 -- 装備アイテムの初期データ
-INSERT INTO equipment (id, name, category, price, description, color_code) VALUES
-('hat_basic', '学習帽', 'accessory', 50, '学習に集中できる帽子', NULL),
-('glasses_reading', '読書用メガネ', 'accessory', 75, '長時間の読書に最適', NULL),
-('color_blue', 'ブルー', 'color', 30, '爽やかな青色', '#4169E1'),
-('color_green', 'グリーン', 'color', 30, '自然な緑色', '#32CD32'),
-('color_red', 'レッド', 'color', 30, '情熱的な赤色', '#FF6347'),
-('color_purple', 'パープル', 'color', 40, '神秘的な紫色', '#9370DB'),
-('color_orange', 'オレンジ', 'color', 35, 'エネルギッシュなオレンジ', '#FF8C00'),
-('hat_graduation', '卒業帽', 'accessory', 150, '学習の成果を象徴する帽子', NULL),
-('glasses_smart', 'スマートグラス', 'accessory', 200, '未来的なスマートグラス', NULL);
\ No newline at end of file
+INSERT INTO equipment (id, name, category, price, description, color_code, experience_multiplier, coin_multiplier, special_effect) VALUES
+('hat_basic', '学習帽', 'accessory', 50, '学習に集中できる帽子', NULL, 1.05, 1.0, '集中力向上'),
+('glasses_reading', '読書用メガネ', 'accessory', 75, '長時間の読書に最適', NULL, 1.05, 1.0, '知識の蓄積'),
+('color_blue', 'ブルー', 'color', 30, '爽やかな青色', '#4169E1', 1.0, 1.0, NULL),
+('color_green', 'グリーン', 'color', 30, '自然な緑色', '#32CD32', 1.0, 1.0, NULL),
+('color_red', 'レッド', 'color', 30, '情熱的な赤色', '#FF6347', 1.0, 1.0, NULL),
+('color_purple', 'パープル', 'color', 40, '神秘的な紫色', '#9370DB', 1.0, 1.0, NULL),
+('color_orange', 'オレンジ', 'color', 35, 'エネルギッシュなオレンジ', '#FF8C00', 1.0, 1.0, NULL),
+('hat_graduation', '卒業帽', 'accessory', 150, '学習の成果を象徴する帽子', NULL, 1.1, 1.0, '学習の成果'),
+('glasses_smart', 'スマートグラス', 'accessory', 200, '未来的なスマートグラス', NULL, 1.1, 1.05, '未来の知恵');
+
+INSERT INTO catalog_versions (name, version) VALUES ('equipment', 1);
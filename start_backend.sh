@@ -1,4 +1,5 @@
 #!/bin/bash
 cd backend
 source venv/bin/activate
+python migrations.py upgrade
 python main.py